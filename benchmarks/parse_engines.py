@@ -0,0 +1,81 @@
+"""Compare dataset parse engines on local CSV/Excel files.
+
+Usage:
+    uv run python -m benchmarks.parse_engines data/sales.csv data/report.xlsx [--runs 3]
+    uv run python -m benchmarks.parse_engines --generate 1000000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.dataset_cache import detect_file_type
+from src.parse_engines import ENGINES
+
+
+def _generate_csv(rows, directory):
+    # Mix of the column shapes users upload: ids, measures with gaps,
+    # low-cardinality labels, free text and dates.
+    rng = np.random.default_rng(0)
+    measure = rng.normal(100, 15, rows)
+    measure[rng.random(rows) < 0.05] = np.nan
+    df = pd.DataFrame({
+        "id": np.arange(rows),
+        "measure": measure,
+        "category": rng.choice(["north", "south", "east", "west"], rows),
+        "comment": [f"order {i} shipped" for i in range(rows)],
+        "date": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 1500, rows), unit="D"),
+    })
+    path = os.path.join(directory, f"generated_{rows}.csv")
+    df.to_csv(path, index=False)
+    return path
+
+
+def _time_engine(engine, path, runs):
+    timings = []
+    rows = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        with open(path, "rb") as source:
+            rows = sum(chunk.num_rows for chunk in engine.read_chunks(source))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--generate", type=int, metavar="ROWS",
+                        help="also benchmark a generated CSV with this many rows")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        files = list(args.files)
+        if args.generate:
+            files.append(_generate_csv(args.generate, directory))
+        if not files:
+            parser.error("pass at least one file or --generate")
+
+        print(f"{'file':32} {'engine':10} {'rows':>10} {'median s':>9} {'MB/s':>8}")
+        for path in files:
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            for engine in ENGINES[detect_file_type(path)]:
+                if not engine.available():
+                    print(f"{os.path.basename(path)[:32]:32} {engine.name:10} {'not installed':>29}")
+                    continue
+                try:
+                    seconds, rows = _time_engine(engine, path, args.runs)
+                except Exception as e:
+                    print(f"{os.path.basename(path)[:32]:32} {engine.name:10} failed: {str(e)[:60]}")
+                    continue
+                print(f"{os.path.basename(path)[:32]:32} {engine.name:10} {rows:10} "
+                      f"{seconds:9.3f} {size_mb / seconds:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compare prepared vs. plain execution latency of the hot read statements.
+
+Usage:
+    uv run python -m benchmarks.prepared_statements --email you@example.com \
+        --session-id <chat_session_id> --dataset-url <dataset_url> [--runs 200]
+"""
+import argparse
+import statistics
+import time
+
+from src.database import (
+    HOT_STATEMENTS, close_pool, execute_statement, get_db_cursor,
+    load_statements, set_prepared_statements
+)
+
+
+def _params(category, name, args):
+    return {
+        ('messages', 'get_messages'): (args.session_id,),
+        ('messages', 'get_messages_latest'): (args.session_id, 50),
+        ('columns', 'get_dataset_columns'): (args.dataset_url,),
+        ('chat_sessions', 'verify_session_owner'): (args.session_id, args.email),
+        ('users', 'get_user'): (args.email,),
+    }.get((category, name))
+
+
+def _time_statement(category, name, params, runs):
+    timings = []
+    with get_db_cursor(commit=False) as cursor:
+        for _ in range(runs):
+            start = time.perf_counter()
+            execute_statement(cursor, category, name, params)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--session-id", required=True)
+    parser.add_argument("--dataset-url", required=True)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    load_statements()
+    print(f"{'statement':40} {'mode':10} {'p50 ms':>8} {'p95 ms':>8}")
+    try:
+        for category, name in HOT_STATEMENTS:
+            params = _params(category, name, args)
+            if params is None:
+                continue  # writes are not benchmarked
+            for prepared in (False, True):
+                set_prepared_statements(prepared)
+                p50, p95 = _time_statement(category, name, params, args.runs)
+                mode = "prepared" if prepared else "plain"
+                print(f"{category + '/' + name:40} {mode:10} {p50:8.2f} {p95:8.2f}")
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
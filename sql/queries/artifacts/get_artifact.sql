@@ -0,0 +1,3 @@
+SELECT artifact_hash, content_type, byte_size, data, created_at
+FROM artifacts
+WHERE artifact_hash = %s;
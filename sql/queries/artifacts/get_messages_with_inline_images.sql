@@ -0,0 +1,6 @@
+SELECT message_id, message_txt
+FROM messages
+WHERE message_id > %s
+  AND message_txt LIKE '%%](data:image/%%'
+ORDER BY message_id
+LIMIT %s;
@@ -0,0 +1,3 @@
+INSERT INTO artifacts (artifact_hash, content_type, byte_size, data)
+VALUES %s
+ON CONFLICT (artifact_hash) DO NOTHING;
@@ -0,0 +1,3 @@
+UPDATE messages
+SET message_txt = %s
+WHERE message_id = %s;
@@ -0,0 +1,73 @@
+-- Session and one page of messages as pre-serialized JSON, plus the owner
+-- check, in a single round trip. The second parameter selects the page
+-- direction ('latest', 'before' or 'after'); the other branches are skipped
+-- as one-time filters. One extra row is fetched to detect further pages.
+WITH session AS (
+    SELECT chat_session_id, email, chat_session_title, created_at
+    FROM chat_sessions
+    WHERE chat_session_id = %s
+),
+params AS (
+    SELECT %s::text AS direction, %s::timestamp AS cursor_created_at,
+           %s::uuid AS cursor_message_id, %s::int AS page_size, %s::text AS email
+),
+page AS (
+    (SELECT m.message_id, m.sender, m.message_txt, m.created_at, m.chat_session_id, m.generated_code
+     FROM messages m, params p
+     WHERE p.direction = 'latest'
+       AND m.chat_session_id = (SELECT chat_session_id FROM session)
+     ORDER BY m.created_at DESC, m.message_id DESC
+     LIMIT (SELECT page_size + 1 FROM params))
+    UNION ALL
+    (SELECT m.message_id, m.sender, m.message_txt, m.created_at, m.chat_session_id, m.generated_code
+     FROM messages m, params p
+     WHERE p.direction = 'before'
+       AND m.chat_session_id = (SELECT chat_session_id FROM session)
+       AND (m.created_at, m.message_id) < (p.cursor_created_at, p.cursor_message_id)
+     ORDER BY m.created_at DESC, m.message_id DESC
+     LIMIT (SELECT page_size + 1 FROM params))
+    UNION ALL
+    (SELECT m.message_id, m.sender, m.message_txt, m.created_at, m.chat_session_id, m.generated_code
+     FROM messages m, params p
+     WHERE p.direction = 'after'
+       AND m.chat_session_id = (SELECT chat_session_id FROM session)
+       AND (m.created_at, m.message_id) > (p.cursor_created_at, p.cursor_message_id)
+     ORDER BY m.created_at ASC, m.message_id ASC
+     LIMIT (SELECT page_size + 1 FROM params))
+),
+numbered AS (
+    SELECT page.*,
+           row_number() OVER (ORDER BY created_at, message_id) AS rn,
+           count(*) OVER () AS fetched
+    FROM page
+),
+kept AS (
+    -- Drop the lookahead row: the oldest one for backwards pages, the newest for forward ones.
+    SELECT numbered.*
+    FROM numbered, params p
+    WHERE numbered.fetched <= p.page_size
+       OR (p.direction = 'after' AND numbered.rn <= p.page_size)
+       OR (p.direction <> 'after' AND numbered.rn > 1)
+)
+SELECT
+    json_build_object(
+        'chat_session_id', s.chat_session_id,
+        'email', s.email,
+        'chat_session_title', s.chat_session_title,
+        'created_at', s.created_at
+    )::text AS session_json,
+    (SELECT COALESCE(json_agg(json_build_object(
+        'message_id', k.message_id,
+        'sender', k.sender,
+        'message_txt', k.message_txt,
+        'created_at', k.created_at,
+        'chat_session_id', k.chat_session_id,
+        'generated_code', k.generated_code
+    ) ORDER BY k.created_at, k.message_id), '[]'::json)::text FROM kept k) AS messages_json,
+    (SELECT count(*) FROM numbered) > (SELECT page_size FROM params) AS has_more,
+    (SELECT created_at FROM kept ORDER BY created_at, message_id LIMIT 1) AS first_created_at,
+    (SELECT message_id FROM kept ORDER BY created_at, message_id LIMIT 1) AS first_message_id,
+    (SELECT created_at FROM kept ORDER BY created_at DESC, message_id DESC LIMIT 1) AS last_created_at,
+    (SELECT message_id FROM kept ORDER BY created_at DESC, message_id DESC LIMIT 1) AS last_message_id,
+    (SELECT email IS NULL FROM params) OR s.email = (SELECT email FROM params) AS authorized
+FROM session s;
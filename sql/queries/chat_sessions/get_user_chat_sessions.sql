@@ -3,9 +3,11 @@ SELECT
     cs.email,
     cs.chat_session_title,
     cs.created_at,
-    COUNT(d.dataset_url) as dataset_count
+    COALESCE(ss.dataset_count, 0) as dataset_count,
+    COALESCE(ss.message_count, 0) as message_count,
+    ss.last_message_at,
+    ss.last_message_preview
 FROM chat_sessions cs
-LEFT JOIN datasets d ON cs.chat_session_id = d.chat_session_id
+LEFT JOIN session_summary ss ON cs.chat_session_id = ss.chat_session_id
 WHERE cs.email = %s
-GROUP BY cs.chat_session_id, cs.email, cs.chat_session_title, cs.created_at
 ORDER BY cs.created_at DESC;
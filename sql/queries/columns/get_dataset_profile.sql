@@ -0,0 +1,6 @@
+SELECT c.name, c.datatype, b.profiles -> c.name AS profile
+FROM "column" c
+JOIN datasets d ON d.dataset_url = c.dataset_url
+LEFT JOIN dataset_blobs b ON b.content_hash = d.content_hash
+WHERE c.dataset_url = %s
+ORDER BY c.name;
@@ -0,0 +1,7 @@
+INSERT INTO "column" (email, name, datatype, example_value, dataset_url)
+VALUES %s
+ON CONFLICT (name, dataset_url)
+DO UPDATE SET
+    datatype = EXCLUDED.datatype,
+    example_value = EXCLUDED.example_value
+RETURNING email, name, datatype, example_value, dataset_url;
@@ -0,0 +1,3 @@
+DELETE FROM dataset_blobs
+WHERE ref_count <= 0
+RETURNING content_hash;
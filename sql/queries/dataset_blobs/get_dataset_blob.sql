@@ -0,0 +1,3 @@
+SELECT content_hash, file_type, num_rows, columns, profiles, ref_count
+FROM dataset_blobs
+WHERE content_hash = %s;
@@ -0,0 +1,3 @@
+INSERT INTO dataset_blobs (content_hash, file_type, num_rows, columns, profiles)
+VALUES (%s, %s, %s, %s, %s)
+ON CONFLICT (content_hash) DO NOTHING;
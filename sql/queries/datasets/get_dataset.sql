@@ -1,3 +1,3 @@
-SELECT dataset_url, name, file_type, uploaded_at, chat_session_id
+SELECT dataset_url, name, file_type, uploaded_at, chat_session_id, content_hash
 FROM datasets
 WHERE dataset_url = %s;
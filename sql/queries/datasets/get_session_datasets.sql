@@ -1,4 +1,4 @@
-SELECT dataset_url, name, file_type, uploaded_at, chat_session_id
+SELECT dataset_url, name, file_type, uploaded_at, chat_session_id, content_hash
 FROM datasets
 WHERE chat_session_id = %s
 ORDER BY uploaded_at DESC;
@@ -1,7 +1,8 @@
-INSERT INTO datasets (dataset_url, name, file_type, chat_session_id, uploaded_at)
-VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+INSERT INTO datasets (dataset_url, name, file_type, chat_session_id, content_hash, uploaded_at)
+VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
 ON CONFLICT (dataset_url)
 DO UPDATE SET
     name = EXCLUDED.name,
-    file_type = EXCLUDED.file_type
-RETURNING dataset_url, name, file_type, uploaded_at, chat_session_id;
+    file_type = EXCLUDED.file_type,
+    content_hash = EXCLUDED.content_hash
+RETURNING dataset_url, name, file_type, uploaded_at, chat_session_id, content_hash;
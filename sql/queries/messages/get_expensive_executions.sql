@@ -0,0 +1,6 @@
+SELECT message_id, chat_session_id, created_at, generated_code, execution_stats
+FROM messages
+WHERE execution_stats IS NOT NULL
+  AND created_at >= %s
+ORDER BY (execution_stats ->> %s)::double precision DESC NULLS LAST
+LIMIT %s;
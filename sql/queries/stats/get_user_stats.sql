@@ -0,0 +1,7 @@
+SELECT
+    us.total_datasets,
+    us.total_queries,
+    COALESCE(ms.sessions_created, 0) AS sessions_this_month
+FROM user_stats us
+LEFT JOIN user_monthly_stats ms ON ms.email = us.email AND ms.month = %s
+WHERE us.email = %s;
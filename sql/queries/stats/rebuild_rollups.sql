@@ -0,0 +1,36 @@
+LOCK TABLE chat_sessions, messages, datasets, dataset_blobs IN SHARE MODE;
+
+DELETE FROM session_summary;
+INSERT INTO session_summary (chat_session_id, dataset_count, message_count, query_count,
+                             last_message_at, last_message_preview)
+SELECT
+    cs.chat_session_id,
+    (SELECT COUNT(*) FROM datasets d WHERE d.chat_session_id = cs.chat_session_id),
+    (SELECT COUNT(*) FROM messages m WHERE m.chat_session_id = cs.chat_session_id),
+    (SELECT COUNT(*) FROM messages m WHERE m.chat_session_id = cs.chat_session_id AND m.sender = 'user'),
+    last.created_at,
+    left(last.message_txt, 200)
+FROM chat_sessions cs
+LEFT JOIN LATERAL (
+    SELECT created_at, message_txt FROM messages m
+    WHERE m.chat_session_id = cs.chat_session_id
+    ORDER BY created_at DESC, message_id DESC
+    LIMIT 1
+) last ON TRUE;
+
+DELETE FROM user_stats;
+INSERT INTO user_stats (email, total_datasets, total_queries)
+SELECT u.email, COALESCE(SUM(ss.dataset_count), 0), COALESCE(SUM(ss.query_count), 0)
+FROM "user" u
+LEFT JOIN chat_sessions cs ON cs.email = u.email
+LEFT JOIN session_summary ss ON ss.chat_session_id = cs.chat_session_id
+GROUP BY u.email;
+
+DELETE FROM user_monthly_stats;
+INSERT INTO user_monthly_stats (email, month, sessions_created)
+SELECT email, date_trunc('month', created_at)::date, COUNT(*)
+FROM chat_sessions
+GROUP BY email, date_trunc('month', created_at)::date;
+
+UPDATE dataset_blobs b
+SET ref_count = (SELECT COUNT(*) FROM datasets d WHERE d.content_hash = b.content_hash);
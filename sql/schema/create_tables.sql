@@ -24,24 +24,53 @@ CREATE TABLE IF NOT EXISTS messages (
     sender VARCHAR(50) NOT NULL CHECK (sender IN ('user', 'assistant', 'system')),
     message_txt TEXT NOT NULL,
     generated_code TEXT DEFAULT NULL,
+    -- Resource accounting of the execution that produced an assistant message.
+    execution_stats JSONB DEFAULT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     chat_session_id UUID NOT NULL,
     FOREIGN KEY (chat_session_id) REFERENCES chat_sessions(chat_session_id) ON DELETE CASCADE
 );
 
-CREATE INDEX IF NOT EXISTS idx_messages_chat_session_id ON messages(chat_session_id);
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS execution_stats JSONB DEFAULT NULL;
+
+-- Serves keyset pagination on (created_at, message_id) within a session and
+-- replaces the former single-column idx_messages_chat_session_id.
+DROP INDEX IF EXISTS idx_messages_chat_session_id;
+CREATE INDEX IF NOT EXISTS idx_messages_session_created ON messages(chat_session_id, created_at, message_id);
 CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages(created_at);
 
+-- One row per distinct file content (SHA-256 of the downloaded bytes). Every
+-- dataset URL with the same content shares the parsed copy, column summary
+-- and profiles. ref_count is kept by the trigger on datasets below; blobs
+-- that drop to zero are removed by dataset_service.release_unreferenced_blobs.
+CREATE TABLE IF NOT EXISTS dataset_blobs (
+    content_hash CHAR(64) PRIMARY KEY,
+    file_type VARCHAR(50) NOT NULL,
+    num_rows BIGINT NOT NULL,
+    columns JSONB NOT NULL,
+    profiles JSONB,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_dataset_blobs_unreferenced ON dataset_blobs(content_hash) WHERE ref_count <= 0;
+
 CREATE TABLE IF NOT EXISTS datasets (
     dataset_url VARCHAR(1000) PRIMARY KEY,
     name VARCHAR(255) NOT NULL,
     file_type VARCHAR(50) NOT NULL CHECK (file_type IN ('csv', 'excel', 'xlsx', 'xls')),
     uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     chat_session_id UUID NOT NULL,
+    content_hash CHAR(64) REFERENCES dataset_blobs(content_hash),
     FOREIGN KEY (chat_session_id) REFERENCES chat_sessions(chat_session_id) ON DELETE CASCADE
 );
 
+-- Added to existing databases here; rows registered before it stay NULL
+-- until the dataset is analyzed again.
+ALTER TABLE datasets ADD COLUMN IF NOT EXISTS content_hash CHAR(64) REFERENCES dataset_blobs(content_hash);
+
 CREATE INDEX IF NOT EXISTS idx_datasets_chat_session_id ON datasets(chat_session_id);
+CREATE INDEX IF NOT EXISTS idx_datasets_content_hash ON datasets(content_hash);
 
 CREATE TABLE IF NOT EXISTS "column" (
     email VARCHAR(255) NOT NULL,
@@ -54,9 +83,188 @@ CREATE TABLE IF NOT EXISTS "column" (
     FOREIGN KEY (dataset_url) REFERENCES datasets(dataset_url) ON DELETE CASCADE
 );
 
+-- Column profiles now live once per content in dataset_blobs.profiles.
+ALTER TABLE "column" DROP COLUMN IF EXISTS profile;
+
 CREATE INDEX IF NOT EXISTS idx_column_dataset_url ON "column"(dataset_url);
 CREATE INDEX IF NOT EXISTS idx_column_email ON "column"(email);
 
+CREATE TABLE IF NOT EXISTS artifacts (
+    artifact_hash CHAR(64) PRIMARY KEY,
+    content_type VARCHAR(100) NOT NULL,
+    byte_size INTEGER NOT NULL,
+    data BYTEA NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Rollups kept current by the triggers below so stats and session lists are
+-- key lookups instead of COUNT joins. Rebuild with
+-- `python -m src.stats_service reconcile`.
+CREATE TABLE IF NOT EXISTS user_stats (
+    email VARCHAR(255) PRIMARY KEY,
+    total_datasets INTEGER NOT NULL DEFAULT 0,
+    total_queries INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (email) REFERENCES "user"(email) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS user_monthly_stats (
+    email VARCHAR(255) NOT NULL,
+    month DATE NOT NULL,
+    sessions_created INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (email, month),
+    FOREIGN KEY (email) REFERENCES "user"(email) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS session_summary (
+    chat_session_id UUID PRIMARY KEY,
+    dataset_count INTEGER NOT NULL DEFAULT 0,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    query_count INTEGER NOT NULL DEFAULT 0,
+    last_message_at TIMESTAMP,
+    last_message_preview VARCHAR(200),
+    FOREIGN KEY (chat_session_id) REFERENCES chat_sessions(chat_session_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_email_created_at ON chat_sessions(email, created_at DESC);
+
+CREATE OR REPLACE FUNCTION rollup_chat_session_insert() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO session_summary (chat_session_id) VALUES (NEW.chat_session_id)
+    ON CONFLICT (chat_session_id) DO NOTHING;
+
+    INSERT INTO user_stats (email) VALUES (NEW.email)
+    ON CONFLICT (email) DO NOTHING;
+
+    INSERT INTO user_monthly_stats (email, month, sessions_created)
+    VALUES (NEW.email, date_trunc('month', NEW.created_at)::date, 1)
+    ON CONFLICT (email, month)
+    DO UPDATE SET sessions_created = user_monthly_stats.sessions_created + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Runs BEFORE the delete so the session's totals are still readable. The
+-- cascaded message/dataset deletes that follow no longer find the session
+-- and therefore do not subtract a second time.
+CREATE OR REPLACE FUNCTION rollup_chat_session_delete() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE user_stats us
+    SET total_datasets = us.total_datasets - ss.dataset_count,
+        total_queries = us.total_queries - ss.query_count
+    FROM session_summary ss
+    WHERE ss.chat_session_id = OLD.chat_session_id AND us.email = OLD.email;
+
+    UPDATE user_monthly_stats
+    SET sessions_created = sessions_created - 1
+    WHERE email = OLD.email AND month = date_trunc('month', OLD.created_at)::date;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_dataset_change() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE session_summary SET dataset_count = dataset_count - 1
+        WHERE chat_session_id = OLD.chat_session_id;
+
+        UPDATE user_stats us SET total_datasets = us.total_datasets - 1
+        FROM chat_sessions cs
+        WHERE cs.chat_session_id = OLD.chat_session_id AND us.email = cs.email;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE session_summary SET dataset_count = dataset_count + 1
+        WHERE chat_session_id = NEW.chat_session_id;
+
+        INSERT INTO user_stats (email, total_datasets)
+        SELECT cs.email, 1 FROM chat_sessions cs
+        WHERE cs.chat_session_id = NEW.chat_session_id
+        ON CONFLICT (email)
+        DO UPDATE SET total_datasets = user_stats.total_datasets + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dataset_blob_refcount() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.content_hash IS NOT NULL THEN
+        UPDATE dataset_blobs SET ref_count = ref_count - 1
+        WHERE content_hash = OLD.content_hash;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.content_hash IS NOT NULL THEN
+        UPDATE dataset_blobs SET ref_count = ref_count + 1
+        WHERE content_hash = NEW.content_hash;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_message_change() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE session_summary
+        SET message_count = message_count + 1,
+            query_count = query_count + (NEW.sender = 'user')::int,
+            last_message_at = NEW.created_at,
+            last_message_preview = left(NEW.message_txt, 200)
+        WHERE chat_session_id = NEW.chat_session_id;
+
+        IF NEW.sender = 'user' THEN
+            INSERT INTO user_stats (email, total_queries)
+            SELECT cs.email, 1 FROM chat_sessions cs
+            WHERE cs.chat_session_id = NEW.chat_session_id
+            ON CONFLICT (email)
+            DO UPDATE SET total_queries = user_stats.total_queries + 1;
+        END IF;
+    ELSE
+        UPDATE session_summary ss
+        SET message_count = ss.message_count - 1,
+            query_count = ss.query_count - (OLD.sender = 'user')::int,
+            last_message_at = last.created_at,
+            last_message_preview = left(last.message_txt, 200)
+        FROM (
+            SELECT max(created_at) AS max_created_at FROM messages
+            WHERE chat_session_id = OLD.chat_session_id
+        ) latest
+        LEFT JOIN LATERAL (
+            SELECT created_at, message_txt FROM messages
+            WHERE chat_session_id = OLD.chat_session_id AND created_at = latest.max_created_at
+            LIMIT 1
+        ) last ON TRUE
+        WHERE ss.chat_session_id = OLD.chat_session_id;
+
+        IF OLD.sender = 'user' THEN
+            UPDATE user_stats us SET total_queries = us.total_queries - 1
+            FROM chat_sessions cs
+            WHERE cs.chat_session_id = OLD.chat_session_id AND us.email = cs.email;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_chat_sessions_rollup_insert
+AFTER INSERT ON chat_sessions
+FOR EACH ROW EXECUTE FUNCTION rollup_chat_session_insert();
+
+CREATE OR REPLACE TRIGGER trg_chat_sessions_rollup_delete
+BEFORE DELETE ON chat_sessions
+FOR EACH ROW EXECUTE FUNCTION rollup_chat_session_delete();
+
+CREATE OR REPLACE TRIGGER trg_datasets_rollup
+AFTER INSERT OR DELETE OR UPDATE OF chat_session_id ON datasets
+FOR EACH ROW EXECUTE FUNCTION rollup_dataset_change();
+
+CREATE OR REPLACE TRIGGER trg_datasets_blob_refcount
+AFTER INSERT OR DELETE OR UPDATE OF content_hash ON datasets
+FOR EACH ROW EXECUTE FUNCTION dataset_blob_refcount();
+
+CREATE OR REPLACE TRIGGER trg_messages_rollup
+AFTER INSERT OR DELETE ON messages
+FOR EACH ROW EXECUTE FUNCTION rollup_message_change();
+
 CREATE TABLE IF NOT EXISTS share_urls (
     shared_url VARCHAR(500) PRIMARY KEY,
     chat_session_id UUID NOT NULL,
@@ -70,5 +278,10 @@ COMMENT ON TABLE "user" IS 'Stores user authentication and profile information';
 COMMENT ON TABLE chat_sessions IS 'Chat sessions where users interact with the AI for data analysis';
 COMMENT ON TABLE messages IS 'Individual messages within chat sessions';
 COMMENT ON TABLE datasets IS 'Uploaded datasets for analysis';
+COMMENT ON TABLE dataset_blobs IS 'Content-addressed (SHA-256) parsed dataset contents shared by every URL that holds them';
 COMMENT ON TABLE "column" IS 'Column metadata extracted from datasets including data types';
+COMMENT ON TABLE artifacts IS 'Content-addressed (SHA-256) binary artifacts such as chart images referenced from messages';
+COMMENT ON TABLE user_stats IS 'Per-user totals maintained by triggers';
+COMMENT ON TABLE user_monthly_stats IS 'Per-user monthly activity buckets maintained by triggers';
+COMMENT ON TABLE session_summary IS 'Per-session counts and last-message preview maintained by triggers';
 COMMENT ON TABLE share_urls IS 'Shareable links for chat sessions';
@@ -1,6 +1,16 @@
+DROP TABLE IF EXISTS session_summary CASCADE;
+DROP TABLE IF EXISTS user_monthly_stats CASCADE;
+DROP TABLE IF EXISTS user_stats CASCADE;
 DROP TABLE IF EXISTS share_urls CASCADE;
+DROP TABLE IF EXISTS artifacts CASCADE;
 DROP TABLE IF EXISTS "column" CASCADE;
 DROP TABLE IF EXISTS datasets CASCADE;
+DROP TABLE IF EXISTS dataset_blobs CASCADE;
 DROP TABLE IF EXISTS messages CASCADE;
 DROP TABLE IF EXISTS chat_sessions CASCADE;
 DROP TABLE IF EXISTS "user" CASCADE;
+DROP FUNCTION IF EXISTS rollup_chat_session_insert() CASCADE;
+DROP FUNCTION IF EXISTS rollup_chat_session_delete() CASCADE;
+DROP FUNCTION IF EXISTS rollup_dataset_change() CASCADE;
+DROP FUNCTION IF EXISTS rollup_message_change() CASCADE;
+DROP FUNCTION IF EXISTS dataset_blob_refcount() CASCADE;
@@ -1,4 +1,5 @@
 import os
+import re
 import json
 from typing import Dict, List, Any, Optional
 from google import genai
@@ -56,7 +57,8 @@ RESPONSE RULES:
 - If the answer exists in conversation history, respond with TEXT only (no code)
 - If asking about schema/columns, respond with TEXT only
 - If asking for clarification of previous results, respond with TEXT only
-- If needing NEW data analysis (calculations, filtering, aggregations, visualizations), respond with PYTHON CODE
+- If the question is a plain count/sum/average/min/max, optionally grouped by columns or by date period, with simple filters and top-N (no charts, no derived columns), respond with an AGGREGATE spec
+- If needing other NEW data analysis (calculations, filtering, aggregations, visualizations), respond with PYTHON CODE
 
 OUTPUT FORMAT:
 1. For TEXT responses, output JSON:
@@ -65,6 +67,17 @@ OUTPUT FORMAT:
 2. For CODE responses, output JSON:
 {{"type": "code", "code": "complete Python code here"}}
 
+3. For AGGREGATE responses, output JSON (the server runs it on the cached dataset):
+{{"type": "aggregate", "spec": {{
+  "group_by": ["column"],
+  "time_bucket": {{"column": "date column", "unit": "hour|day|week|month|quarter|year"}},
+  "aggregations": [{{"column": "column", "func": "count|count_distinct|sum|mean|min|max|median|stddev|variance", "as": "result name"}}],
+  "filters": [{{"column": "column", "op": "eq|ne|lt|le|gt|ge|in|not_in|between|contains|starts_with|ends_with|is_null|not_null", "value": "..."}}],
+  "order_by": "-result name",
+  "limit": 10
+}}}}
+Only "aggregations" is required; {{"func": "count"}} counts rows. Omit keys you do not need.
+
 CODE REQUIREMENTS (when type is "code"):
 - ALWAYS start with these imports in this exact order:
   import matplotlib
@@ -74,10 +87,9 @@ CODE REQUIREMENTS (when type is "code"):
   import io
   import base64
   import sys
-- Load data: df = pd.read_csv("{dataset_url}")
+- The dataset is already loaded as a pandas DataFrame named df; do not read the file or URL
 - Include df_to_markdown helper for tables
 - Print results in markdown format
-- Use exact URL provided above
 - FOR PLOTS, USE THIS EXACT PATTERN:
   ```python
   import matplotlib.pyplot as plt
@@ -156,10 +168,15 @@ Output ONLY the JSON object, nothing else."""
                 "needs_code": False,
                 "response": result.get("response", "I can help with that.")
             }
+        elif result.get("type") == "aggregate" and isinstance(result.get("spec"), dict):
+            return {
+                "needs_code": False,
+                "aggregate": result["spec"]
+            }
         elif result.get("type") == "code":
             code = result.get("code", "")
             # Clean code if it has markdown blocks
-            code = clean_generated_code(code)
+            code = clean_generated_code(code, dataset_url)
             return {
                 "needs_code": True,
                 "code": code
@@ -221,7 +238,7 @@ Generate Python code that:
    import io
    import base64
    import sys
-2. Loads data with: df = pd.read_csv("{dataset_url}")
+2. Uses the dataset, already loaded as a pandas DataFrame named df (do not read the file or URL)
 3. Performs the requested analysis
 4. Prints results in MARKDOWN FORMAT
 
@@ -286,7 +303,7 @@ def df_to_markdown(df, max_rows=None):
     return df.to_markdown(index=False) + note
 
 try:
-    df = pd.read_csv("{dataset_url}")
+    # df is already loaded
     # Your analysis here
     result_df = df[['col1', 'col2']]  # example
     print(df_to_markdown(result_df))  # shows all rows
@@ -361,7 +378,7 @@ Generate Python code that:
    import io
    import base64
    import sys
-2. Loads data with: df = pd.read_csv("{dataset_url}")
+2. Uses the dataset, already loaded as a pandas DataFrame named df (do not read the file or URL)
 3. Performs the requested analysis
 4. Prints results in MARKDOWN FORMAT
 
@@ -420,7 +437,7 @@ def df_to_markdown(df, max_rows=None):
     return df.to_markdown(index=False) + note
 
 try:
-    df = pd.read_csv("{dataset_url}")
+    # df is already loaded
     # Your analysis here
     result_df = df[['col1', 'col2']]  # example
     print(df_to_markdown(result_df))  # shows all rows
@@ -445,7 +462,7 @@ Output ONLY executable Python code. No markdown code blocks, no explanations."""
         yield f"# Error: {str(e)}"
 
 
-def clean_generated_code(code: str) -> str:
+def clean_generated_code(code: str, dataset_url: Optional[str] = None) -> str:
     code = code.strip()
     if code.startswith("```python"):
         code = code[len("```python"):].strip()
@@ -453,6 +470,13 @@ def clean_generated_code(code: str) -> str:
         code = code[3:].strip()
     if code.endswith("```"):
         code = code[:-3].strip()
+    if dataset_url:
+        # The executor provides df (each run gets its own copy-on-write view);
+        # reading the URL again would re-download and re-parse it.
+        code = re.sub(
+            r"pd\.read_(?:csv|excel)\(\s*['\"]" + re.escape(dataset_url) + r"['\"][^)]*\)",
+            "df", code,
+        )
     return code
 
 
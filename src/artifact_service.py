@@ -0,0 +1,118 @@
+import base64
+import binascii
+import hashlib
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+from .database import get_db_cursor, execute_statement, execute_batch_statement
+
+# Prefix of the URL stored in messages in place of inline images. Leave empty
+# for paths relative to the API, or set to the public API origin.
+ARTIFACT_BASE_URL = os.getenv("ARTIFACT_BASE_URL", "").rstrip("/")
+
+INLINE_IMAGE_PATTERN = re.compile(
+    r'!\[([^\]]*)\]\(data:(image/[A-Za-z0-9.+-]+);base64,([A-Za-z0-9+/=\s]+)\)'
+)
+ARTIFACT_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+ARTIFACT_URL_PATTERN = re.compile(r'!\[[^\]]*\]\(([^)\s]*/artifacts/([0-9a-f]{64}))\)')
+
+
+def artifact_url(artifact_hash: str) -> str:
+    return f"{ARTIFACT_BASE_URL}/artifacts/{artifact_hash}"
+
+
+def extract_inline_images(text: str) -> Tuple[str, List[Tuple[str, str, bytes]]]:
+    """
+    Replace base64 data-URI images in markdown with artifact URLs.
+    Returns the rewritten text and (hash, content_type, bytes) for each image.
+    """
+    artifacts = {}
+
+    def replace(match):
+        alt, content_type, payload = match.groups()
+        try:
+            data = base64.b64decode("".join(payload.split()), validate=True)
+        except (binascii.Error, ValueError):
+            return match.group(0)
+        artifact_hash = hashlib.sha256(data).hexdigest()
+        artifacts[artifact_hash] = (artifact_hash, content_type, data)
+        return f"![{alt}]({artifact_url(artifact_hash)})"
+
+    if "data:image/" not in text:
+        return text, []
+    rewritten = INLINE_IMAGE_PATTERN.sub(replace, text)
+    return rewritten, list(artifacts.values())
+
+
+def find_artifact_urls(text: str) -> List[str]:
+    return [match.group(1) for match in ARTIFACT_URL_PATTERN.finditer(text or "")]
+
+
+def store_artifacts(cursor, artifacts: List[Tuple[str, str, bytes]]):
+    if not artifacts:
+        return
+    execute_batch_statement(
+        cursor, 'artifacts', 'insert_artifacts',
+        [(artifact_hash, content_type, len(data), data)
+         for artifact_hash, content_type, data in artifacts]
+    )
+
+
+def externalize_images(cursor, text: str) -> str:
+    """Move inline images into the artifact table on the caller's transaction."""
+    rewritten, artifacts = extract_inline_images(text)
+    store_artifacts(cursor, artifacts)
+    return rewritten
+
+
+def get_artifact(artifact_hash: str) -> Optional[Dict[str, Any]]:
+    if not ARTIFACT_HASH_PATTERN.match(artifact_hash):
+        return None
+    with get_db_cursor(commit=False) as cursor:
+        execute_statement(cursor, 'artifacts', 'get_artifact', (artifact_hash,))
+        artifact = cursor.fetchone()
+        if not artifact:
+            return None
+        artifact = dict(artifact)
+        artifact["data"] = bytes(artifact["data"])
+        return artifact
+
+
+def backfill_message_artifacts(batch_size: int = 100) -> Dict[str, int]:
+    """Move inline images out of existing messages, one transaction per batch."""
+    last_id = "00000000-0000-0000-0000-000000000000"
+    messages_updated = 0
+    artifacts_found = 0
+
+    while True:
+        with get_db_cursor() as cursor:
+            execute_statement(cursor, 'artifacts', 'get_messages_with_inline_images',
+                              (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            for row in rows:
+                rewritten, artifacts = extract_inline_images(row["message_txt"])
+                if not artifacts:
+                    continue
+                store_artifacts(cursor, artifacts)
+                execute_statement(cursor, 'artifacts', 'update_message_text',
+                                  (rewritten, row["message_id"]))
+                messages_updated += 1
+                artifacts_found += len(artifacts)
+
+            last_id = rows[-1]["message_id"]
+
+        print(f"[artifacts] backfilled {messages_updated} messages, {artifacts_found} images so far")
+
+    return {"messages_updated": messages_updated, "artifacts_found": artifacts_found}
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["backfill"]:
+        print("Usage: python -m src.artifact_service backfill [batch_size]")
+        sys.exit(1)
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    print(backfill_message_artifacts(batch_size=size))
@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List
+
+METADATA_CACHE_TTL = float(os.getenv("METADATA_CACHE_TTL", "60"))
+METADATA_CACHE_SIZE = int(os.getenv("METADATA_CACHE_SIZE", "1000"))
+# Aggregate results are keyed by dataset content hash, so the TTL only bounds memory churn.
+AGGREGATE_CACHE_TTL = float(os.getenv("AGGREGATE_CACHE_TTL", "3600"))
+AGGREGATE_CACHE_SIZE = int(os.getenv("AGGREGATE_CACHE_SIZE", "500"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded, thread-safe LRU cache whose entries also expire after ttl seconds.
+    Values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1000, ttl: float = 60):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._data[key]
+                self._expirations += 1
+            self._misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Read-through lookup. Empty results (None, [], {}) are not cached."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = loader()
+        if value:
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
+
+
+# Metadata read on nearly every request. Writes in the services invalidate
+# the matching entries; the TTL bounds staleness across worker processes.
+users = TTLCache("users", METADATA_CACHE_SIZE, METADATA_CACHE_TTL)
+chat_sessions = TTLCache("chat_sessions", METADATA_CACHE_SIZE, METADATA_CACHE_TTL)
+dataset_columns = TTLCache("dataset_columns", METADATA_CACHE_SIZE, METADATA_CACHE_TTL)
+aggregates = TTLCache("dataset_aggregates", AGGREGATE_CACHE_SIZE, AGGREGATE_CACHE_TTL)
+
+_caches = [users, chat_sessions, dataset_columns, aggregates]
+
+
+def get_cache_stats() -> List[Dict[str, Any]]:
+    return [cache.stats() for cache in _caches]
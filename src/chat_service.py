@@ -1,71 +1,226 @@
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Any
-from .database import get_db_cursor, load_sql
+from .database import after_commit, get_db_cursor, execute_statement
+from .artifact_service import externalize_images
+from . import cache
+from . import dataset_service
+
+MESSAGES_PAGE_DEFAULT = 50
+MESSAGES_PAGE_MAX = 200
+# execution_stats keys /admin/executor/expensive can rank by.
+EXECUTION_STATS_ORDER = (
+    "execution_time", "run_seconds", "load_seconds", "startup_seconds",
+    "cpu_user_seconds", "cpu_system_seconds", "peak_rss_bytes", "stdout_bytes",
+)
 
 
 def create_chat_session(email: str, title: str = "New Chat") -> Dict[str, Any]:
     with get_db_cursor() as cursor:
-        cursor.execute(load_sql('chat_sessions', 'insert_chat_session'), (email, title))
+        execute_statement(cursor, 'chat_sessions', 'insert_chat_session', (email, title))
         session = cursor.fetchone()
         return dict(session) if session else None
 
 
 def get_chat_session(session_id: str) -> Optional[Dict[str, Any]]:
+    return cache.chat_sessions.get_or_load(session_id, lambda: _fetch_chat_session(session_id))
+
+
+def _fetch_chat_session(session_id: str) -> Optional[Dict[str, Any]]:
     with get_db_cursor(commit=False) as cursor:
-        cursor.execute(load_sql('chat_sessions', 'get_chat_session'), (session_id,))
+        execute_statement(cursor, 'chat_sessions', 'get_chat_session', (session_id,))
         session = cursor.fetchone()
         return dict(session) if session else None
 
 
 def verify_session_owner(session_id: str, email: str) -> bool:
-    with get_db_cursor(commit=False) as cursor:
-        cursor.execute(load_sql('chat_sessions', 'verify_session_owner'), (session_id, email))
-        result = cursor.fetchone()
-        return result is not None
+    # Answered from the cached session row; same check as verify_session_owner.sql.
+    session = get_chat_session(session_id)
+    return session is not None and session["email"] == email
 
 
-def get_chat_session_with_messages(session_id: str) -> Optional[Dict[str, Any]]:
+def get_chat_session_with_messages(session_id: str, limit: int = MESSAGES_PAGE_DEFAULT,
+                                   before: Optional[str] = None,
+                                   after: Optional[str] = None) -> Optional[Dict[str, Any]]:
     session = get_chat_session(session_id)
     if not session:
         return None
 
-    messages = get_messages(session_id)
+    page = get_messages_page(session_id, limit=limit, before=before, after=after)
 
     return {
         "session": session,
-        "messages": messages
+        **page
     }
 
 
 def get_user_chat_sessions(email: str) -> List[Dict[str, Any]]:
     with get_db_cursor(commit=False) as cursor:
-        cursor.execute(load_sql('chat_sessions', 'get_user_chat_sessions'), (email,))
+        execute_statement(cursor, 'chat_sessions', 'get_user_chat_sessions', (email,))
         sessions = cursor.fetchall()
         return [dict(session) for session in sessions] if sessions else []
 
 
 def update_chat_session_title(session_id: str, title: str) -> Optional[Dict[str, Any]]:
     with get_db_cursor() as cursor:
-        cursor.execute(load_sql('chat_sessions', 'update_chat_session'), (title, session_id))
+        execute_statement(cursor, 'chat_sessions', 'update_chat_session', (title, session_id))
         session = cursor.fetchone()
-        return dict(session) if session else None
+    after_commit(lambda: cache.chat_sessions.invalidate(session_id))
+    return dict(session) if session else None
 
 
 def delete_chat_session(session_id: str) -> bool:
     with get_db_cursor() as cursor:
-        cursor.execute(load_sql('chat_sessions', 'delete_chat_session'), (session_id,))
+        execute_statement(cursor, 'chat_sessions', 'delete_chat_session', (session_id,))
         result = cursor.fetchone()
-        return result is not None
 
+    def invalidate():
+        cache.chat_sessions.invalidate(session_id)
+        # The session's datasets and their columns are deleted by cascade.
+        cache.dataset_columns.clear()
 
-def add_message(session_id: str, sender: str, message_text: str, generated_code: Optional[str] = None) -> Dict[str, Any]:
+    after_commit(invalidate)
+    dataset_service.release_unreferenced_blobs()
+    return result is not None
+
+
+def add_message(session_id: str, sender: str, message_text: str, generated_code: Optional[str] = None,
+                execution_stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     with get_db_cursor() as cursor:
-        cursor.execute(load_sql('messages', 'insert_message'), (sender, message_text, session_id, generated_code))
+        message_text = externalize_images(cursor, message_text)
+        execute_statement(cursor, 'messages', 'insert_message', (
+            sender, message_text, session_id, generated_code,
+            json.dumps(execution_stats) if execution_stats is not None else None,
+        ))
         message = cursor.fetchone()
         return dict(message) if message else None
 
 
+def get_expensive_executions(order_by: str = "execution_time", days: int = 7,
+                             limit: int = 20) -> List[Dict[str, Any]]:
+    """Assistant messages whose code execution ranked highest on one execution_stats key."""
+    if order_by not in EXECUTION_STATS_ORDER:
+        raise ValueError(f"order_by must be one of {', '.join(EXECUTION_STATS_ORDER)}")
+    since = datetime.now() - timedelta(days=days)
+    with get_db_cursor(commit=False) as cursor:
+        execute_statement(cursor, 'messages', 'get_expensive_executions',
+                          (since, order_by, max(1, min(limit, MESSAGES_PAGE_MAX))))
+        return [dict(row) for row in cursor.fetchall()]
+
+
 def get_messages(session_id: str) -> List[Dict[str, Any]]:
     with get_db_cursor(commit=False) as cursor:
-        cursor.execute(load_sql('messages', 'get_messages'), (session_id,))
+        execute_statement(cursor, 'messages', 'get_messages', (session_id,))
         messages = cursor.fetchall()
         return [dict(message) for message in messages] if messages else []
+
+
+def encode_message_cursor(message: Dict[str, Any]) -> str:
+    raw = f"{message['created_at'].isoformat()}|{message['message_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_message_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, message_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), str(uuid.UUID(message_id))
+    except Exception:
+        raise ValueError("Invalid message cursor")
+
+
+def get_messages_page(session_id: str, limit: int = MESSAGES_PAGE_DEFAULT,
+                      before: Optional[str] = None,
+                      after: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Keyset-paginated history on (created_at, message_id), oldest first within a page.
+    Without a cursor the most recent page is returned; prev_cursor pages towards
+    older messages and next_cursor towards newer ones.
+    """
+    if before and after:
+        raise ValueError("Pass either before or after, not both")
+    limit = max(1, min(limit, MESSAGES_PAGE_MAX))
+
+    with get_db_cursor(commit=False) as cursor:
+        if after:
+            created_at, message_id = decode_message_cursor(after)
+            execute_statement(cursor, 'messages', 'get_messages_after',
+                              (session_id, created_at, message_id, limit + 1))
+        elif before:
+            created_at, message_id = decode_message_cursor(before)
+            execute_statement(cursor, 'messages', 'get_messages_before',
+                              (session_id, created_at, message_id, limit + 1))
+        else:
+            execute_statement(cursor, 'messages', 'get_messages_latest', (session_id, limit + 1))
+        rows = cursor.fetchall()
+
+    has_more = len(rows) > limit
+    messages = [dict(row) for row in rows[:limit]]
+    if not after:
+        # Older pages are fetched newest first; flip them back to chronological order.
+        messages.reverse()
+
+    first = messages[0] if messages else None
+    last = messages[-1] if messages else None
+    return {
+        "messages": messages,
+        **_page_cursors(has_more, first, last, before, after)
+    }
+
+
+def _page_cursors(has_more: bool, first: Optional[Dict[str, Any]], last: Optional[Dict[str, Any]],
+                  before: Optional[str], after: Optional[str]) -> Dict[str, Optional[str]]:
+    if after:
+        prev_cursor = encode_message_cursor(first) if first else None
+        next_cursor = encode_message_cursor(last) if has_more else None
+    else:
+        prev_cursor = encode_message_cursor(first) if has_more else None
+        next_cursor = encode_message_cursor(last) if before and last else None
+    return {"next_cursor": next_cursor, "prev_cursor": prev_cursor}
+
+
+def get_chat_session_document(session_id: str, email: Optional[str] = None,
+                              limit: int = MESSAGES_PAGE_DEFAULT,
+                              before: Optional[str] = None,
+                              after: Optional[str] = None) -> Optional[tuple[bool, bytes]]:
+    """
+    The /full document (session, one page of messages, cursors) serialized by
+    Postgres in one query. Returns (authorized, json_bytes), or None if the
+    session does not exist. authorized is False when email is not the owner.
+    """
+    if before and after:
+        raise ValueError("Pass either before or after, not both")
+    limit = max(1, min(limit, MESSAGES_PAGE_MAX))
+
+    direction, cursor_created_at, cursor_message_id = "latest", None, None
+    if before or after:
+        direction = "before" if before else "after"
+        cursor_created_at, cursor_message_id = decode_message_cursor(before or after)
+
+    with get_db_cursor(commit=False) as cursor:
+        execute_statement(cursor, 'chat_sessions', 'get_session_document',
+                          (session_id, direction, cursor_created_at, cursor_message_id, limit, email))
+        row = cursor.fetchone()
+
+    if not row:
+        return None
+    if not row["authorized"]:
+        return False, b""
+
+    first = {"created_at": row["first_created_at"], "message_id": row["first_message_id"]} \
+        if row["first_message_id"] else None
+    last = {"created_at": row["last_created_at"], "message_id": row["last_message_id"]} \
+        if row["last_message_id"] else None
+    cursors = _page_cursors(row["has_more"], first, last, before, after)
+
+    # Splice the pre-serialized pieces; the message rows never become Python objects.
+    document = "".join((
+        '{"session":', row["session_json"],
+        ',"messages":', row["messages_json"],
+        ',"next_cursor":', json.dumps(cursors["next_cursor"]),
+        ',"prev_cursor":', json.dumps(cursors["prev_cursor"]),
+        '}'
+    ))
+    return True, document.encode()
@@ -0,0 +1,186 @@
+"""
+Static analysis of generated code: which dataset columns it reads from the
+injected `df`, so the sandbox can load only those.
+"""
+import ast
+from typing import Dict, List, Optional, Set
+
+DATASET_NAME = "df"
+
+# Methods whose result still holds every column of the frame (rows
+# filtered, reordered or copied). The result is tracked like df itself.
+ROW_METHODS = {
+    "head", "tail", "copy", "sort_values", "sort_index", "sample", "reset_index",
+    "set_index", "nlargest", "nsmallest", "fillna", "rename", "assign", "astype",
+}
+# Row methods that look at every column unless given a subset.
+SUBSET_METHODS = {"dropna", "drop_duplicates"}
+FRAME_ATTRIBUTES = {"index", "empty"}
+# Calls that can reach df without naming it.
+DYNAMIC_NAMES = {"globals", "locals", "vars", "eval", "exec", "__import__"}
+
+
+class _Inconclusive(Exception):
+    pass
+
+
+def referenced_columns(code: str, columns: List[str]) -> Optional[List[str]]:
+    """
+    The columns of `columns` the code can read from df, in schema order, or
+    None when that cannot be told statically (df is printed whole, passed
+    to a function, described, ...) and the full frame must be loaded. An
+    empty list means the code never touches df. Code that uses df without
+    naming a column (len(df), df.empty, df.index) gets the first column, so
+    the frame it sees keeps every row.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    parents: Dict[ast.AST, ast.AST] = {}
+    for node in ast.walk(tree):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+
+    known = set(columns)
+    referenced: Set[str] = set()
+    for node in ast.walk(tree):
+        # Over-approximate: any string or attribute spelling a column name.
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value in known:
+            referenced.add(node.value)
+        elif isinstance(node, ast.Attribute) and node.attr in known:
+            referenced.add(node.attr)
+        elif isinstance(node, ast.Name) and node.id in DYNAMIC_NAMES:
+            return None
+
+    aliases = {DATASET_NAME}
+    try:
+        while True:
+            found = set()
+            for name in _frame_names(tree, aliases):
+                found |= _check_frame_use(name, parents, known)
+            if found <= aliases:
+                break
+            aliases |= found
+    except _Inconclusive:
+        return None
+    if not _frame_names(tree, {DATASET_NAME}):
+        return []
+    projection = [name for name in columns if name in referenced]
+    if not projection:
+        return columns[:1] or None
+    return projection
+
+
+def _frame_names(tree: ast.AST, aliases: Set[str]) -> List[ast.Name]:
+    """Name nodes that refer to a tracked frame, skipping functions whose parameters shadow them."""
+    names = []
+
+    def visit(node: ast.AST, shadowed: Set[str]):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            arguments = node.args
+            shadowed = shadowed | {
+                arg.arg for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs
+            } | {arg.arg for arg in (arguments.vararg, arguments.kwarg) if arg}
+        elif isinstance(node, ast.Name) and node.id in aliases and node.id not in shadowed:
+            names.append(node)
+        for child in ast.iter_child_nodes(node):
+            visit(child, shadowed)
+
+    visit(tree, set())
+    return names
+
+
+def _check_frame_use(node: ast.Name, parents: Dict[ast.AST, ast.AST], known: Set[str]) -> Set[str]:
+    """
+    Follow one reference to a full frame up the tree until a column is
+    selected. Returns names newly bound to a full frame; raises
+    _Inconclusive when the frame is used as a whole.
+    """
+    if not isinstance(node.ctx, ast.Load):
+        parent = parents.get(node)
+        if isinstance(parent, (ast.Assign, ast.AnnAssign)) or isinstance(node.ctx, ast.Del):
+            return set()
+        raise _Inconclusive()
+
+    current: ast.AST = node
+    while True:
+        parent = parents.get(current)
+        if isinstance(parent, ast.Subscript) and parent.value is current:
+            if _is_column_selector(parent.slice):
+                return set()
+            if not isinstance(parent.ctx, ast.Load):
+                return set()
+            current = parent  # row selection (mask, slice, ...)
+            continue
+        if isinstance(parent, ast.Attribute) and parent.value is current:
+            attribute = parent.attr
+            grandparent = parents.get(parent)
+            if attribute in known or attribute in FRAME_ATTRIBUTES:
+                return set()
+            if attribute == "shape":
+                if (isinstance(grandparent, ast.Subscript) and isinstance(grandparent.slice, ast.Constant)
+                        and grandparent.slice.value == 0):
+                    return set()
+                raise _Inconclusive()
+            if attribute in ("loc", "iloc") and isinstance(grandparent, ast.Subscript):
+                selector = grandparent.slice
+                if isinstance(selector, ast.Tuple) and len(selector.elts) == 2:
+                    column_part = selector.elts[1]
+                    if attribute == "loc" and _is_column_selector(column_part):
+                        return set()
+                    if not _is_full_slice(column_part):
+                        raise _Inconclusive()
+                if not isinstance(grandparent.ctx, ast.Load):
+                    return set()
+                current = grandparent
+                continue
+            if isinstance(grandparent, ast.Call) and grandparent.func is parent:
+                if attribute in ROW_METHODS or (
+                        attribute in SUBSET_METHODS
+                        and any(keyword.arg == "subset" for keyword in grandparent.keywords)):
+                    current = grandparent
+                    continue
+                if attribute == "groupby":
+                    _check_group_use(grandparent, parents)
+                    return set()
+            raise _Inconclusive()
+        if (isinstance(parent, ast.Call) and isinstance(parent.func, ast.Name)
+                and parent.func.id == "len" and current in parent.args):
+            return set()
+        if isinstance(parent, ast.Assign) and parent.value is current:
+            if all(isinstance(target, ast.Name) for target in parent.targets):
+                return {target.id for target in parent.targets}
+            raise _Inconclusive()
+        if isinstance(parent, ast.Expr):
+            return set()
+        raise _Inconclusive()
+
+
+def _check_group_use(groupby: ast.Call, parents: Dict[ast.AST, ast.AST]):
+    """A groupby of the full frame is fine once columns are picked or named aggregations are used."""
+    parent = parents.get(groupby)
+    if isinstance(parent, ast.Subscript) and parent.value is groupby and _is_column_selector(parent.slice):
+        return
+    if isinstance(parent, ast.Attribute) and parent.value is groupby:
+        if parent.attr in ("size", "ngroups", "groups", "indices"):
+            return
+        call = parents.get(parent)
+        if parent.attr in ("agg", "aggregate") and isinstance(call, ast.Call) and call.func is parent:
+            if (not call.args and call.keywords) or (len(call.args) == 1 and isinstance(call.args[0], ast.Dict)):
+                return
+    raise _Inconclusive()
+
+
+def _is_column_selector(node: ast.AST) -> bool:
+    """'col' or ['a', 'b'] (a literal list or tuple of strings)."""
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, str)
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return all(isinstance(element, ast.Constant) and isinstance(element.value, str)
+                   for element in node.elts)
+    return False
+
+
+def _is_full_slice(node: ast.AST) -> bool:
+    return isinstance(node, ast.Slice) and node.lower is None and node.upper is None and node.step is None
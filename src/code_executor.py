@@ -2,13 +2,316 @@ import subprocess
 import tempfile
 import os
 import sys
-from typing import Dict, Any
+import json
+import re
+import select
+import threading
+from typing import Dict, Any, List, Optional, Tuple
 import time
 import signal
 
+from . import dataset_cache
+from .code_analysis import referenced_columns
+from .execution_scheduler import EXECUTOR_MAX_CONCURRENCY, ExecutionScheduler, default_concurrency
+
+# Warm fork servers kept for executions; each runs one execution at a time.
+# EXECUTOR_POOL_MAX_SIZE=0 disables the pool and every run starts a fresh
+# interpreter.
+EXECUTOR_POOL_MIN_SIZE = int(os.getenv("EXECUTOR_POOL_MIN_SIZE", "1"))
+EXECUTOR_POOL_MAX_SIZE = int(os.getenv("EXECUTOR_POOL_MAX_SIZE", "4"))
+# A fork server is replaced after this many executions, or once its own
+# resident memory passes EXECUTOR_MAX_RSS_MB.
+EXECUTOR_MAX_RUNS = int(os.getenv("EXECUTOR_MAX_RUNS", "200"))
+EXECUTOR_MAX_RSS_MB = float(os.getenv("EXECUTOR_MAX_RSS_MB", "1024"))
+# Seconds a fork server above the minimum may sit idle before it is stopped.
+EXECUTOR_IDLE_TIMEOUT = float(os.getenv("EXECUTOR_IDLE_TIMEOUT", "300"))
+# Modules imported once by each fork server and inherited by every child.
+EXECUTOR_PRELOAD = os.getenv("EXECUTOR_PRELOAD", "numpy,pandas,pyarrow,matplotlib,matplotlib.pyplot,tabulate")
+# Per-execution limits; 0 disables one. The memory limit is address space
+# the code may map on top of the process it starts in. The output limit
+# applies to stdout, stderr and each file the code writes.
+EXECUTOR_MEMORY_LIMIT_MB = float(os.getenv("EXECUTOR_MEMORY_LIMIT_MB", "2048"))
+EXECUTOR_CPU_LIMIT_SECONDS = int(os.getenv("EXECUTOR_CPU_LIMIT_SECONDS", "120"))
+EXECUTOR_MAX_OPEN_FILES = int(os.getenv("EXECUTOR_MAX_OPEN_FILES", "256"))
+EXECUTOR_MAX_OUTPUT_MB = float(os.getenv("EXECUTOR_MAX_OUTPUT_MB", "16"))
+EXECUTOR_START_TIMEOUT = 60
+# Seconds before starting a fork server is retried after a failed start.
+EXECUTOR_RESTART_BACKOFF = 30
+KILL_GRACE_SECONDS = 5
+
+SANDBOX_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_server.py")
+
+EXECUTION_LIMITS = {
+    "memory_bytes": int(EXECUTOR_MEMORY_LIMIT_MB * 1024 * 1024),
+    "cpu_seconds": EXECUTOR_CPU_LIMIT_SECONDS,
+    "open_files": EXECUTOR_MAX_OPEN_FILES,
+    "output_bytes": int(EXECUTOR_MAX_OUTPUT_MB * 1024 * 1024),
+}
+
+
+class _ForkServer:
+    """
+    One sandbox_server.py process with the heavy modules imported. Each
+    execution is a fresh fork of it, in its own process group.
+    """
 
-class CodeExecutor:
     def __init__(self):
+        env = os.environ.copy()
+        env["EXECUTOR_PRELOAD"] = EXECUTOR_PRELOAD
+        env["PYTHONUNBUFFERED"] = "1"
+        self.process = subprocess.Popen(
+            [sys.executable, SANDBOX_SERVER],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            bufsize=0,
+            start_new_session=True
+        )
+        self._buffer = b""
+        self.runs = 0
+        self.rss = 0
+        # Memory held by DataFrames the server keeps for its children.
+        self.dataset_bytes = 0
+        self.last_used = time.monotonic()
+        try:
+            ready = self._read(EXECUTOR_START_TIMEOUT)
+        except RuntimeError:
+            ready = None
+        if not ready or not ready.get("ready"):
+            self.close()
+            raise RuntimeError("Sandbox fork server failed to start")
+        self.rss = ready["rss"]
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, code_file: str, cwd: str, stdout_path: str, stderr_path: str, timeout: float,
+            dataset_path: Optional[str] = None,
+            columns: Optional[List[str]] = None) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Run code_file in a forked child, with `columns` (all when None) of
+        dataset_path loaded as df. Returns (the server's exit reply with the
+        child's exit code and resource usage, timed_out); the reply is None
+        if the server had to be stopped.
+        """
+        deadline = time.monotonic() + timeout
+        self.runs += 1
+        request = {"code_file": code_file, "cwd": cwd, "stdout": stdout_path, "stderr": stderr_path,
+                   "dataset": dataset_path, "columns": columns, "limits": EXECUTION_LIMITS}
+        self.process.stdin.write((json.dumps(request) + "\n").encode())
+
+        started = self._read(timeout)
+        if started is None:
+            self.close()
+            raise RuntimeError("Sandbox fork server did not respond")
+        finished = self._read(max(deadline - time.monotonic(), 0))
+        if finished is not None:
+            self._account(finished)
+            return finished, False
+
+        # Same semantics as a cold run: terminate the whole process group,
+        # escalating to SIGKILL if it does not go away.
+        _kill_group(started["pid"], signal.SIGTERM)
+        finished = self._read(KILL_GRACE_SECONDS)
+        if finished is None:
+            _kill_group(started["pid"], signal.SIGKILL)
+            finished = self._read(KILL_GRACE_SECONDS)
+        if finished is None:
+            self.close()
+        else:
+            self._account(finished)
+        return finished, True
+
+    def _account(self, reply: Dict[str, Any]):
+        self.rss = reply["rss"]
+        self.dataset_bytes = reply.get("dataset_bytes", 0)
+
+    def close(self):
+        if self.alive():
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+    def _read(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next reply line, or None if none arrives within timeout."""
+        deadline = time.monotonic() + timeout
+        fd = self.process.stdout.fileno()
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                return None
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise RuntimeError("Sandbox fork server exited")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return json.loads(line)
+
+
+def _kill_group(pid: int, sig: int):
+    try:
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class SandboxPool:
+    """
+    Warm fork servers handed out one execution at a time. The pool grows
+    towards max_size while callers are queued for a server, and servers
+    above min_size are stopped after idle_timeout. Servers are replaced after
+    max_runs executions or once their resident memory, not counting the
+    datasets they keep loaded, passes max_rss.
+    """
+
+    def __init__(self, min_size: int, max_size: int, max_runs: int,
+                 max_rss: int, idle_timeout: float):
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.max_runs = max_runs
+        self.max_rss = max_rss
+        self.idle_timeout = idle_timeout
+        # True while the last attempt to start a server failed; callers then
+        # fall back to cold runs instead of queueing.
+        self.broken = False
+        self._failed_at = 0.0
+        self._idle: List[_ForkServer] = []
+        self._size = 0
+        self._starting = 0
+        self._waiting = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._started = 0
+        self._retired = 0
+        self._acquired = 0
+        self._wait_seconds = 0.0
+
+    def start(self):
+        """Start min_size servers in the background."""
+        with self._cond:
+            while self._size < self.min_size:
+                self._spawn_locked()
+
+    def acquire(self, timeout: float) -> Optional[_ForkServer]:
+        """An idle server, or None if the pool is broken or none frees up within timeout."""
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while not self._closed:
+                    self._reap_idle_locked()
+                    while self._idle:
+                        server = self._idle.pop()
+                        if server.alive():
+                            self._acquired += 1
+                            self._wait_seconds += time.monotonic() - start
+                            return server
+                        self._retire_locked(server)
+                    if self.broken and self._starting == 0:
+                        if time.monotonic() - self._failed_at > EXECUTOR_RESTART_BACKOFF and self._size < self.max_size:
+                            self._spawn_locked()
+                        return None
+                    # Autoscale: one server starting per queued caller, up to max_size.
+                    if self._size < self.max_size and self._starting < self._waiting:
+                        self._spawn_locked()
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self._cond.wait(remaining)
+                return None
+            finally:
+                self._waiting -= 1
+
+    def release(self, server: _ForkServer):
+        with self._cond:
+            if (self._closed or not server.alive() or server.runs >= self.max_runs
+                    or server.rss - server.dataset_bytes > self.max_rss):
+                self._retire_locked(server)
+                if not self._closed and self._size < max(self.min_size, min(self._waiting, self.max_size)):
+                    self._spawn_locked()
+            else:
+                server.last_used = time.monotonic()
+                self._idle.append(server)
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "starting": self._starting,
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "broken": self.broken,
+                "started": self._started,
+                "retired": self._retired,
+                "executions": self._acquired,
+                "avg_wait_seconds": self._wait_seconds / self._acquired if self._acquired else 0.0,
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for server in idle:
+            server.close()
+
+    def _spawn_locked(self):
+        self._size += 1
+        self._starting += 1
+        threading.Thread(target=self._start_server, name="sandbox-start", daemon=True).start()
+
+    def _start_server(self):
+        try:
+            server = _ForkServer()
+        except Exception as e:
+            print(f"[CodeExecutor] Failed to start sandbox fork server: {str(e)}")
+            server = None
+        with self._cond:
+            self._starting -= 1
+            if server is None:
+                self._size -= 1
+                self.broken = True
+                self._failed_at = time.monotonic()
+            elif self._closed:
+                self._size -= 1
+                server.close()
+            else:
+                self.broken = False
+                self._started += 1
+                server.last_used = time.monotonic()
+                self._idle.append(server)
+            self._cond.notify_all()
+
+    def _retire_locked(self, server: _ForkServer):
+        self._size -= 1
+        self._retired += 1
+        threading.Thread(target=server.close, name="sandbox-stop", daemon=True).start()
+
+    def _reap_idle_locked(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        for server in list(self._idle):
+            if self._size <= self.min_size:
+                break
+            if server.last_used < cutoff:
+                self._idle.remove(server)
+                self._retire_locked(server)
+
+
+class CodeExecutor:
+    def __init__(self, pool: Optional[SandboxPool] = None,
+                 scheduler: Optional[ExecutionScheduler] = None):
         """Initialize the secure subprocess-based code executor."""
         # Whitelist of allowed imports for security
         self.allowed_imports = {
@@ -17,6 +320,11 @@ class CodeExecutor:
             'json', 'csv', 'io', 'os', 'sys', 'math', 're', 'datetime',
             'collections', 'itertools', 'functools', 'warnings'
         }
+        self.pool = pool
+        # Admission control; without one every call runs at once.
+        self.scheduler = scheduler
+        self._cold_runs = 0
+        self._lock = threading.Lock()
 
     def _validate_code(self, code: str) -> tuple[bool, str]:
         """Basic validation to check for dangerous operations."""
@@ -25,15 +333,28 @@ class CodeExecutor:
             'eval(', 'exec(', 'compile(', 'open(', 'file(',
             'input(', 'raw_input('
         ]
-        
+
         for pattern in dangerous_patterns:
             if pattern in code:
                 return False, f"Potentially dangerous operation detected: {pattern}"
-        
+
         return True, ""
 
-    def execute_code(self, code: str, timeout: int = 60) -> Dict[str, Any]:
-        """Execute Python code in a secure subprocess with timeout and resource limits."""
+    def execute_code(self, code: str, timeout: int = 60, dataset_url: Optional[str] = None,
+                     columns: Optional[List[str]] = None, user: Optional[str] = None,
+                     priority: str = "interactive", deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Execute Python code in a secure subprocess with timeout and resource
+        limits. With dataset_url, the cached copy of the dataset is available
+        to the code as the DataFrame `df`. Given the dataset's column names,
+        only the columns the code references are loaded (see code_analysis);
+        result["dataset_columns"] reports how many.
+
+        The run waits for a scheduler slot, shared fairly between users, for
+        at most `deadline` seconds (default: timeout); the timeout itself
+        starts once the run is admitted. Raises AdmissionRejected when the
+        queue is too long to start in time.
+        """
         start_time = time.time()
 
         # Validate code for dangerous operations
@@ -46,9 +367,105 @@ class CodeExecutor:
                 "execution_time": 0
             }
 
-        with tempfile.TemporaryDirectory() as temp_dir:
+        dataset_path = None
+        if dataset_url:
+            try:
+                dataset_path = dataset_cache.datasets.local_path(dataset_url)
+            except Exception as e:
+                return {
+                    "success": False,
+                    "output": "",
+                    "error": f"Failed to load dataset: {str(e)}",
+                    "execution_time": time.time() - start_time
+                }
+
+        projection = referenced_columns(code, columns) if dataset_path and columns else None
+        if self.scheduler is None:
+            result = self._run(code, timeout, start_time, dataset_path, projection)
+        else:
+            queued_at = time.time()
+            with self.scheduler.slot(user or "anonymous", priority,
+                                     timeout if deadline is None else deadline) as queue_seconds:
+                result = self._run(code, timeout, queued_at + queue_seconds, dataset_path, projection)
+            result["execution_time"] = time.time() - start_time
+            if "resources" in result:
+                result["resources"]["queue_seconds"] = queue_seconds
+                # Validation and resolving the dataset happened before queueing.
+                result["resources"]["startup_seconds"] += queued_at - start_time
+        if dataset_path and columns:
+            result["dataset_columns"] = {
+                "projected": len(projection) if projection is not None else len(columns),
+                "total": len(columns),
+            }
+        return result
+
+    def _run(self, code: str, timeout: int, start_time: float, dataset_path: Optional[str],
+             projection: Optional[List[str]]) -> Dict[str, Any]:
+        server = self.pool.acquire(timeout) if self.pool else None
+        if server is None and self.pool and not self.pool.broken:
+            return {
+                "success": False,
+                "output": "",
+                "error": f"No sandbox became available within {timeout} seconds",
+                "execution_time": time.time() - start_time
+            }
+        if server is None:
+            return self._execute_cold(code, timeout, start_time, dataset_path, projection)
+        return self._execute_pooled(server, code, timeout, start_time, dataset_path, projection)
+
+    def _execute_pooled(self, server: _ForkServer, code: str, timeout: int, start_time: float,
+                        dataset_path: Optional[str], projection: Optional[List[str]]) -> Dict[str, Any]:
+        """Run the code in a child of a pooled fork server, then hand the server back."""
+        with tempfile.TemporaryDirectory() as run_dir:
+            temp_dir = os.path.join(run_dir, "work")
+            os.mkdir(temp_dir)
+            code_file = os.path.join(temp_dir, "analysis.py")
+            stdout_path = os.path.join(run_dir, "stdout")
+            stderr_path = os.path.join(run_dir, "stderr")
+
+            with open(code_file, "w", encoding="utf-8") as f:
+                f.write(code)
+
+            try:
+                remaining = max(timeout - (time.time() - start_time), 0)
+                usage, timed_out = server.run(code_file, temp_dir, stdout_path, stderr_path,
+                                              remaining, dataset_path, projection)
+            except Exception as e:
+                return {
+                    "success": False,
+                    "output": "",
+                    "error": f"Execution error: {str(e)}",
+                    "execution_time": time.time() - start_time
+                }
+            finally:
+                self.pool.release(server)
+
+            resources = _resources(usage, stdout_path, stderr_path, start_time)
+            if timed_out:
+                return {
+                    "success": False,
+                    "output": "",
+                    "error": f"Execution timed out after {timeout} seconds",
+                    "execution_time": time.time() - start_time,
+                    "resources": resources
+                }
+            return self._result(_read_output(stdout_path), _read_output(stderr_path),
+                                usage["exit_code"], start_time, resources)
+
+    def _execute_cold(self, code: str, timeout: int, start_time: float,
+                      dataset_path: Optional[str] = None,
+                      projection: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Run the code in a fresh interpreter (no pool, or the pool cannot start servers)."""
+        with self._lock:
+            self._cold_runs += 1
+        with tempfile.TemporaryDirectory() as run_dir:
+            temp_dir = os.path.join(run_dir, "work")
+            os.mkdir(temp_dir)
             code_file = os.path.join(temp_dir, "analysis.py")
-            
+            stdout_path = os.path.join(run_dir, "stdout")
+            stderr_path = os.path.join(run_dir, "stderr")
+            stats_path = os.path.join(run_dir, "stats.json")
+
             # Write code to temporary file
             with open(code_file, "w", encoding="utf-8") as f:
                 f.write(code)
@@ -58,56 +475,48 @@ class CodeExecutor:
                 env = os.environ.copy()
                 env['PYTHONUNBUFFERED'] = '1'
                 env['TMPDIR'] = temp_dir
-                
-                # Execute code in subprocess with timeout
-                process = subprocess.Popen(
-                    [sys.executable, code_file],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    cwd=temp_dir,
-                    env=env,
-                    text=True,
-                    preexec_fn=os.setpgrp if os.name != 'nt' else None
-                )
-
-                try:
-                    stdout, stderr = process.communicate(timeout=timeout)
-                    execution_time = time.time() - start_time
-
-                    # Combine stdout and stderr
-                    output = stdout
-                    if stderr:
-                        output = f"{stdout}\n[STDERR]\n{stderr}" if stdout else stderr
-
-                    # Debug: Log output length
-                    print(f"[CodeExecutor] Output length: {len(output)} characters")
-                    print(f"[CodeExecutor] Output preview: {output[:200] if output else 'EMPTY'}...")
-
-                    success = process.returncode == 0
-
-                    return {
-                        "success": success,
-                        "output": output,
-                        "error": None if success else stderr,
-                        "execution_time": execution_time
-                    }
-
-                except subprocess.TimeoutExpired:
-                    # Kill the process group to ensure all child processes are terminated
-                    if os.name != 'nt':
-                        os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-                    else:
-                        process.terminate()
-                    
-                    process.wait(timeout=5)
-                    execution_time = time.time() - start_time
-
-                    return {
-                        "success": False,
-                        "output": "",
-                        "error": f"Execution timed out after {timeout} seconds",
-                        "execution_time": execution_time
-                    }
+
+                # Execute code in subprocess with timeout. Output goes to files
+                # so the output limit (RLIMIT_FSIZE) applies to it.
+                request = {"code_file": code_file, "dataset": dataset_path, "columns": projection,
+                           "limits": EXECUTION_LIMITS, "stats": stats_path}
+                with open(stdout_path, "wb") as stdout, open(stderr_path, "wb") as stderr:
+                    process = subprocess.Popen(
+                        [sys.executable, SANDBOX_SERVER, "--once", json.dumps(request)],
+                        stdin=subprocess.DEVNULL,
+                        stdout=stdout,
+                        stderr=stderr,
+                        cwd=temp_dir,
+                        env=env,
+                        preexec_fn=os.setpgrp if os.name != 'nt' else None
+                    )
+
+                usage = _wait(process, timeout)
+                if usage is not None:
+                    usage.update(_read_json(stats_path))
+                    resources = _resources(usage, stdout_path, stderr_path, start_time)
+                    return self._result(_read_output(stdout_path), _read_output(stderr_path),
+                                        process.returncode, start_time, resources)
+
+                # Kill the process group to ensure all child processes are terminated
+                if os.name != 'nt':
+                    os.killpg(os.getpgid(process.pid), signal.SIGTERM)
+                else:
+                    process.terminate()
+
+                usage = _wait(process, KILL_GRACE_SECONDS)
+                if usage is None and os.name != 'nt':
+                    _kill_group(process.pid, signal.SIGKILL)
+                    usage = _wait(process, KILL_GRACE_SECONDS)
+                execution_time = time.time() - start_time
+
+                return {
+                    "success": False,
+                    "output": "",
+                    "error": f"Execution timed out after {timeout} seconds",
+                    "execution_time": execution_time,
+                    "resources": _resources(usage, stdout_path, stderr_path, start_time)
+                }
 
             except Exception as e:
                 execution_time = time.time() - start_time
@@ -118,6 +527,46 @@ class CodeExecutor:
                     "execution_time": execution_time
                 }
 
+    def _result(self, stdout: str, stderr: str, returncode: int, start_time: float,
+                resources: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        execution_time = time.time() - start_time
+
+        # Combine stdout and stderr
+        output = stdout
+        if stderr:
+            output = f"{stdout}\n[STDERR]\n{stderr}" if stdout else stderr
+
+        # Debug: Log output length
+        print(f"[CodeExecutor] Output length: {len(output)} characters")
+        print(f"[CodeExecutor] Output preview: {output[:200] if output else 'EMPTY'}...")
+
+        success = returncode == 0
+        error = None if success else stderr
+        limit = None if success else _exceeded_limit(returncode, stderr, resources)
+        if limit:
+            error = f"{LIMIT_MESSAGES[limit]}\n{stderr}" if stderr else LIMIT_MESSAGES[limit]
+        if resources is not None:
+            resources["limit_exceeded"] = limit
+
+        result = {
+            "success": success,
+            "output": output,
+            "error": error,
+            "execution_time": execution_time
+        }
+        if resources is not None:
+            result["resources"] = resources
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cold_runs = self._cold_runs
+        return {
+            "pool": self.pool.stats() if self.pool else None,
+            "scheduler": self.scheduler.stats() if self.scheduler else None,
+            "cold_runs": cold_runs,
+        }
+
     def test_docker(self) -> bool:
         """Test if execution environment is working (backwards compatibility)."""
         try:
@@ -127,11 +576,147 @@ class CodeExecutor:
             return False
 
 
+LIMIT_MESSAGES = {
+    "memory": f"Memory limit of {EXECUTOR_MEMORY_LIMIT_MB:g} MB exceeded",
+    "cpu": f"CPU time limit of {EXECUTOR_CPU_LIMIT_SECONDS} seconds exceeded",
+    "output": f"Output limit of {EXECUTOR_MAX_OUTPUT_MB:g} MB exceeded",
+}
+
+
+def _exceeded_limit(returncode: int, stderr: str, resources: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Which execution limit, if any, ended a failed run."""
+    if os.name == 'nt':
+        return None
+    if returncode == -signal.SIGXFSZ:
+        return "output"
+    if returncode == -signal.SIGXCPU:
+        return "cpu"
+    if (returncode == -signal.SIGKILL and resources and EXECUTOR_CPU_LIMIT_SECONDS
+            and (resources["cpu_user_seconds"] or 0) + (resources["cpu_system_seconds"] or 0)
+            >= EXECUTOR_CPU_LIMIT_SECONDS):
+        return "cpu"
+    lines = stderr.strip().splitlines()
+    # MemoryError or a subclass such as numpy's _ArrayMemoryError.
+    if EXECUTOR_MEMORY_LIMIT_MB and lines and re.match(r"[\w.]*MemoryError\b", lines[-1]):
+        return "memory"
+    return None
+
+
+def _resources(usage: Optional[Dict[str, Any]], stdout_path: str, stderr_path: str,
+               start_time: float) -> Dict[str, Any]:
+    """
+    Resource accounting for one run. startup_seconds is everything before
+    the dataset load and the user's code: waiting for a sandbox, writing
+    files and, for cold runs, interpreter start-up. Time queued for a
+    scheduler slot is added by execute_code as queue_seconds.
+    """
+    usage = usage or {}
+    load_seconds = usage.get("load_seconds", 0.0)
+    run_seconds = usage.get("run_seconds", 0.0)
+    return {
+        "peak_rss_bytes": usage.get("peak_rss_bytes"),
+        "cpu_user_seconds": usage.get("cpu_user_seconds"),
+        "cpu_system_seconds": usage.get("cpu_system_seconds"),
+        "stdout_bytes": _file_size(stdout_path),
+        "stderr_bytes": _file_size(stderr_path),
+        "startup_seconds": max(time.time() - start_time - load_seconds - run_seconds, 0.0),
+        "load_seconds": load_seconds,
+        "run_seconds": run_seconds,
+        "limit_exceeded": None,
+    }
+
+
+def _wait(process: subprocess.Popen, timeout: float) -> Optional[Dict[str, Any]]:
+    """
+    Reap the process within timeout and return its CPU time and peak RSS, or
+    None if it is still running. Uses wait4 where available, since Popen's
+    own wait discards the child's resource usage.
+    """
+    if not hasattr(os, "wait4"):
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return None
+        return {}
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return {
+                "cpu_user_seconds": usage.ru_utime,
+                "cpu_system_seconds": usage.ru_stime,
+                # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+                "peak_rss_bytes": usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024,
+            }
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.05)
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _read_json(path: str) -> Dict[str, Any]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def execution_stats(result: Dict[str, Any]) -> Dict[str, Any]:
+    """The flat summary of an execution result that is stored with its message."""
+    stats = {
+        "success": result["success"],
+        "execution_time": result["execution_time"],
+    }
+    stats.update(result.get("resources") or {})
+    if result.get("dataset_columns"):
+        stats["columns_projected"] = result["dataset_columns"]["projected"]
+        stats["columns_total"] = result["dataset_columns"]["total"]
+    return stats
+
+
+def _read_output(path: str) -> str:
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+
 _executor_instance = None
+_executor_lock = threading.Lock()
 
 
 def get_executor() -> CodeExecutor:
     global _executor_instance
     if _executor_instance is None:
-        _executor_instance = CodeExecutor()
+        with _executor_lock:
+            if _executor_instance is None:
+                pool = None
+                concurrency = EXECUTOR_MAX_CONCURRENCY or default_concurrency(EXECUTOR_MEMORY_LIMIT_MB)
+                if EXECUTOR_POOL_MAX_SIZE > 0 and hasattr(os, "fork"):
+                    pool = SandboxPool(EXECUTOR_POOL_MIN_SIZE, EXECUTOR_POOL_MAX_SIZE, EXECUTOR_MAX_RUNS,
+                                       int(EXECUTOR_MAX_RSS_MB * 1024 * 1024), EXECUTOR_IDLE_TIMEOUT)
+                    pool.start()
+                    # More slots than fork servers would only queue in the pool.
+                    concurrency = min(concurrency, EXECUTOR_POOL_MAX_SIZE)
+                _executor_instance = CodeExecutor(pool, ExecutionScheduler(concurrency))
     return _executor_instance
+
+
+def shutdown_executor():
+    global _executor_instance
+    with _executor_lock:
+        if _executor_instance is not None and _executor_instance.pool is not None:
+            _executor_instance.pool.shutdown()
+        _executor_instance = None
@@ -1,8 +1,18 @@
 import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from contextvars import ContextVar, Token
 import psycopg2
+import psycopg2.extensions
 from psycopg2.extras import RealDictCursor
 from contextlib import contextmanager
 from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,34 +23,522 @@ SQL_DIR = os.path.join(os.path.dirname(__file__), '..', 'sql', 'queries')
 if not DATABASE_URL:
     raise ValueError("NEONDB_URL environment variable is not set")
 
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# Seconds a caller waits for a free connection before giving up.
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Idle connections above the minimum are closed after this many seconds.
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+# Connections are recycled after this many seconds regardless of activity.
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+# A connection idle for longer than this is pinged before being handed out,
+# which catches sockets dropped while Neon suspended the compute.
+DB_POOL_CHECK_AFTER = float(os.getenv("DB_POOL_CHECK_AFTER", "30"))
 
-def get_connection():
-    try:
-        conn = psycopg2.connect(DATABASE_URL)
+KEEPALIVE_OPTIONS = {
+    "keepalives": 1,
+    "keepalives_idle": int(os.getenv("DB_KEEPALIVES_IDLE", "30")),
+    "keepalives_interval": int(os.getenv("DB_KEEPALIVES_INTERVAL", "10")),
+    "keepalives_count": int(os.getenv("DB_KEEPALIVES_COUNT", "5")),
+}
+
+
+# Server-side prepared statements cannot be used through a transaction-mode
+# PgBouncer (e.g. Neon's "-pooler" host); set this to false there.
+DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "true").lower() in ("1", "true", "yes")
+
+# Statements slower than this are recorded in the slow query log.
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+DB_SLOW_QUERY_LOG_SIZE = int(os.getenv("DB_SLOW_QUERY_LOG_SIZE", "100"))
+# Fraction of slow read-only statements re-run under EXPLAIN (ANALYZE, BUFFERS)
+# on a separate connection; 0 disables it.
+DB_SLOW_QUERY_EXPLAIN_RATE = float(os.getenv("DB_SLOW_QUERY_EXPLAIN_RATE", "0"))
+
+# Statements on the per-request hot path, prepared on every pooled connection.
+HOT_STATEMENTS = (
+    ('messages', 'get_messages'),
+    ('messages', 'get_messages_latest'),
+    ('messages', 'get_messages_before'),
+    ('messages', 'get_messages_after'),
+    ('messages', 'insert_message'),
+    ('columns', 'get_dataset_columns'),
+    ('chat_sessions', 'verify_session_owner'),
+    ('chat_sessions', 'get_session_document'),
+    ('users', 'get_user'),
+)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Connection that remembers which statements it has PREPAREd."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+        # Statements whose PREPARE failed here; they run as plain SQL.
+        self.unpreparable_statements = set()
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10,
+                 timeout: float = 30, max_idle: float = 300,
+                 max_lifetime: float = 1800, check_after: float = 30,
+                 configure: Optional[Callable] = None, **connect_kwargs):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self.configure = configure
+        self.connect_kwargs = connect_kwargs
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._stats = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+        }
+
+    def open(self):
+        """Fill the pool up to min_size so the first requests find warm connections."""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(_PooledConnection(conn))
+                self._cond.notify()
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+
+        while True:
+            entry = None
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                self._reap_idle_locked()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"Timed out after {self.timeout}s waiting for a database connection"
+                        )
+                    waited = True
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    # LIFO keeps a small set of connections hot and lets the rest idle out.
+                    entry = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if entry is None:
+                try:
+                    entry = _PooledConnection(self._connect())
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_usable(entry):
+                self._discard(entry.conn)
+                continue
+
+            with self._cond:
+                self._in_use[id(entry.conn)] = entry
+                self._stats["checkouts"] += 1
+                if waited:
+                    wait_time = time.monotonic() - start
+                    self._stats["waits"] += 1
+                    self._stats["wait_time_total"] += wait_time
+                    self._stats["wait_time_max"] = max(self._stats["wait_time_max"], wait_time)
+            return entry.conn
+
+    def putconn(self, conn, discard: bool = False):
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            raise ValueError("Connection does not belong to this pool")
+
+        if not discard and not self._closed:
+            discard = not self._reset(conn)
+        if not discard and time.monotonic() - entry.created_at > self.max_lifetime:
+            discard = True
+
+        if discard or self._closed:
+            self._discard(conn)
+            return
+
+        entry.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = [entry.conn for entry in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            waits = self._stats["waits"]
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "waiting": self._waiting,
+                "checkouts": self._stats["checkouts"],
+                "waits": waits,
+                "wait_time_avg_ms": (self._stats["wait_time_total"] / waits * 1000) if waits else 0.0,
+                "wait_time_max_ms": self._stats["wait_time_max"] * 1000,
+                "timeouts": self._stats["timeouts"],
+                "connections_created": self._stats["connections_created"],
+                "connections_closed": self._stats["connections_closed"],
+                "health_check_failures": self._stats["health_check_failures"],
+            }
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, **self.connect_kwargs)
+        if self.configure is not None:
+            try:
+                self.configure(conn)
+            except Exception:
+                conn.close()
+                raise
+        with self._cond:
+            self._stats["connections_created"] += 1
         return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats["connections_closed"] += 1
+            self._cond.notify()
+
+    def _is_usable(self, entry: _PooledConnection) -> bool:
+        if entry.conn.closed:
+            return False
+        now = time.monotonic()
+        if now - entry.created_at > self.max_lifetime:
+            return False
+        if now - entry.last_used < self.check_after:
+            return True
+        try:
+            with entry.conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            entry.conn.rollback()
+            return True
+        except Exception:
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+            return False
+
+    def _reset(self, conn) -> bool:
+        if conn.closed:
+            return False
+        try:
+            if conn.autocommit:
+                conn.autocommit = False
+            if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _reap_idle_locked(self):
+        # Called with the lock held; the oldest idle connections sit at the left.
+        now = time.monotonic()
+        while (self._idle and self._size > self.min_size
+               and now - self._idle[0].last_used > self.max_idle):
+            entry = self._idle.popleft()
+            try:
+                entry.conn.close()
+            except Exception:
+                pass
+            self._size -= 1
+            self._stats["connections_closed"] += 1
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    DATABASE_URL,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    timeout=DB_POOL_TIMEOUT,
+                    max_idle=DB_POOL_MAX_IDLE,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                    check_after=DB_POOL_CHECK_AFTER,
+                    configure=_prepare_connection,
+                    connection_factory=PreparedConnection,
+                    **KEEPALIVE_OPTIONS
+                )
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    return get_pool().stats()
+
+
+class UnitOfWork:
+    """One connection and one transaction shared by every service call in a request.
+
+    The connection is checked out lazily. Reads before the first write run in
+    autocommit; the first write cursor opens a transaction that stays open until
+    commit() or rollback(). Both return the connection to the pool, so slow
+    non-database work between commit points does not pin a connection.
+    Callbacks registered with after_commit() run once the open transaction
+    commits and are dropped if it rolls back.
+
+    An error inside a cursor block rolls back the open transaction, and a
+    failed commit loses it; either way the unit of work is marked failed and
+    refuses further cursors, commits and callbacks, so writes made after the
+    lost ones can never commit on their own.
+    """
+
+    def __init__(self):
+        self._conn = None
+        self._in_transaction = False
+        self._closed = False
+        self._failed = False
+        self._after_commit: List[Callable[[], None]] = []
+        self._lock = threading.RLock()
+
+    @property
+    def active(self) -> bool:
+        return not self._closed
+
+    @contextmanager
+    def cursor(self, write: bool = True):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Unit of work is already closed")
+            self._check_failed()
+            if self._conn is None:
+                self._conn = _acquire_connection()
+                self._conn.autocommit = True
+            if write and not self._in_transaction:
+                self._conn.autocommit = False
+                self._in_transaction = True
+
+            cursor = self._conn.cursor(cursor_factory=RealDictCursor)
+            try:
+                yield cursor
+            except Exception:
+                cursor.close()
+                self._failed = self._in_transaction
+                self._release(commit=False)
+                raise
+            cursor.close()
+
+    def after_commit(self, callback: Callable[[], None]):
+        with self._lock:
+            self._check_failed()
+            if self._in_transaction:
+                self._after_commit.append(callback)
+                return
+        callback()
+
+    def commit(self):
+        with self._lock:
+            self._check_failed()
+            try:
+                self._release(commit=True)
+            except Exception:
+                self._failed = True
+                raise
+
+    def rollback(self):
+        """Discard the open transaction. Unlike an error, this does not mark the unit of work failed."""
+        with self._lock:
+            self._release(commit=False)
+
+    def close(self, commit: bool = True):
+        with self._lock:
+            try:
+                self._release(commit=commit and not self._failed)
+            finally:
+                self._closed = True
+
+    def _check_failed(self):
+        if self._failed:
+            raise RuntimeError("Unit of work was rolled back after an error; its writes are lost")
+
+    def _release(self, commit: bool):
+        conn, self._conn = self._conn, None
+        in_transaction, self._in_transaction = self._in_transaction, False
+        callbacks, self._after_commit = self._after_commit, []
+        if conn is None:
+            return
+        discard = False
+        try:
+            if in_transaction and not conn.closed:
+                if commit:
+                    conn.commit()
+                else:
+                    conn.rollback()
+        except Exception:
+            discard = True
+            if commit:
+                raise
+        finally:
+            get_pool().putconn(conn, discard=discard or bool(conn.closed))
+        if commit:
+            for callback in callbacks:
+                callback()
+
+
+_current_unit_of_work: ContextVar[Optional[UnitOfWork]] = ContextVar(
+    "current_unit_of_work", default=None
+)
+
+
+def bind_unit_of_work(uow: UnitOfWork) -> Token:
+    return _current_unit_of_work.set(uow)
+
+
+def reset_unit_of_work(token: Token):
+    _current_unit_of_work.reset(token)
+
+
+def get_unit_of_work() -> Optional[UnitOfWork]:
+    uow = _current_unit_of_work.get()
+    return uow if uow is not None and uow.active else None
+
+
+def after_commit(callback: Callable[[], None]):
+    """
+    Run `callback` once the current write is durable: at the bound unit of
+    work's commit, or right away when there is none (get_db_cursor has
+    already committed by the time its block exits).
+    """
+    uow = get_unit_of_work()
+    if uow is None:
+        callback()
+    else:
+        uow.after_commit(callback)
+
+
+@contextmanager
+def unit_of_work():
+    uow = UnitOfWork()
+    token = bind_unit_of_work(uow)
+    try:
+        yield uow
     except Exception:
+        uow.close(commit=False)
         raise
+    else:
+        uow.close(commit=True)
+    finally:
+        reset_unit_of_work(token)
 
 
 @contextmanager
 def get_db_cursor(commit=True):
-    conn = None
+    # Inside a unit of work the cursor joins its connection and the unit of
+    # work decides when to commit.
+    uow = get_unit_of_work()
+    if uow is not None:
+        with uow.cursor(write=commit) as cursor:
+            yield cursor
+        return
+
+    pool = get_pool()
+    conn = _acquire_connection()
     cursor = None
+    discard = False
     try:
-        conn = get_connection()
+        if not commit:
+            # Read-only work needs no BEGIN/ROLLBACK round trips.
+            conn.autocommit = True
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         yield cursor
         if commit:
             conn.commit()
     except Exception:
-        if conn:
-            conn.rollback()
+        try:
+            if not conn.closed and not conn.autocommit:
+                conn.rollback()
+        except Exception:
+            discard = True
         raise
     finally:
         if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+            try:
+                cursor.close()
+            except Exception:
+                discard = True
+        pool.putconn(conn, discard=discard or bool(conn.closed))
 
 
 def test_connection():
@@ -58,3 +556,408 @@ def load_sql(category: str, name: str) -> str:
     path = os.path.join(SQL_DIR, category, f"{name}.sql")
     with open(path, 'r') as f:
         return f.read()
+
+
+class StatementError(Exception):
+    pass
+
+
+class Statement:
+    __slots__ = ("category", "name", "sql", "param_count", "prepared_name",
+                 "prepare_sql", "execute_sql", "read_only")
+
+    _PLACEHOLDER = re.compile(r"%(.)", re.DOTALL)
+    _COMMENT = re.compile(r"--[^\n]*")
+    _WRITE_KEYWORD = re.compile(r"\b(INSERT|UPDATE|DELETE|LOCK|TRUNCATE)\b", re.IGNORECASE)
+
+    def __init__(self, category: str, name: str, sql: str):
+        self.category = category
+        self.name = name
+        self.sql = sql
+        self.prepared_name = None
+        self.prepare_sql = None
+        self.execute_sql = None
+
+        body = self._COMMENT.sub("", sql).strip()
+        self.read_only = (
+            body.upper().startswith(("SELECT", "WITH"))
+            and not self._WRITE_KEYWORD.search(body)
+        )
+
+        if not sql.strip():
+            raise StatementError(f"{category}/{name}.sql is empty")
+
+        markers = self._PLACEHOLDER.findall(sql)
+        invalid = [m for m in markers if m not in ("s", "%")]
+        if invalid:
+            raise StatementError(
+                f"{category}/{name}.sql uses unsupported placeholder %{invalid[0]}; only %s is allowed"
+            )
+        self.param_count = markers.count("s")
+
+    def make_preparable(self):
+        # Batched statements (execute_values "VALUES %s") cannot be prepared.
+        if re.search(r"VALUES\s+%s\s", self.sql, re.IGNORECASE):
+            raise StatementError(f"{self.category}/{self.name}.sql is a batched statement")
+
+        counter = iter(range(1, self.param_count + 1))
+        body = self._PLACEHOLDER.sub(
+            lambda m: f"${next(counter)}" if m.group(1) == "s" else "%",
+            self.sql.strip().rstrip(";")
+        )
+        self.prepared_name = f"{self.category}__{self.name}"
+        self.prepare_sql = f"PREPARE {self.prepared_name} AS {body}"
+        if self.param_count:
+            self.execute_sql = f"EXECUTE {self.prepared_name} ({', '.join(['%s'] * self.param_count)})"
+        else:
+            self.execute_sql = f"EXECUTE {self.prepared_name}"
+
+
+_statements: Dict[tuple, Statement] = {}
+_statements_lock = threading.Lock()
+_use_prepared = DB_PREPARED_STATEMENTS
+
+
+def load_statements() -> Dict[tuple, Statement]:
+    """Load and validate every file under sql/queries. Raises on the first bad file."""
+    loaded = {}
+    for category in sorted(os.listdir(SQL_DIR)):
+        category_dir = os.path.join(SQL_DIR, category)
+        if not os.path.isdir(category_dir):
+            continue
+        for filename in sorted(os.listdir(category_dir)):
+            if not filename.endswith(".sql"):
+                continue
+            name = filename[:-4]
+            loaded[(category, name)] = Statement(category, name, load_sql(category, name))
+
+    for key in HOT_STATEMENTS:
+        if key not in loaded:
+            raise StatementError(f"Hot statement {key[0]}/{key[1]}.sql does not exist")
+        loaded[key].make_preparable()
+
+    with _statements_lock:
+        _statements.clear()
+        _statements.update(loaded)
+    return loaded
+
+
+def get_statement(category: str, name: str) -> Statement:
+    statement = _statements.get((category, name))
+    if statement is None:
+        with _statements_lock:
+            statement = _statements.get((category, name))
+            if statement is None:
+                statement = Statement(category, name, load_sql(category, name))
+                if (category, name) in HOT_STATEMENTS:
+                    statement.make_preparable()
+                _statements[(category, name)] = statement
+    return statement
+
+
+def set_prepared_statements(enabled: bool):
+    """Switch between EXECUTE of prepared statements and plain SQL at runtime."""
+    global _use_prepared
+    _use_prepared = enabled
+
+
+def prepared_statements_enabled() -> bool:
+    return _use_prepared
+
+
+def _prepare_connection(conn):
+    if not DB_PREPARED_STATEMENTS:
+        return
+    # One PREPARE per statement, so a statement the database rejects (say, a
+    # migration that has not run yet) only falls back to plain SQL instead of
+    # failing every connect.
+    conn.autocommit = True
+    try:
+        for category, name in HOT_STATEMENTS:
+            _prepare_statement(conn, get_statement(category, name))
+    finally:
+        conn.autocommit = False
+
+
+def _prepare_statement(conn, statement: Statement) -> bool:
+    """PREPARE statement on an autocommit connection; a failure is logged and remembered."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(statement.prepare_sql)
+    except psycopg2.Error as e:
+        conn.unpreparable_statements.add(statement.prepared_name)
+        reason = str(e).strip().splitlines()[0]
+        print(f"[database] Running {statement.category}/{statement.name} unprepared; PREPARE failed: {reason}")
+        return False
+    conn.prepared_statements.add(statement.prepared_name)
+    return True
+
+
+def execute_statement(cursor, category: str, name: str, params: Sequence[Any] = ()):
+    """Run a sql/queries statement by name, using the connection's prepared copy when there is one."""
+    statement = get_statement(category, name)
+    conn = cursor.connection
+    prepared = getattr(conn, "prepared_statements", None)
+    sql, mode = statement.sql, "plain"
+
+    if _use_prepared and statement.prepared_name and prepared is not None:
+        if (statement.prepared_name not in prepared and conn.autocommit
+                and statement.prepared_name not in conn.unpreparable_statements):
+            # Prepared lazily when the switch was flipped on after the
+            # connection was opened; only in autocommit so a failed PREPARE
+            # cannot abort the caller's transaction.
+            _prepare_statement(conn, statement)
+        if statement.prepared_name in prepared:
+            sql, mode = statement.execute_sql, "prepared"
+
+    start = time.perf_counter()
+    try:
+        cursor.execute(sql, params)
+    except Exception:
+        _query_metrics.record_error(statement, mode)
+        raise
+    elapsed = time.perf_counter() - start
+    _query_metrics.record(statement, mode, elapsed, cursor.rowcount, params)
+
+
+def execute_batch_statement(cursor, category: str, name: str, rows: List[tuple],
+                            fetch: bool = False) -> List[Any]:
+    """Run a batched "VALUES %s" statement with execute_values as one multi-row statement."""
+    statement = get_statement(category, name)
+    start = time.perf_counter()
+    try:
+        result = execute_values(cursor, statement.sql, rows, page_size=max(len(rows), 1), fetch=fetch)
+    except Exception:
+        _query_metrics.record_error(statement, "batch")
+        raise
+    elapsed = time.perf_counter() - start
+    _query_metrics.record(statement, "batch", elapsed, len(result) if fetch else cursor.rowcount,
+                          [f"{len(rows)} rows"])
+    return result or []
+
+
+# Latency histogram bucket bounds, in seconds.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = 0
+        while index < len(LATENCY_BUCKETS) and value > LATENCY_BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation.
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(LATENCY_BUCKETS[index], self.max) if index < len(LATENCY_BUCKETS) else self.max
+        return self.max
+
+
+class _StatementStats:
+    __slots__ = ("latency", "rows", "errors")
+
+    def __init__(self):
+        self.latency = _Histogram()
+        self.rows = 0
+        self.errors = 0
+
+
+class QueryMetrics:
+    def __init__(self, slow_query_ms: float, slow_log_size: int, explain_rate: float):
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.explain_rate = explain_rate
+        self._lock = threading.Lock()
+        self._statements: Dict[tuple, _StatementStats] = {}
+        self._acquire = _Histogram()
+        self._slow_log = deque(maxlen=slow_log_size)
+
+    def record(self, statement: Statement, mode: str, elapsed: float, rows: int, params: Sequence[Any]):
+        key = (f"{statement.category}/{statement.name}", mode)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = _StatementStats()
+            stats.latency.observe(elapsed)
+            stats.rows += max(rows, 0)
+
+        if elapsed >= self.slow_query_seconds:
+            entry = {
+                "statement": key[0],
+                "mode": mode,
+                "duration_ms": round(elapsed * 1000, 3),
+                "rows": rows,
+                "param_shapes": [_param_shape(param) for param in params],
+                "at": datetime.utcnow().isoformat(),
+                "explain": None,
+            }
+            with self._lock:
+                self._slow_log.append(entry)
+            if statement.read_only and self.explain_rate > 0 and random.random() < self.explain_rate:
+                threading.Thread(target=_explain_slow_query, args=(statement, params, entry),
+                                 daemon=True).start()
+
+    def record_error(self, statement: Statement, mode: str):
+        key = (f"{statement.category}/{statement.name}", mode)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = _StatementStats()
+            stats.errors += 1
+
+    def record_acquire(self, elapsed: float):
+        with self._lock:
+            self._acquire.observe(elapsed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            statements = []
+            for (name, mode), stats in sorted(self._statements.items()):
+                latency = stats.latency
+                statements.append({
+                    "statement": name,
+                    "mode": mode,
+                    "calls": latency.count,
+                    "errors": stats.errors,
+                    "rows": stats.rows,
+                    "total_ms": round(latency.total * 1000, 3),
+                    "mean_ms": round(latency.total / latency.count * 1000, 3) if latency.count else 0.0,
+                    "p50_ms": latency.quantile(0.5) * 1000,
+                    "p95_ms": latency.quantile(0.95) * 1000,
+                    "p99_ms": latency.quantile(0.99) * 1000,
+                    "max_ms": round(latency.max * 1000, 3),
+                })
+            statements.sort(key=lambda item: item["total_ms"], reverse=True)
+            return {
+                "statements": statements,
+                "connection_acquire": {
+                    "count": self._acquire.count,
+                    "mean_ms": round(self._acquire.total / self._acquire.count * 1000, 3)
+                    if self._acquire.count else 0.0,
+                    "p95_ms": self._acquire.quantile(0.95) * 1000,
+                    "max_ms": round(self._acquire.max * 1000, 3),
+                },
+            }
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(reversed(self._slow_log))
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._acquire = _Histogram()
+            self._slow_log.clear()
+
+    def prometheus(self) -> str:
+        lines = [
+            "# HELP anygraph_db_statement_duration_seconds Execution time of sql/queries statements.",
+            "# TYPE anygraph_db_statement_duration_seconds histogram",
+        ]
+        rows_lines = [
+            "# HELP anygraph_db_statement_rows_total Rows returned or affected per statement.",
+            "# TYPE anygraph_db_statement_rows_total counter",
+        ]
+        error_lines = [
+            "# HELP anygraph_db_statement_errors_total Failed executions per statement.",
+            "# TYPE anygraph_db_statement_errors_total counter",
+        ]
+        with self._lock:
+            for (name, mode), stats in sorted(self._statements.items()):
+                labels = f'statement="{name}",mode="{mode}"'
+                lines.extend(_histogram_lines("anygraph_db_statement_duration_seconds", labels, stats.latency))
+                rows_lines.append(f"anygraph_db_statement_rows_total{{{labels}}} {stats.rows}")
+                error_lines.append(f"anygraph_db_statement_errors_total{{{labels}}} {stats.errors}")
+            acquire_lines = [
+                "# HELP anygraph_db_pool_acquire_seconds Time to check a connection out of the pool.",
+                "# TYPE anygraph_db_pool_acquire_seconds histogram",
+                *_histogram_lines("anygraph_db_pool_acquire_seconds", "", self._acquire),
+            ]
+
+        pool = get_pool_stats()
+        pool_lines = [
+            "# HELP anygraph_db_pool_connections Pooled connections by state.",
+            "# TYPE anygraph_db_pool_connections gauge",
+            f'anygraph_db_pool_connections{{state="idle"}} {pool["idle"]}',
+            f'anygraph_db_pool_connections{{state="in_use"}} {pool["in_use"]}',
+            "# HELP anygraph_db_pool_waiting Callers waiting for a connection.",
+            "# TYPE anygraph_db_pool_waiting gauge",
+            f'anygraph_db_pool_waiting {pool["waiting"]}',
+            "# HELP anygraph_db_pool_timeouts_total Checkouts that timed out.",
+            "# TYPE anygraph_db_pool_timeouts_total counter",
+            f'anygraph_db_pool_timeouts_total {pool["timeouts"]}',
+        ]
+        return "\n".join(lines + rows_lines + error_lines + acquire_lines + pool_lines) + "\n"
+
+
+def _histogram_lines(metric: str, labels: str, histogram: _Histogram) -> List[str]:
+    prefix = f"{labels}," if labels else ""
+    lines = []
+    cumulative = 0
+    for bound, bucket_count in zip(LATENCY_BUCKETS, histogram.counts):
+        cumulative += bucket_count
+        lines.append(f'{metric}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+    lines.append(f'{metric}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{metric}_sum{suffix} {histogram.total}")
+    lines.append(f"{metric}_count{suffix} {histogram.count}")
+    return lines
+
+
+def _param_shape(param: Any) -> str:
+    # Types and sizes only; parameter values never reach the log.
+    if isinstance(param, (str, bytes, list, tuple)):
+        return f"{type(param).__name__}[{len(param)}]"
+    return type(param).__name__
+
+
+def _explain_slow_query(statement: Statement, params: Sequence[Any], entry: Dict[str, Any]):
+    try:
+        with get_db_cursor(commit=False) as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement.sql.strip().rstrip(';')}", params)
+            entry["explain"] = "\n".join(row["QUERY PLAN"] for row in cursor.fetchall())
+    except Exception as e:
+        entry["explain"] = f"EXPLAIN failed: {str(e)}"
+
+
+_query_metrics = QueryMetrics(DB_SLOW_QUERY_MS, DB_SLOW_QUERY_LOG_SIZE, DB_SLOW_QUERY_EXPLAIN_RATE)
+
+
+def _acquire_connection():
+    start = time.perf_counter()
+    conn = get_pool().getconn()
+    _query_metrics.record_acquire(time.perf_counter() - start)
+    return conn
+
+
+def get_query_stats() -> Dict[str, Any]:
+    return _query_metrics.snapshot()
+
+
+def get_slow_queries() -> List[Dict[str, Any]]:
+    return _query_metrics.slow_queries()
+
+
+def reset_query_stats():
+    _query_metrics.reset()
+
+
+def get_prometheus_metrics() -> str:
+    return _query_metrics.prometheus()
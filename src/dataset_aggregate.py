@@ -0,0 +1,205 @@
+import json
+import math
+from datetime import date, datetime
+from typing import Any, Dict
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from . import cache
+from .dataset_query import (
+    check_columns, filter_mask, get_dataset_index, release_dataset_index, validate_filters
+)
+
+# Aggregation functions accepted in a spec, mapped to pyarrow's hash aggregates.
+AGGREGATIONS = {
+    "count": "count",
+    "count_distinct": "count_distinct",
+    "sum": "sum",
+    "mean": "mean",
+    "min": "min",
+    "max": "max",
+    "median": "approximate_median",
+    "stddev": "stddev",
+    "variance": "variance",
+}
+TIME_BUCKETS = ("hour", "day", "week", "month", "quarter", "year")
+AGGREGATE_MAX_ROWS = 1000
+
+
+def run_aggregate(dataset_url: str, spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Group-by aggregation over the cached dataset. spec keys (all optional
+    except aggregations):
+        group_by:     ["region"]
+        time_bucket:  {"column": "order_date", "unit": "month"}
+        aggregations: [{"column": "sales", "func": "sum", "as": "total_sales"}, {"func": "count"}]
+        filters:      same predicates as /datasets/observations
+        order_by:     "-total_sales" (comma-separated or a list, "-" for descending)
+        limit:        top-N rows after ordering (at most AGGREGATE_MAX_ROWS)
+    Results are cached per dataset content hash and canonical spec, so
+    every URL serving the same file shares them.
+    """
+    spec = _validate(spec)
+    index = get_dataset_index(dataset_url)
+    try:
+        key = (index.version, json.dumps(spec, sort_keys=True))
+        result = cache.aggregates.get(key)
+        if result is None:
+            result = _aggregate(index, spec)
+            cache.aggregates.set(key, result)
+    finally:
+        release_dataset_index(index)
+    return result
+
+
+def _validate(spec: Dict[str, Any]) -> Dict[str, Any]:
+    # Specs are written by the model, so every field is type-checked here and
+    # anything malformed is a ValueError, never an error deeper in.
+    if not isinstance(spec, dict):
+        raise ValueError("Aggregate spec must be an object")
+
+    group_by = spec.get("group_by") or []
+    if not isinstance(group_by, list) or not all(isinstance(name, str) for name in group_by):
+        raise ValueError("group_by must be a list of column names")
+
+    aggregations = spec.get("aggregations") or [{"func": "count"}]
+    if not isinstance(aggregations, list):
+        raise ValueError("aggregations must be a list")
+    for aggregation in aggregations:
+        if not isinstance(aggregation, dict):
+            raise ValueError("Each aggregation must be an object")
+        if aggregation.get("func") not in AGGREGATIONS:
+            raise ValueError(f"Unsupported aggregation: {aggregation.get('func')}")
+        if aggregation["func"] != "count" and not aggregation.get("column"):
+            raise ValueError(f"{aggregation['func']} needs a column")
+        for field in ("column", "as"):
+            if aggregation.get(field) is not None and not isinstance(aggregation[field], str):
+                raise ValueError(f"Aggregation {field} must be a string")
+
+    time_bucket = spec.get("time_bucket") or None
+    if time_bucket is not None and (
+            not isinstance(time_bucket, dict) or not isinstance(time_bucket.get("column"), str)
+            or time_bucket.get("unit") not in TIME_BUCKETS):
+        raise ValueError(f"time_bucket needs a column and a unit in {', '.join(TIME_BUCKETS)}")
+
+    filters = spec.get("filters") or []
+    if not isinstance(filters, list):
+        raise ValueError("filters must be a list")
+    validate_filters(filters)
+
+    order_by = spec.get("order_by") or None
+    if isinstance(order_by, list) and all(isinstance(name, str) for name in order_by):
+        order_by = ",".join(order_by)
+    elif order_by is not None and not isinstance(order_by, str):
+        raise ValueError("order_by must be a string or a list of column names")
+
+    limit = spec.get("limit")
+    if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 1):
+        raise ValueError("limit must be a positive integer")
+    return {
+        "group_by": group_by,
+        "time_bucket": time_bucket,
+        "aggregations": aggregations,
+        "filters": filters,
+        "order_by": order_by,
+        "limit": min(limit or AGGREGATE_MAX_ROWS, AGGREGATE_MAX_ROWS),
+    }
+
+
+def _aggregate(index, spec: Dict[str, Any]) -> Dict[str, Any]:
+    table = index.table
+    check_columns(table.schema, spec["group_by"]
+                  + [aggregation["column"] for aggregation in spec["aggregations"] if aggregation.get("column")]
+                  + ([spec["time_bucket"]["column"]] if spec["time_bucket"] else []))
+
+    mask = filter_mask(index, spec["filters"])
+    needed = set(spec["group_by"]) | {a["column"] for a in spec["aggregations"] if a.get("column")}
+    if spec["time_bucket"]:
+        needed.add(spec["time_bucket"]["column"])
+    table = table.select([name for name in table.column_names if name in needed])
+    if mask is not None:
+        table = table.filter(mask)
+
+    keys = list(spec["group_by"])
+    if spec["time_bucket"]:
+        table, bucket_key = _add_time_bucket(table, spec["time_bucket"])
+        keys.insert(0, bucket_key)
+
+    aggregations, names = [], []
+    for aggregation in spec["aggregations"]:
+        func = AGGREGATIONS[aggregation["func"]]
+        if aggregation.get("column"):
+            aggregations.append((aggregation["column"], func))
+            default_name = f"{aggregation['column']}_{aggregation['func']}"
+        else:
+            aggregations.append(([], "count_all"))
+            default_name = "count"
+        names.append(aggregation.get("as") or default_name)
+
+    try:
+        grouped = table.group_by(keys).aggregate(aggregations)
+    except (pa.ArrowNotImplementedError, pa.ArrowTypeError, pa.ArrowInvalid) as e:
+        raise ValueError(f"Aggregation not supported for these columns: {str(e)}")
+    # Key columns first, then aggregates in spec order (pyarrow's own order varies by version).
+    output_names = grouped.column_names
+    key_positions = [output_names.index(key) for key in keys]
+    aggregate_positions = [position for position in range(len(output_names)) if position not in key_positions]
+    grouped = grouped.select(key_positions + aggregate_positions).rename_columns(keys + names)
+
+    order_by = spec["order_by"]
+    if order_by:
+        sort_keys = []
+        for name in order_by.split(","):
+            name = name.strip()
+            descending = name.startswith("-")
+            name = name.lstrip("-")
+            if name not in grouped.column_names:
+                raise ValueError(f"Unknown order_by column: {name}")
+            sort_keys.append((name, "descending" if descending else "ascending"))
+        grouped = grouped.sort_by(sort_keys)
+    elif keys:
+        grouped = grouped.sort_by([(key, "ascending") for key in keys])
+
+    group_count = grouped.num_rows
+    grouped = grouped.slice(0, spec["limit"])
+    return {
+        "columns": grouped.column_names,
+        "rows": [{name: _json_value(value) for name, value in row.items()} for row in grouped.to_pylist()],
+        "group_count": group_count,
+        "truncated": group_count > grouped.num_rows,
+    }
+
+
+def _add_time_bucket(table: pa.Table, time_bucket: Dict[str, Any]):
+    name, unit = time_bucket["column"], time_bucket["unit"]
+    column = table.column(name)
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        try:
+            column = column.cast(pa.timestamp("s"))
+        except pa.ArrowInvalid:
+            raise ValueError(f"Column {name} does not hold dates")
+    elif not pa.types.is_temporal(column.type):
+        raise ValueError(f"Column {name} does not hold dates")
+    bucketed = pc.floor_temporal(column, unit=unit, week_starts_monday=True)
+    bucket_key = f"{name}_{unit}"
+    return table.append_column(bucket_key, bucketed), bucket_key
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def format_markdown(result: Dict[str, Any]) -> str:
+    """Render an aggregate result as the markdown table a chat answer would contain."""
+    if not result["rows"]:
+        return "No rows match this query."
+    table = pd.DataFrame(result["rows"], columns=result["columns"]).to_markdown(index=False)
+    if result["truncated"]:
+        table += f"\n\n*Showing {len(result['rows'])} of {result['group_count']} groups*"
+    return table
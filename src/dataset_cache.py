@@ -0,0 +1,608 @@
+import bisect
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, IO, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import requests
+
+from .parse_engines import get_engine, get_fallback_engine
+
+# In-memory tier: parsed DataFrames, evicted by their in-memory size.
+DATASET_CACHE_MEMORY_BYTES = int(os.getenv("DATASET_CACHE_MEMORY_BYTES", str(256 * 1024 * 1024)))
+# On-disk tier: Arrow IPC copies of parsed datasets plus their HTTP validators.
+DATASET_CACHE_DIR = os.getenv(
+    "DATASET_CACHE_DIR", os.path.join(tempfile.gettempdir(), "anygraph-datasets")
+)
+# Seconds a cached copy is trusted before it is revalidated with a conditional GET.
+DATASET_CACHE_REVALIDATE_AFTER = float(os.getenv("DATASET_CACHE_REVALIDATE_AFTER", "60"))
+DATASET_BATCH_ROWS = int(os.getenv("DATASET_BATCH_ROWS", "65536"))
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+DOWNLOAD_TIMEOUT = 30
+
+# Called as progress(phase, details) while a file is downloaded and parsed.
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+
+def detect_file_type(dataset_url: str, file_type: Optional[str] = None) -> str:
+    if file_type:
+        return 'excel' if file_type in ('excel', 'xlsx', 'xls') else file_type
+    path = dataset_url.split('?', 1)[0]
+    if path.endswith(('.xlsx', '.xls')):
+        return 'excel'
+    return 'csv'
+
+
+def _widen_type(current: pa.DataType, new: pa.DataType) -> pa.DataType:
+    if current.equals(new) or pa.types.is_null(new):
+        return current
+    if pa.types.is_null(current):
+        return new
+    numeric = (pa.types.is_integer, pa.types.is_floating)
+    if any(check(current) for check in numeric) and any(check(new) for check in numeric):
+        return pa.float64()
+    return pa.large_string()
+
+
+class _HashingReader(io.RawIOBase):
+    """Binary file object over a streamed HTTP body that hashes bytes as they are read."""
+
+    def __init__(self, response, progress: Optional[ProgressCallback] = None,
+                 spool: Optional[IO[bytes]] = None):
+        self._chunks = response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES)
+        self._pending = b""
+        self._progress = progress
+        # Receives a copy of the body so it can be parsed again after a failed attempt.
+        self._spool = spool
+        self._total_bytes = int(response.headers.get("Content-Length") or 0) or None
+        self.bytes_read = 0
+        self.sha256 = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+            self.bytes_read += len(self._pending)
+            if self._spool is not None:
+                self._spool.write(self._pending)
+            if self._progress:
+                self._progress("downloading", {"bytes_downloaded": self.bytes_read,
+                                               "total_bytes": self._total_bytes})
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self.sha256.update(self._pending[:size])
+        self._pending = self._pending[size:]
+        return size
+
+
+@contextmanager
+def _no_spool():
+    yield None
+
+
+class _ArrowFileWriter:
+    """
+    Appends Arrow table chunks to an Arrow IPC file while tracking the row-group
+    index, row count, column types and a first non-null example per column.
+    When a later chunk needs a wider type (int column that turns out to hold
+    floats or text), the batches written so far are re-cast one at a time.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.schema = None
+        self.num_rows = 0
+        self.batch_offsets: List[int] = []
+        self.examples: Dict[str, Optional[str]] = {}
+        self._sink = None
+        self._writer = None
+
+    def write(self, table: pa.Table):
+        for name, column in zip(table.column_names, table.columns):
+            if self.examples.get(name) is None and column.null_count < len(column):
+                self.examples[name] = str(column.drop_null()[0].as_py())
+
+        if self.schema is None:
+            self._open(table.schema)
+        elif not table.schema.equals(self.schema):
+            widened = pa.schema([
+                field.with_type(_widen_type(field.type, new_field.type))
+                for field, new_field in zip(self.schema, table.schema)
+            ])
+            if not widened.equals(self.schema):
+                self._rewrite(widened)
+            table = table.cast(widened)
+
+        for batch in table.to_batches(max_chunksize=DATASET_BATCH_ROWS):
+            if batch.num_rows == 0:
+                continue
+            self.batch_offsets.append(self.num_rows)
+            self._writer.write_batch(batch)
+            self.num_rows += batch.num_rows
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = None
+
+    def columns(self) -> List[Dict[str, Any]]:
+        dtypes = self.schema.empty_table().to_pandas(date_as_object=False).dtypes
+        return [
+            {"name": field.name, "dtype": str(dtypes.iloc[index]), "example_value": self.examples.get(field.name)}
+            for index, field in enumerate(self.schema)
+        ]
+
+    def _open(self, schema: pa.Schema):
+        self.schema = schema
+        self._sink = pa.OSFile(self.path, "wb")
+        self._writer = ipc.new_file(self._sink, schema)
+
+    def _rewrite(self, schema: pa.Schema):
+        self.close()
+        previous_path = f"{self.path}.prev"
+        os.replace(self.path, previous_path)
+        self._open(schema)
+        with pa.memory_map(previous_path) as source:
+            reader = ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                batch = pa.Table.from_batches([reader.get_batch(index)]).cast(schema)
+                for recast in batch.to_batches():
+                    self._writer.write_batch(recast)
+        os.remove(previous_path)
+
+
+class DatasetFile:
+    """
+    Memory-mapped view of a cached Arrow IPC file. Record batches act as row
+    groups: batch_offsets holds the first row of each, so a row range only
+    maps the batches it overlaps and the row count never needs a scan.
+    """
+
+    def __init__(self, path: str, meta: Dict[str, Any]):
+        self.path = path
+        self.num_rows = meta["num_rows"]
+        self.batch_offsets: List[int] = meta["batch_offsets"]
+        self._source = pa.memory_map(path)
+        self._reader = ipc.open_file(self._source)
+        self.schema = self._reader.schema
+
+    def read_rows(self, offset: int, limit: int) -> pa.Table:
+        offset = max(offset, 0)
+        end = min(offset + max(limit, 0), self.num_rows)
+        if offset >= end:
+            return self.schema.empty_table()
+
+        first = bisect.bisect_right(self.batch_offsets, offset) - 1
+        last = bisect.bisect_right(self.batch_offsets, end - 1) - 1
+        batches = [self._reader.get_batch(index) for index in range(first, last + 1)]
+        table = pa.Table.from_batches(batches, schema=self.schema)
+        return table.slice(offset - self.batch_offsets[first], end - offset)
+
+    def take_rows(self, row_ids: pa.Array) -> pa.Table:
+        """Rows by id, in the given order, gathered from only the batches that hold them."""
+        ids = row_ids.to_numpy(zero_copy_only=False).astype(np.int64)
+        if len(ids) == 0:
+            return self.schema.empty_table()
+        offsets = np.asarray(self.batch_offsets)
+        batch_of = np.searchsorted(offsets, ids, side="right") - 1
+        order = np.argsort(batch_of, kind="stable")
+        parts = []
+        for batch_index in np.unique(batch_of):
+            in_batch = ids[order][batch_of[order] == batch_index] - offsets[batch_index]
+            parts.append(self._reader.get_batch(int(batch_index)).take(pa.array(in_batch)))
+        gathered = pa.Table.from_batches(parts, schema=self.schema)
+        # Undo the grouping by batch.
+        return gathered.take(pa.array(np.argsort(order, kind="stable")))
+
+    def read_all(self) -> pa.Table:
+        """The whole table, backed by the memory map rather than copied into memory."""
+        return self._reader.read_all()
+
+    def iter_batches(self) -> Iterator[pa.RecordBatch]:
+        for index in range(self._reader.num_record_batches):
+            yield self._reader.get_batch(index)
+
+    def close(self):
+        self._source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DatasetMemoryCache:
+    """
+    Thread-safe LRU of parsed DataFrames bounded by their total memory usage.
+    Cached frames are shared between callers and must be treated as read-only.
+    on_evict, when given, is called outside the lock with every value the
+    cache lets go of: evicted, invalidated, too large to keep, or replaced by
+    a different value.
+    """
+
+    def __init__(self, max_bytes: int, on_evict: Optional[Callable[[Any], None]] = None):
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, size: int):
+        with self._lock:
+            dropped = [old for old in [self._pop_locked(key)] if old is not None and old is not value]
+            dropped += self._add_locked(key, value, size)
+        self._notify(dropped)
+
+    def resize(self, key: Hashable, value: Any, size: int):
+        """Re-account a cached value whose size changed; a value no longer cached stays out."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] is not value:
+                return
+            self._pop_locked(key)
+            dropped = self._add_locked(key, value, size)
+        self._notify(dropped)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            dropped = self._pop_locked(key)
+        if dropped is not None:
+            self._notify([dropped])
+
+    def _add_locked(self, key: Hashable, value: Any, size: int) -> List[Any]:
+        if size > self.max_bytes:
+            return [value]
+        self._data[key] = (size, value)
+        self._bytes += size
+        evicted = []
+        while self._bytes > self.max_bytes:
+            _, (evicted_size, evicted_value) = self._data.popitem(last=False)
+            self._bytes -= evicted_size
+            self._evictions += 1
+            evicted.append(evicted_value)
+        return evicted
+
+    def _pop_locked(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return None
+        self._bytes -= entry[0]
+        return entry[1]
+
+    def _notify(self, dropped: List[Any]):
+        if self.on_evict is not None:
+            for value in dropped:
+                self.on_evict(value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+            }
+
+
+class DatasetCache:
+    """
+    Two-tier cache of parsed datasets, content-addressed.
+
+    Each URL has a JSON sidecar holding its ETag, Last-Modified and the SHA-256
+    of the body it last returned. The parsed copy is stored once per content
+    hash as an Arrow IPC blob (plus its row-group index and column summary),
+    so URLs serving identical bytes share it, and parsed DataFrames are kept
+    in memory by content hash too. Sidecars older than revalidate_after are
+    checked with a conditional GET; a 304, or a 200 whose body hashes the
+    same, keeps the blob.
+    """
+
+    def __init__(self, directory: str, memory_bytes: int, revalidate_after: float):
+        self.directory = directory
+        self.blob_directory = os.path.join(directory, "blobs")
+        self.revalidate_after = revalidate_after
+        self.memory = DatasetMemoryCache(memory_bytes)
+        # key -> [lock, holders and waiters]
+        self._locks: Dict[str, list] = {}
+        self._locks_lock = threading.Lock()
+        self._downloads = 0
+        self._not_modified = 0
+        self._disk_hits = 0
+        self._deduplicated = 0
+
+    def get_dataframe(self, dataset_url: str, file_type: Optional[str] = None) -> pd.DataFrame:
+        key = self._key(dataset_url)
+        with self._lock_for(key):
+            meta = self._refresh(key, dataset_url, detect_file_type(dataset_url, file_type),
+                                 self._read_meta(key))
+        content_hash = meta["content_hash"]
+        with self._lock_for(content_hash):
+            cached = self.memory.get(content_hash)
+            if cached is not None:
+                return cached
+            df = self._read_table(content_hash).to_pandas()
+            self.memory.set(content_hash, df, int(df.memory_usage(deep=True).sum()))
+            return df
+
+    def open_file(self, dataset_url: str, file_type: Optional[str] = None) -> DatasetFile:
+        """Revalidate the on-disk copy if needed and memory-map it, without building a DataFrame."""
+        key = self._key(dataset_url)
+        with self._lock_for(key):
+            meta = self._refresh(key, dataset_url, detect_file_type(dataset_url, file_type),
+                                 self._read_meta(key))
+            return DatasetFile(self._data_path(meta["content_hash"]), meta)
+
+    def local_path(self, dataset_url: str, file_type: Optional[str] = None) -> str:
+        """Path of the Arrow copy of the URL's current content. The file is never rewritten in place."""
+        key = self._key(dataset_url)
+        with self._lock_for(key):
+            meta = self._refresh(key, dataset_url, detect_file_type(dataset_url, file_type),
+                                 self._read_meta(key))
+            return self._data_path(meta["content_hash"])
+
+    def get_summary(self, dataset_url: str, file_type: Optional[str] = None,
+                    progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Row count and per-column dtype and example value, recorded when the file was ingested."""
+        key = self._key(dataset_url)
+        with self._lock_for(key):
+            return self._refresh(key, dataset_url, detect_file_type(dataset_url, file_type),
+                                 self._read_meta(key), progress)
+
+    def invalidate(self, dataset_url: str):
+        """Forget what the URL pointed at. Its blob stays until release_blob is called."""
+        key = self._key(dataset_url)
+        with self._lock_for(key):
+            _remove(self._meta_path(key))
+
+    def release_blob(self, content_hash: str):
+        """Free the parsed copy of content no dataset references any more."""
+        with self._lock_for(content_hash):
+            self.memory.invalidate(content_hash)
+            _remove(self._data_path(content_hash))
+            _remove(self._blob_meta_path(content_hash))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.stats(),
+            "directory": self.directory,
+            "downloads": self._downloads,
+            "not_modified": self._not_modified,
+            "disk_hits": self._disk_hits,
+            "deduplicated": self._deduplicated,
+        }
+
+    def _refresh(self, key: str, dataset_url: str, file_type: str,
+                 meta: Optional[Dict[str, Any]],
+                 progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Make sure the on-disk copy is current and return its metadata."""
+        if meta and not self._is_stale(meta):
+            self._disk_hits += 1
+            return meta
+
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = requests.get(dataset_url, headers=headers, timeout=DOWNLOAD_TIMEOUT, stream=True)
+            response.raise_for_status()
+        except Exception as e:
+            raise Exception(f"Failed to download dataset: {str(e)}")
+
+        with response:
+            if meta and response.status_code == 304:
+                self._not_modified += 1
+                return self._touch(key, meta, response)
+
+            self._downloads += 1
+            try:
+                meta = self._ingest(response, file_type, progress)
+            except Exception as e:
+                raise Exception(f"Failed to parse dataset: {str(e)}")
+            meta["url"] = dataset_url
+            return self._touch(key, meta, response)
+
+    def _ingest(self, response, file_type: str,
+                progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """
+        Stream the response body through a parse engine into a new Arrow file.
+        Download, hashing, parsing and column summaries happen in one pass,
+        holding at most one chunk of parsed rows at a time. If the preferred
+        engine rejects the file (a value that does not fit the type it
+        inferred), the body is re-parsed from a disk spool with the fallback.
+        The content hash is only known at the end, so when a blob for it
+        already exists the new copy is dropped in favour of it.
+        """
+        os.makedirs(self.blob_directory, exist_ok=True)
+        tmp_path = os.path.join(self.blob_directory, f"{uuid.uuid4().hex}.tmp")
+        engine = get_engine(file_type)
+        fallback = get_fallback_engine(file_type)
+
+        with tempfile.TemporaryFile(dir=self.directory) if engine is not fallback else _no_spool() as spool:
+            body = _HashingReader(response, progress, spool)
+            try:
+                try:
+                    writer = self._write_chunks(
+                        engine, io.BufferedReader(body, DOWNLOAD_CHUNK_BYTES), tmp_path, progress
+                    )
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    if spool is None:
+                        raise
+                    while body.read(DOWNLOAD_CHUNK_BYTES):
+                        pass
+                    spool.seek(0)
+                    engine = fallback
+                    writer = self._write_chunks(engine, spool, tmp_path, progress)
+                # Hash whatever the parser left unread (e.g. trailing blank lines).
+                while body.read(DOWNLOAD_CHUNK_BYTES):
+                    pass
+            except BaseException:
+                _remove(tmp_path)
+                raise
+
+        content_hash = body.sha256.hexdigest()
+        with self._lock_for(content_hash):
+            blob = self._read_blob(content_hash)
+            if blob is not None:
+                self._deduplicated += 1
+                _remove(tmp_path)
+                return dict(blob)
+            blob = {
+                "file_type": file_type,
+                "engine": engine.name,
+                "content_hash": content_hash,
+                "num_rows": writer.num_rows,
+                "batch_offsets": writer.batch_offsets,
+                "columns": writer.columns(),
+            }
+            os.replace(tmp_path, self._data_path(content_hash))
+            self._write_json(self._blob_meta_path(content_hash), blob)
+            return dict(blob)
+
+    def _write_chunks(self, engine, source, tmp_path: str,
+                      progress: Optional[ProgressCallback]) -> "_ArrowFileWriter":
+        writer = _ArrowFileWriter(tmp_path)
+        try:
+            for chunk in engine.read_chunks(source):
+                writer.write(chunk)
+                if progress:
+                    progress("parsing", {"rows_parsed": writer.num_rows, "engine": engine.name})
+        finally:
+            writer.close()
+        if writer.schema is None:
+            raise ValueError("No columns to parse from file")
+        return writer
+
+    def _touch(self, key: str, meta: Dict[str, Any], response) -> Dict[str, Any]:
+        meta = dict(meta)
+        meta["etag"] = response.headers.get("ETag", meta.get("etag"))
+        meta["last_modified"] = response.headers.get("Last-Modified", meta.get("last_modified"))
+        meta["validated_at"] = time.time()
+        self._write_json(self._meta_path(key), {field: meta.get(field) for field in _URL_META_FIELDS})
+        return meta
+
+    def _is_stale(self, meta: Dict[str, Any]) -> bool:
+        return time.time() - meta.get("validated_at", 0) > self.revalidate_after
+
+    def _read_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        """The URL's sidecar merged with its blob's summary, or None if either is missing."""
+        meta = _read_json(self._meta_path(key))
+        if not meta or not meta.get("content_hash"):
+            return None
+        blob = self._read_blob(meta["content_hash"])
+        return {**blob, **meta} if blob is not None else None
+
+    def _read_blob(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self._data_path(content_hash)):
+            return None
+        blob = _read_json(self._blob_meta_path(content_hash))
+        # Copies written without a batch index or column summary, or with
+        # repeated column names, are rebuilt.
+        if not blob or "batch_offsets" not in blob or "columns" not in blob:
+            return None
+        names = [column["name"] for column in blob["columns"]]
+        return blob if len(set(names)) == len(names) else None
+
+    def _read_table(self, content_hash: str) -> pa.Table:
+        with pa.memory_map(self._data_path(content_hash)) as source:
+            return ipc.open_file(source).read_all()
+
+    def _write_json(self, path: str, data: Dict[str, Any]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def _lock_for(self, key: str) -> Iterator[None]:
+        """Hold the lock for key. Entries are dropped once nobody holds or waits on them."""
+        with self._locks_lock:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def _key(self, dataset_url: str) -> str:
+        return hashlib.sha256(dataset_url.encode()).hexdigest()
+
+    def _data_path(self, content_hash: str) -> str:
+        return os.path.join(self.blob_directory, f"{content_hash}.arrow")
+
+    def _blob_meta_path(self, content_hash: str) -> str:
+        return os.path.join(self.blob_directory, f"{content_hash}.json")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+
+# Fields kept per URL; everything else in the metadata belongs to the blob.
+_URL_META_FIELDS = ("url", "content_hash", "etag", "last_modified", "validated_at")
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+datasets = DatasetCache(DATASET_CACHE_DIR, DATASET_CACHE_MEMORY_BYTES, DATASET_CACHE_REVALIDATE_AFTER)
+
+
+def get_dataset_cache_stats() -> Dict[str, Any]:
+    return datasets.stats()
@@ -0,0 +1,302 @@
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from . import dataset_cache
+from .dataset_cache import DatasetMemoryCache
+
+# Memory for lazily built sort indexes and dictionary-encoded string columns,
+# shared by all datasets and evicted least recently used first.
+DATASET_QUERY_INDEX_BYTES = int(os.getenv("DATASET_QUERY_INDEX_BYTES", str(256 * 1024 * 1024)))
+
+COMPARISONS = {
+    "eq": pc.equal,
+    "ne": pc.not_equal,
+    "lt": pc.less,
+    "le": pc.less_equal,
+    "gt": pc.greater,
+    "ge": pc.greater_equal,
+}
+FILTER_OPERATORS = set(COMPARISONS) | {
+    "in", "not_in", "between", "contains", "starts_with", "ends_with", "is_null", "not_null"
+}
+
+
+def parse_filters(filters: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Filters arrive as a JSON list of {"column", "op", "value"} objects, all of
+    which must hold, e.g. [{"column": "price", "op": "gt", "value": 10}].
+    """
+    if not filters:
+        return []
+    try:
+        parsed = json.loads(filters)
+    except ValueError:
+        raise ValueError("filters must be a JSON list")
+    if not isinstance(parsed, list):
+        raise ValueError("filters must be a JSON list")
+    return validate_filters(parsed)
+
+
+def validate_filters(filters: List[Any]) -> List[Dict[str, Any]]:
+    for predicate in filters:
+        if not isinstance(predicate, dict) or "column" not in predicate or "op" not in predicate:
+            raise ValueError("Each filter needs a column and an op")
+        if not isinstance(predicate["column"], str):
+            raise ValueError("Filter column must be a string")
+        if predicate["op"] not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter op: {predicate['op']}")
+    return filters
+
+
+def parse_sort(sort: Optional[str]) -> List[Tuple[str, str]]:
+    """"region,-sales" sorts by region ascending, then sales descending."""
+    if not sort:
+        return []
+    keys = []
+    for key in sort.split(","):
+        key = key.strip()
+        if key.startswith("-"):
+            keys.append((key[1:], "descending"))
+        elif key:
+            keys.append((key, "ascending"))
+    return keys
+
+
+class DatasetIndex:
+    """
+    Query-side view of one cached dataset version: the memory-mapped table plus
+    the sort permutations and string dictionaries built for it so far.
+
+    The file stays open while the index is cached or in use: get_dataset_index
+    acquires it, release_dataset_index releases it, and the file is closed
+    once the index has been evicted and its last user is done.
+    """
+
+    def __init__(self, dataset_file: dataset_cache.DatasetFile, version: str):
+        self.file = dataset_file
+        # Content hash of the cached copy; results derived from it can be keyed on it.
+        self.version = version
+        self.table = dataset_file.read_all()
+        self.nbytes = 0
+        self._sort_indexes: Dict[tuple, pa.Array] = {}
+        self._dictionaries: Dict[str, pa.ChunkedArray] = {}
+        self._lock = threading.Lock()
+        self._users = 0
+        self._evicted = False
+        self.closed = False
+
+    def acquire(self) -> bool:
+        """Registers a user; False when the file was already closed and a new index is needed."""
+        with self._lock:
+            if self.closed:
+                return False
+            self._users += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            self._close_if_unused_locked()
+
+    def evict(self):
+        with self._lock:
+            self._evicted = True
+            self._close_if_unused_locked()
+
+    def _close_if_unused_locked(self):
+        if self._evicted and self._users == 0 and not self.closed:
+            self.closed = True
+            self.file.close()
+
+    def sort_index(self, keys: Tuple[Tuple[str, str], ...]) -> pa.Array:
+        """Row ids of the whole table in the given order, built on first use."""
+        with self._lock:
+            index = self._sort_indexes.get(keys)
+        if index is None:
+            index = pc.sort_indices(self.table.select([name for name, _ in keys]), sort_keys=list(keys))
+            with self._lock:
+                self._sort_indexes[keys] = index
+                self.nbytes += index.nbytes
+        return index
+
+    def dictionary(self, name: str) -> pa.ChunkedArray:
+        """String column dictionary-encoded once, so predicates only touch distinct values."""
+        with self._lock:
+            encoded = self._dictionaries.get(name)
+        if encoded is None:
+            encoded = self.table.column(name).dictionary_encode()
+            with self._lock:
+                self._dictionaries[name] = encoded
+                self.nbytes += sum(chunk.indices.nbytes for chunk in encoded.chunks)
+                if encoded.num_chunks:
+                    self.nbytes += encoded.chunk(0).dictionary.nbytes
+        return encoded
+
+
+_indexes = DatasetMemoryCache(DATASET_QUERY_INDEX_BYTES, on_evict=DatasetIndex.evict)
+
+
+def get_dataset_index(dataset_url: str) -> DatasetIndex:
+    """
+    The index of the URL's current content, shared by every URL serving the
+    same bytes. Every call must be paired with release_dataset_index.
+    """
+    summary = dataset_cache.datasets.get_summary(dataset_url)
+    index = _indexes.get(summary["content_hash"])
+    if index is not None and index.acquire():
+        return index
+    index = DatasetIndex(dataset_cache.datasets.open_file(dataset_url), summary["content_hash"])
+    index.acquire()
+    _indexes.set(index.version, index, index.nbytes)
+    return index
+
+
+def release_dataset_index(index: DatasetIndex):
+    """Re-account an index after a query may have built new sort orders or dictionaries."""
+    _indexes.resize(index.version, index, index.nbytes)
+    index.release()
+
+
+def filter_mask(index: DatasetIndex, filters: Optional[List[Dict[str, Any]]],
+                search: Optional[str] = None, columns: Optional[List[str]] = None):
+    """Boolean mask of rows matching every filter and the search text, or None when unfiltered."""
+    check_columns(index.table.schema, [predicate["column"] for predicate in filters or []])
+    mask = None
+    for predicate in filters or []:
+        mask = _and(mask, _evaluate(index, predicate))
+    if search:
+        mask = _and(mask, _search(index, search, columns))
+    return mask
+
+
+def query_observations(dataset_url: str, limit: int = 100, offset: int = 0,
+                       columns: Optional[List[str]] = None,
+                       filters: Optional[List[Dict[str, Any]]] = None,
+                       sort: Optional[List[Tuple[str, str]]] = None,
+                       search: Optional[str] = None) -> Tuple[pa.Table, int, int]:
+    """
+    One page of rows matching filters and search, in sort order, with only
+    the requested columns. Returns (page, matching_count, total_count).
+    """
+    offset = max(offset, 0)
+    limit = max(limit, 0)
+    if not filters and not sort and not search:
+        summary = dataset_cache.datasets.get_summary(dataset_url)
+        with dataset_cache.datasets.open_file(dataset_url) as dataset_file:
+            check_columns(dataset_file.schema, columns or [])
+            page = dataset_file.read_rows(offset, limit)
+        return _project(page, columns), summary["num_rows"], summary["num_rows"]
+
+    index = get_dataset_index(dataset_url)
+    try:
+        table = index.table
+        check_columns(table.schema, (columns or []) + [name for name, _ in sort or []])
+        mask = filter_mask(index, filters, search, columns)
+
+        if sort:
+            row_ids = index.sort_index(tuple(sort))
+            if mask is not None:
+                row_ids = pc.filter(row_ids, pc.take(mask, row_ids))
+        elif mask is not None:
+            row_ids = pc.indices_nonzero(mask)
+        else:
+            row_ids = None
+
+        matching_count = len(row_ids) if row_ids is not None else table.num_rows
+        if row_ids is None:
+            page = index.file.read_rows(offset, limit)
+        else:
+            page = index.file.take_rows(row_ids.slice(offset, limit))
+    finally:
+        release_dataset_index(index)
+    return _project(page, columns), matching_count, table.num_rows
+
+
+def _evaluate(index: DatasetIndex, predicate: Dict[str, Any]) -> pa.ChunkedArray:
+    name, op, value = predicate["column"], predicate["op"], predicate.get("value")
+    column = index.table.column(name)
+
+    if op == "is_null":
+        return pc.is_null(column)
+    if op == "not_null":
+        return pc.is_valid(column)
+
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        # Evaluate against the distinct values, then map back through the indices.
+        encoded = index.dictionary(name)
+        if encoded.num_chunks == 0:
+            return pc.is_valid(column)
+        lookup = pc.fill_null(_compare(encoded.chunk(0).dictionary, op, value), False)
+        indices = pa.chunked_array([chunk.indices for chunk in encoded.chunks])
+        return pc.fill_null(pc.take(lookup, indices), False)
+
+    return pc.fill_null(_compare(column, op, value), False)
+
+
+def _compare(values, op: str, value: Any):
+    data_type = values.type
+    try:
+        if op in COMPARISONS:
+            return COMPARISONS[op](values, _scalar(value, data_type))
+        if op in ("in", "not_in"):
+            if not isinstance(value, list):
+                raise ValueError(f"{op} needs a list value")
+            value_set = pa.array([_scalar(item, data_type).as_py() for item in value], type=data_type)
+            matched = pc.is_in(values, value_set=value_set)
+            # Like ne, not_in leaves out rows where the value is missing.
+            return matched if op == "in" else pc.and_(pc.invert(matched), pc.is_valid(values))
+        if op == "between":
+            if not isinstance(value, list) or len(value) != 2:
+                raise ValueError("between needs a [low, high] value")
+            return pc.and_(pc.greater_equal(values, _scalar(value[0], data_type)),
+                           pc.less_equal(values, _scalar(value[1], data_type)))
+        if not (pa.types.is_string(data_type) or pa.types.is_large_string(data_type)):
+            raise ValueError(f"{op} only applies to text columns")
+        if op == "contains":
+            return pc.match_substring(values, str(value), ignore_case=True)
+        if op == "starts_with":
+            return pc.starts_with(values, str(value), ignore_case=True)
+        return pc.ends_with(values, str(value), ignore_case=True)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+        raise ValueError(f"Invalid filter value {value!r}: {str(e)}")
+
+
+def _scalar(value: Any, data_type: pa.DataType) -> pa.Scalar:
+    if pa.types.is_temporal(data_type) and isinstance(value, str):
+        return pa.scalar(value).cast(data_type)
+    if pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+        return pa.scalar(str(value), type=data_type)
+    return pa.scalar(value)
+
+
+def _search(index: DatasetIndex, text: str, columns: Optional[List[str]]) -> pa.ChunkedArray:
+    """Case-insensitive substring match on any text column (projected ones if given)."""
+    mask = None
+    for field in index.table.schema:
+        if columns and field.name not in columns:
+            continue
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            matched = _evaluate(index, {"column": field.name, "op": "contains", "value": text})
+            mask = matched if mask is None else pc.or_(mask, matched)
+    if mask is None:
+        return pa.chunked_array([pa.nulls(index.table.num_rows, pa.bool_()).fill_null(False)])
+    return mask
+
+
+def _and(mask, other):
+    return other if mask is None else pc.and_(mask, other)
+
+
+def check_columns(schema: pa.Schema, names: List[str]):
+    missing = [name for name in names if schema.get_field_index(name) < 0]
+    if missing:
+        raise ValueError(f"Unknown column(s): {', '.join(missing)}")
+
+
+def _project(table: pa.Table, columns: Optional[List[str]]) -> pa.Table:
+    return table.select(columns) if columns else table
@@ -0,0 +1,216 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .dataset_cache import DatasetMemoryCache
+from .dataset_query import DatasetIndex, check_columns, get_dataset_index, release_dataset_index
+
+# Points kept per precomputed resolution level, coarsest first. Each level is
+# a min-max reduction of the next finer one (the finest of the full column).
+DATASET_SERIES_LEVELS = sorted(
+    int(size) for size in os.getenv("DATASET_SERIES_LEVELS", "1024,8192,65536").split(",") if size
+)
+# Memory for precomputed levels, shared by all datasets.
+DATASET_SERIES_CACHE_BYTES = int(os.getenv("DATASET_SERIES_CACHE_BYTES", str(64 * 1024 * 1024)))
+SERIES_MAX_POINTS = 10000
+SERIES_METHODS = ("lttb", "minmax")
+# A level is used for a request only if it holds this many times the points
+# asked for in the requested range; otherwise the raw rows are read.
+LEVEL_OVERSAMPLE = 4
+
+
+class SeriesLevels:
+    """Min-max reductions of one (x, y) column pair, sorted by x."""
+
+    def __init__(self, levels: List[Tuple[np.ndarray, np.ndarray]], total_points: int):
+        self.levels = levels
+        self.total_points = total_points
+        self.nbytes = sum(xs.nbytes + ys.nbytes for xs, ys in levels)
+
+
+_levels = DatasetMemoryCache(DATASET_SERIES_CACHE_BYTES)
+
+
+def get_series(dataset_url: str, y: List[str], x: Optional[str] = None, points: int = 1000,
+               method: str = "lttb", x_min: Optional[str] = None,
+               x_max: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Downsampled x/y series for each y column, at most `points` per series.
+    x defaults to the row number. Temporal x values are returned as epoch
+    milliseconds; x_min/x_max accept numbers or ISO dates for those columns.
+    """
+    if not y:
+        raise ValueError("At least one y column is required")
+    if method not in SERIES_METHODS:
+        raise ValueError(f"method must be one of {', '.join(SERIES_METHODS)}")
+    points = min(max(points, 3), SERIES_MAX_POINTS)
+
+    index = get_dataset_index(dataset_url)
+    try:
+        check_columns(index.table.schema, y + ([x] if x else []))
+        temporal = x is not None and _is_temporal(index.table.column(x).type)
+        low = _bound(x_min, temporal)
+        high = _bound(x_max, temporal)
+
+        series = []
+        for name in y:
+            levels = _get_levels(index, x, name)
+            xs, ys, source = _select(index, levels, x, name, points, low, high)
+            selected = _lttb(xs, ys, points) if method == "lttb" else _minmax(xs, ys, points)
+            series.append({
+                "column": name,
+                "x": _to_list(xs[selected], temporal),
+                "y": _to_list(ys[selected], False),
+                "points_in_range": len(xs),
+                "source": source,
+            })
+    finally:
+        release_dataset_index(index)
+    return {
+        "x_column": x,
+        "x_type": "datetime" if temporal else "number",
+        "method": method,
+        "series": series,
+    }
+
+
+def _get_levels(index: DatasetIndex, x: Optional[str], y: str) -> SeriesLevels:
+    key = (index.version, x, y)
+    levels = _levels.get(key)
+    if levels is None:
+        xs, ys = _full_series(index, x, y)
+        reductions = []
+        current_x, current_y = xs, ys
+        for size in reversed(DATASET_SERIES_LEVELS):
+            if size >= len(current_x):
+                continue
+            selected = _minmax(current_x, current_y, size)
+            current_x, current_y = current_x[selected], current_y[selected]
+            reductions.append((current_x, current_y))
+        levels = SeriesLevels(list(reversed(reductions)), len(xs))
+        _levels.set(key, levels, levels.nbytes)
+    return levels
+
+
+def _full_series(index: DatasetIndex, x: Optional[str], y: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Every row with both values present, as float arrays sorted by x."""
+    table = index.table
+    ys = _to_float(table.column(y), y)
+    if x is None:
+        xs = np.arange(table.num_rows, dtype=np.float64)
+    else:
+        xs = _to_float(table.column(x), x)
+        present = xs[~np.isnan(xs)]
+        if not np.all(present[1:] >= present[:-1]):
+            order = index.sort_index(((x, "ascending"),)).to_numpy()
+            xs, ys = xs[order], ys[order]
+    valid = ~(np.isnan(xs) | np.isnan(ys))
+    return xs[valid], ys[valid]
+
+
+def _select(index: DatasetIndex, levels: SeriesLevels, x: Optional[str], y: str,
+            points: int, low: Optional[float], high: Optional[float]):
+    """The coarsest level with enough points in [low, high], or the raw rows."""
+    for level, (xs, ys) in enumerate(levels.levels):
+        start, stop = _range(xs, low, high)
+        if stop - start >= points * LEVEL_OVERSAMPLE:
+            return xs[start:stop], ys[start:stop], f"level {level}"
+    xs, ys = _full_series(index, x, y)
+    start, stop = _range(xs, low, high)
+    return xs[start:stop], ys[start:stop], "raw"
+
+
+def _range(xs: np.ndarray, low: Optional[float], high: Optional[float]) -> Tuple[int, int]:
+    start = int(np.searchsorted(xs, low, side="left")) if low is not None else 0
+    stop = int(np.searchsorted(xs, high, side="right")) if high is not None else len(xs)
+    return start, max(start, stop)
+
+
+def _lttb(xs: np.ndarray, ys: np.ndarray, points: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: positions of the points that best keep the line's shape."""
+    size = len(xs)
+    if points >= size or points < 3:
+        return np.arange(size)
+    edges = np.linspace(1, size - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, size - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        if bucket == points - 3:
+            next_x, next_y = xs[-1], ys[-1]
+        else:
+            next_x = xs[stop:edges[bucket + 2]].mean()
+            next_y = ys[stop:edges[bucket + 2]].mean()
+        area = np.abs((xs[previous] - next_x) * (ys[start:stop] - ys[previous])
+                      - (xs[previous] - xs[start:stop]) * (next_y - ys[previous]))
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+
+def _minmax(xs: np.ndarray, ys: np.ndarray, points: int) -> np.ndarray:
+    """Positions of the first, last, and the min and max of points // 2 equal-count buckets."""
+    size = len(xs)
+    if points >= size:
+        return np.arange(size)
+    buckets = max(points // 2 - 1, 1)
+    starts = np.linspace(0, size, buckets, endpoint=False).astype(np.int64)
+    bucket_ids = np.repeat(np.arange(buckets), np.diff(np.append(starts, size)))
+    minimums = np.minimum.reduceat(ys, starts)[bucket_ids] == ys
+    maximums = np.maximum.reduceat(ys, starts)[bucket_ids] == ys
+    # First position per bucket that holds its min (resp. max).
+    _, first_min = np.unique(bucket_ids[minimums], return_index=True)
+    _, first_max = np.unique(bucket_ids[maximums], return_index=True)
+    selected = np.concatenate([
+        [0, size - 1],
+        np.flatnonzero(minimums)[first_min],
+        np.flatnonzero(maximums)[first_max],
+    ])
+    return np.unique(selected)
+
+
+def _is_temporal(data_type: pa.DataType) -> bool:
+    # Text x columns are read as dates (the pandas engine leaves dates as text).
+    return pa.types.is_temporal(data_type) or pa.types.is_string(data_type) or pa.types.is_large_string(data_type)
+
+
+def _to_float(column: pa.ChunkedArray, name: str) -> np.ndarray:
+    """Numbers as float64, dates as epoch milliseconds; nulls become NaN."""
+    data_type = column.type
+    try:
+        if pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+            column = column.cast(pa.timestamp("ms"))
+        elif pa.types.is_date(data_type):
+            column = column.cast(pa.timestamp("ms"))
+        if pa.types.is_timestamp(column.type):
+            column = column.cast(pa.timestamp("ms", tz=column.type.tz), safe=False).cast(pa.int64())
+        column = pc.cast(column, pa.float64())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        raise ValueError(f"Column {name} is neither numeric nor a date")
+    return column.to_numpy().astype(np.float64, copy=False) if column.null_count == 0 \
+        else pc.fill_null(column, np.nan).to_numpy()
+
+
+def _bound(value: Optional[str], temporal: bool) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        if not temporal:
+            raise ValueError(f"Invalid x bound: {value}")
+    try:
+        return pd.Timestamp(value).value / 1e6
+    except ValueError:
+        raise ValueError(f"Invalid x bound: {value}")
+
+
+def _to_list(values: np.ndarray, as_int: bool) -> List[Any]:
+    if as_int:
+        return values.astype(np.int64).tolist()
+    return [value if np.isfinite(value) else None for value in values.tolist()]
@@ -1,8 +1,12 @@
+import json
 from typing import Dict, List, Any, Optional
-import pandas as pd
-import requests
-from io import BytesIO
-from .database import get_db_cursor, load_sql
+from .database import after_commit, get_db_cursor, execute_statement, execute_batch_statement
+from . import cache
+from . import dataset_cache
+from . import dataset_query
+from .dataset_cache import detect_file_type, ProgressCallback
+from .parse_engines import pandas_column_names
+from .profiling import ColumnProfiler
 
 
 def get_datatype_string(dtype) -> str:
@@ -23,162 +27,222 @@ def get_datatype_string(dtype) -> str:
 
 
 def analyze_dataset(dataset_url: str, email: str, chat_session_id: str,
-                    name: str, file_type: str = None) -> Dict[str, Any]:
-    try:
-        response = requests.get(dataset_url, timeout=30)
-        response.raise_for_status()
-    except Exception as e:
-        raise Exception(f"Failed to download dataset: {str(e)}")
-
-    if not file_type:
-        if dataset_url.endswith('.csv'):
-            file_type = 'csv'
-        elif dataset_url.endswith(('.xlsx', '.xls')):
-            file_type = 'excel'
-        else:
-            file_type = 'csv'
-
-    try:
-        file_content = BytesIO(response.content)
-
-        if file_type == 'csv':
-            df = pd.read_csv(file_content)
-        elif file_type in ['excel', 'xlsx', 'xls']:
-            df = pd.read_excel(file_content)
-        else:
-            raise ValueError(f"Unsupported file type: {file_type}")
-    except Exception as e:
-        raise Exception(f"Failed to parse dataset: {str(e)}")
-
-    dataset = insert_dataset(dataset_url, name, file_type, chat_session_id)
-
-    columns = []
-    for column_name in df.columns:
-        dtype = get_datatype_string(df[column_name].dtype)
-
-        example_value = None
-        non_null_values = df[column_name].dropna()
-        if len(non_null_values) > 0:
-            example_value = str(non_null_values.iloc[0])
-
-        column_data = insert_column(
-            email=email,
-            name=column_name,
-            datatype=dtype,
-            example_value=example_value,
-            dataset_url=dataset_url
-        )
-        columns.append(column_data)
+                    name: str, file_type: str = None,
+                    progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+    file_type = file_type or detect_file_type(dataset_url)
+    summary = dataset_cache.datasets.get_summary(dataset_url, file_type, progress)
+
+    # Content already registered under another URL keeps its profiles.
+    blob = get_dataset_blob(summary["content_hash"])
+    if blob is not None:
+        profiles = blob["profiles"] or {}
+    else:
+        if progress:
+            progress("profiling", {"rows_parsed": summary["num_rows"]})
+        profiles = profile_dataset(dataset_url)
+
+    # Column rows are keyed by name, so repeated header names must be told apart.
+    names = pandas_column_names([column["name"] for column in summary["columns"]])
+    blob_columns = [
+        {"name": name, "datatype": get_datatype_string(column["dtype"]),
+         "example_value": column["example_value"]}
+        for name, column in zip(names, summary["columns"])
+    ]
+    blob_row = (summary["content_hash"], file_type, summary["num_rows"],
+                json.dumps(blob_columns), json.dumps(profiles))
+    column_rows = [
+        (email, column["name"], column["datatype"], column["example_value"], dataset_url)
+        for column in blob_columns
+    ]
+
+    if progress:
+        progress("registering", {"columns_total": len(column_rows)})
+    dataset, columns = register_dataset(dataset_url, name, file_type, chat_session_id, column_rows, blob_row)
+    if progress:
+        progress("registering", {"columns_registered": len(columns)})
+    # Re-analyzing a URL whose content changed drops the old blob's last reference.
+    release_unreferenced_blobs()
 
     return {
         "dataset": dataset,
         "columns": columns,
-        "row_count": len(df),
-        "column_count": len(df.columns)
+        "row_count": summary["num_rows"],
+        "column_count": len(summary["columns"]),
+        "deduplicated": blob is not None
     }
 
 
+def profile_dataset(dataset_url: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Per-column statistics from one pass over the cached Arrow batches: null
+    and distinct counts, min/max/mean/std, quantiles, histogram and top values.
+    Distinct counts, quantiles and top values are approximate.
+    """
+    with dataset_cache.datasets.open_file(dataset_url) as dataset_file:
+        profilers = {field.name: ColumnProfiler(field.type) for field in dataset_file.schema}
+        for batch in dataset_file.iter_batches():
+            for name, column in zip(batch.schema.names, batch.columns):
+                profilers[name].update(column)
+    return {name: profiler.result() for name, profiler in profilers.items()}
+
+
 def insert_dataset(dataset_url: str, name: str, file_type: str,
-                   chat_session_id: str) -> Dict[str, Any]:
+                   chat_session_id: str, content_hash: Optional[str] = None) -> Dict[str, Any]:
     with get_db_cursor() as cursor:
-        cursor.execute(
-            load_sql('datasets', 'insert_dataset'),
-            (dataset_url, name, file_type, chat_session_id)
+        execute_statement(
+            cursor, 'datasets', 'insert_dataset',
+            (dataset_url, name, file_type, chat_session_id, content_hash)
         )
         dataset = cursor.fetchone()
         return dict(dataset) if dataset else None
 
 
+def register_dataset(dataset_url: str, name: str, file_type: str, chat_session_id: str,
+                     column_rows: List[tuple],
+                     blob_row: tuple) -> tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    # Blob, dataset and all of its columns go in with one transaction and one
+    # multi-row INSERT, so a failure never leaves a half-registered dataset.
+    # The blob insert is a no-op when the content is already known; the
+    # datasets trigger then takes a reference on it.
+    with get_db_cursor() as cursor:
+        execute_statement(cursor, 'dataset_blobs', 'insert_dataset_blob', blob_row)
+        execute_statement(
+            cursor, 'datasets', 'insert_dataset',
+            (dataset_url, name, file_type, chat_session_id, blob_row[0])
+        )
+        dataset = cursor.fetchone()
+
+        columns = []
+        if column_rows:
+            columns = execute_batch_statement(
+                cursor, 'columns', 'insert_columns', column_rows, fetch=True
+            )
+    after_commit(lambda: cache.dataset_columns.invalidate(dataset_url))
+
+    return (
+        dict(dataset) if dataset else None,
+        [dict(column) for column in columns]
+    )
+
+
 def get_dataset(dataset_url: str) -> Optional[Dict[str, Any]]:
     with get_db_cursor(commit=False) as cursor:
-        cursor.execute(load_sql('datasets', 'get_dataset'), (dataset_url,))
+        execute_statement(cursor, 'datasets', 'get_dataset', (dataset_url,))
         dataset = cursor.fetchone()
         return dict(dataset) if dataset else None
 
 
 def get_session_datasets(session_id: str) -> List[Dict[str, Any]]:
     with get_db_cursor(commit=False) as cursor:
-        cursor.execute(load_sql('datasets', 'get_session_datasets'), (session_id,))
+        execute_statement(cursor, 'datasets', 'get_session_datasets', (session_id,))
         datasets = cursor.fetchall()
         return [dict(dataset) for dataset in datasets] if datasets else []
 
 
 def delete_dataset(dataset_url: str) -> bool:
     with get_db_cursor() as cursor:
-        cursor.execute(load_sql('datasets', 'delete_dataset'), (dataset_url,))
+        execute_statement(cursor, 'datasets', 'delete_dataset', (dataset_url,))
         result = cursor.fetchone()
-        return result is not None
+
+    def invalidate():
+        cache.dataset_columns.invalidate(dataset_url)
+        dataset_cache.datasets.invalidate(dataset_url)
+
+    after_commit(invalidate)
+    release_unreferenced_blobs()
+    return result is not None
+
+
+def get_dataset_blob(content_hash: str) -> Optional[Dict[str, Any]]:
+    with get_db_cursor(commit=False) as cursor:
+        execute_statement(cursor, 'dataset_blobs', 'get_dataset_blob', (content_hash,))
+        blob = cursor.fetchone()
+        return dict(blob) if blob else None
+
+
+def release_unreferenced_blobs() -> List[str]:
+    """
+    Delete blobs no dataset references any more and free their cached copies.
+    Returns the released content hashes.
+    """
+    with get_db_cursor() as cursor:
+        execute_statement(cursor, 'dataset_blobs', 'delete_unreferenced_blobs')
+        released = [row["content_hash"] for row in cursor.fetchall()]
+    for content_hash in released:
+        dataset_cache.datasets.release_blob(content_hash)
+    return released
 
 
 def insert_column(email: str, name: str, datatype: str,
                   example_value: Optional[str], dataset_url: str) -> Dict[str, Any]:
     with get_db_cursor() as cursor:
-        cursor.execute(
-            load_sql('columns', 'insert_column'),
+        execute_statement(
+            cursor, 'columns', 'insert_column',
             (email, name, datatype, example_value, dataset_url)
         )
         column = cursor.fetchone()
-        return dict(column) if column else None
+    after_commit(lambda: cache.dataset_columns.invalidate(dataset_url))
+    return dict(column) if column else None
 
 
-def get_dataset_columns(dataset_url: str) -> List[Dict[str, Any]]:
+def get_dataset_profile(dataset_url: str) -> List[Dict[str, Any]]:
     with get_db_cursor(commit=False) as cursor:
-        cursor.execute(load_sql('columns', 'get_dataset_columns'), (dataset_url,))
+        execute_statement(cursor, 'columns', 'get_dataset_profile', (dataset_url,))
         columns = cursor.fetchall()
         return [dict(column) for column in columns] if columns else []
 
 
+def get_dataset_columns(dataset_url: str) -> List[Dict[str, Any]]:
+    return cache.dataset_columns.get_or_load(dataset_url, lambda: _fetch_dataset_columns(dataset_url))
+
+
+def _fetch_dataset_columns(dataset_url: str) -> List[Dict[str, Any]]:
+    with get_db_cursor(commit=False) as cursor:
+        execute_statement(cursor, 'columns', 'get_dataset_columns', (dataset_url,))
+        columns = cursor.fetchall()
+        return [dict(column) for column in columns] if columns else []
 
 
-def get_dataset_observations(dataset_url: str, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+
+def get_dataset_observations(dataset_url: str, limit: int = 100, offset: int = 0,
+                             columns: Optional[List[str]] = None,
+                             filters: Optional[List[Dict[str, Any]]] = None,
+                             sort: Optional[List[tuple]] = None,
+                             search: Optional[str] = None) -> Dict[str, Any]:
     """
-    Get observations (rows) from a dataset with pagination.
-    Returns both the data and metadata about total count.
+    Get observations (rows) from a dataset with pagination, optionally
+    projected, filtered, searched and sorted on the cached columnar copy.
+    total_count is the number of matching rows.
     """
-    import pandas as pd
-    import requests
-    from io import BytesIO
-    
     try:
-        # Download the dataset from URL
-        response = requests.get(dataset_url, timeout=30)
-        response.raise_for_status()
-        file_content = BytesIO(response.content)
-        
-        # Determine file type and read accordingly
-        if dataset_url.endswith('.csv'):
-            df = pd.read_csv(file_content)
-        elif dataset_url.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(file_content)
-        else:
-            # Default to CSV
-            df = pd.read_csv(file_content)
-        
-        # Get total count
-        total_count = len(df)
-        
-        # Apply pagination
-        df_page = df.iloc[offset:offset + limit]
-        
+        page, total_count, unfiltered_count = dataset_query.query_observations(
+            dataset_url, limit=limit, offset=offset, columns=columns,
+            filters=filters, sort=sort, search=search
+        )
+        df_page = page.to_pandas()
+
         # Convert to list of dictionaries, handling NaN values
         observations = df_page.fillna('').to_dict('records')
-        
+
         # Get column information
         columns = [
             {
                 'name': col,
-                'dtype': str(df[col].dtype)
+                'dtype': str(df_page[col].dtype)
             }
-            for col in df.columns
+            for col in df_page.columns
         ]
-        
+
         return {
             'observations': observations,
             'columns': columns,
             'total_count': total_count,
+            'unfiltered_count': unfiltered_count,
             'limit': limit,
             'offset': offset,
             'has_more': offset + limit < total_count
         }
+    except ValueError:
+        raise
     except Exception as e:
         raise Exception(f"Failed to read dataset observations: {str(e)}")
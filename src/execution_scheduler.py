@@ -0,0 +1,298 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+# Executions running at once. 0 sizes it from the CPU count and physical
+# memory (one EXECUTOR_MEMORY_LIMIT_MB per execution).
+EXECUTOR_MAX_CONCURRENCY = int(os.getenv("EXECUTOR_MAX_CONCURRENCY", "0"))
+# Executions waiting for a slot; more are rejected.
+EXECUTOR_MAX_QUEUED = int(os.getenv("EXECUTOR_MAX_QUEUED", "100"))
+# Execution seconds each user is credited per deficit round robin round.
+EXECUTOR_FAIR_QUANTUM = float(os.getenv("EXECUTOR_FAIR_QUANTUM", "1.0"))
+# Slots batch executions may never take, so interactive ones can start.
+EXECUTOR_INTERACTIVE_RESERVED = int(os.getenv("EXECUTOR_INTERACTIVE_RESERVED", "1"))
+
+# Highest priority first.
+PRIORITIES = ("interactive", "batch")
+# Cost (expected seconds of execution) assumed for a user with no history.
+INITIAL_COST = 1.0
+MIN_COST = 0.01
+# Weight of the newest run in each user's expected cost.
+COST_SMOOTHING = 0.3
+MAX_TRACKED_USERS = 10000
+WAIT_SAMPLES = 1000
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("user", "priority", "cost", "enqueued", "started", "event")
+
+    def __init__(self, user: str, priority: str, cost: float):
+        self.user = user
+        self.priority = priority
+        self.cost = cost
+        self.enqueued = time.monotonic()
+        self.started: Optional[float] = None
+        self.event = threading.Event()
+
+
+def default_concurrency(memory_limit_mb: float) -> int:
+    """One execution per core, fewer if physical memory cannot hold that many at their limit."""
+    concurrency = os.cpu_count() or 1
+    if memory_limit_mb > 0:
+        try:
+            memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+            concurrency = min(concurrency, int(memory // (memory_limit_mb * 1024 * 1024)))
+        except (ValueError, OSError, AttributeError):
+            pass
+    return max(concurrency, 1)
+
+
+class ExecutionScheduler:
+    """
+    Admission control for code executions. At most `concurrency` run at
+    once. Waiting executions are served interactive before batch, and
+    within a priority by deficit round robin over users, so each user gets
+    an equal share of execution time whatever the number of requests they
+    queue. A user's cost per execution is the smoothed duration of their
+    recent runs. Callers whose estimated queue wait exceeds their deadline
+    are rejected up front with a retry hint.
+    """
+
+    def __init__(self, concurrency: int, max_queued: int = EXECUTOR_MAX_QUEUED,
+                 quantum: float = EXECUTOR_FAIR_QUANTUM,
+                 interactive_reserved: int = EXECUTOR_INTERACTIVE_RESERVED):
+        self.concurrency = max(concurrency, 1)
+        self.max_queued = max_queued
+        self.quantum = max(quantum, MIN_COST)
+        self.batch_concurrency = max(self.concurrency - max(interactive_reserved, 0), 1)
+        self._lock = threading.Lock()
+        # Per priority: user -> their waiters, in round robin order.
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._deficits: Dict[str, Dict[str, float]] = {p: {} for p in PRIORITIES}
+        # The user whose round robin turn is in progress, per priority.
+        self._turns: Dict[str, Optional[str]] = {p: None for p in PRIORITIES}
+        self._running: Dict[str, List[_Waiter]] = {p: [] for p in PRIORITIES}
+        self._costs: "OrderedDict[str, float]" = OrderedDict()
+        self._default_cost = INITIAL_COST
+        self._admitted = 0
+        self._rejected = {"queue_full": 0, "deadline": 0, "timeout": 0}
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self._wait_total = 0.0
+
+    @contextmanager
+    def slot(self, user: str, priority: str = "interactive", deadline: float = 60.0) -> Iterator[float]:
+        """
+        Hold an execution slot for the block; yields the seconds spent
+        queued. Raises AdmissionRejected when the wait would exceed deadline
+        seconds, or did.
+        """
+        waiter = self._acquire(user, priority, deadline)
+        try:
+            yield waiter.started - waiter.enqueued
+        finally:
+            self._release(waiter)
+
+    def _acquire(self, user: str, priority: str, deadline: float) -> _Waiter:
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+        with self._lock:
+            waiter = _Waiter(user, priority, self._costs.get(user, self._default_cost))
+            if self._queued_locked() >= self.max_queued:
+                self._rejected["queue_full"] += 1
+                raise AdmissionRejected("Too many executions are queued, try again shortly",
+                                        _retry_after(self._backlog_locked(None)))
+            self._queues[priority].setdefault(user, deque()).append(waiter)
+            self._dispatch_locked()
+            if waiter.started is None:
+                estimate = self._backlog_locked(waiter)
+                if estimate > deadline:
+                    self._remove_locked(waiter)
+                    self._rejected["deadline"] += 1
+                    raise AdmissionRejected(
+                        f"Executions are queued for about {math.ceil(estimate)} seconds, "
+                        f"longer than this request can wait",
+                        _retry_after(estimate - deadline),
+                    )
+
+        waiter.event.wait(deadline)
+        with self._lock:
+            if waiter.started is None:
+                self._remove_locked(waiter)
+                self._rejected["timeout"] += 1
+                raise AdmissionRejected(f"No execution slot became available within {deadline:g} seconds",
+                                        _retry_after(self._backlog_locked(None)))
+            return waiter
+
+    def _release(self, waiter: _Waiter):
+        with self._lock:
+            self._running[waiter.priority].remove(waiter)
+            duration = max(time.monotonic() - waiter.started, MIN_COST)
+            previous = self._costs.pop(waiter.user, self._default_cost)
+            self._costs[waiter.user] = previous + COST_SMOOTHING * (duration - previous)
+            if len(self._costs) > MAX_TRACKED_USERS:
+                self._costs.popitem(last=False)
+            self._default_cost += COST_SMOOTHING * (duration - self._default_cost)
+            self._dispatch_locked()
+
+    def _dispatch_locked(self):
+        """Start waiters while slots are free."""
+        while self._running_count_locked() < self.concurrency:
+            for priority in PRIORITIES:
+                if not self._queues[priority]:
+                    continue
+                if priority != PRIORITIES[0] and len(self._running[priority]) >= self.batch_concurrency:
+                    continue
+                waiter = self._next_locked(priority)
+                break
+            else:
+                return
+            waiter.started = time.monotonic()
+            self._running[waiter.priority].append(waiter)
+            self._admitted += 1
+            wait = waiter.started - waiter.enqueued
+            self._waits.append(wait)
+            self._wait_total += wait
+            waiter.event.set()
+
+    def _next_locked(self, priority: str) -> _Waiter:
+        """
+        Deficit round robin: a user's turn adds one quantum of credit, and
+        they run executions while the credit covers their cost.
+        """
+        queue = self._queues[priority]
+        deficits = self._deficits[priority]
+        misses = 0
+        while True:
+            user, waiters = next(iter(queue.items()))
+            if self._turns[priority] != user:
+                self._turns[priority] = user
+                deficits[user] = deficits.get(user, 0.0) + self.quantum
+            if deficits[user] >= waiters[0].cost:
+                waiter = waiters.popleft()
+                deficits[user] -= waiter.cost
+                if not waiters:
+                    # Credit is not banked while a user has nothing queued.
+                    del queue[user]
+                    del deficits[user]
+                    self._turns[priority] = None
+                return waiter
+            queue.move_to_end(user)
+            self._turns[priority] = None
+            misses += 1
+            if misses == len(queue):
+                # A whole round went by with nobody able to run: skip the
+                # further empty rounds instead of looping through them.
+                rounds = min(math.ceil((w[0].cost - deficits[u]) / self.quantum) for u, w in queue.items())
+                for other in queue:
+                    deficits[other] += (rounds - 1) * self.quantum
+                misses = 0
+
+    def _remove_locked(self, waiter: _Waiter):
+        waiters = self._queues[waiter.priority].get(waiter.user)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        if not waiters:
+            del self._queues[waiter.priority][waiter.user]
+            self._deficits[waiter.priority].pop(waiter.user, None)
+            if self._turns[waiter.priority] == waiter.user:
+                self._turns[waiter.priority] = None
+
+    def _backlog_locked(self, waiter: Optional[_Waiter]) -> float:
+        """
+        Estimated seconds until waiter starts (or, without one, until a new
+        interactive execution would): the work queued ahead of it plus what
+        is left of the running executions, spread over the slots it may use.
+        Under round robin a user's n-th queued execution waits for about n
+        executions of every other user at its priority.
+        """
+        priority = waiter.priority if waiter else PRIORITIES[0]
+        rank = PRIORITIES.index(priority)
+        ahead = 0.0
+        for higher in PRIORITIES[:rank]:
+            ahead += sum(w.cost for waiters in self._queues[higher].values() for w in waiters)
+        own = self._queues[priority].get(waiter.user) if waiter else None
+        position = own.index(waiter) if own else 0
+        for user, waiters in self._queues[priority].items():
+            if waiter and user == waiter.user:
+                ahead += sum(w.cost for w in list(waiters)[:position])
+            else:
+                ahead += sum(w.cost for w in list(waiters)[:position + 1])
+        now = time.monotonic()
+        running = sum(max(w.cost - (now - w.started), 0.0) for ws in self._running.values() for w in ws)
+        slots = self.concurrency if rank == 0 else self.batch_concurrency
+        return (ahead + running) / slots
+
+    def _running_count_locked(self) -> int:
+        return sum(len(waiters) for waiters in self._running.values())
+
+    def _queued_locked(self) -> int:
+        return sum(len(waiters) for queue in self._queues.values() for waiters in queue.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "concurrency": self.concurrency,
+                "batch_concurrency": self.batch_concurrency,
+                "max_queued": self.max_queued,
+                "running": {p: len(self._running[p]) for p in PRIORITIES},
+                "queued": {p: sum(len(w) for w in self._queues[p].values()) for p in PRIORITIES},
+                "queued_users": {p: len(self._queues[p]) for p in PRIORITIES},
+                "admitted": self._admitted,
+                "rejected": dict(self._rejected),
+                "estimated_wait_seconds": self._backlog_locked(None),
+                "wait_seconds": {
+                    "avg": self._wait_total / self._admitted if self._admitted else 0.0,
+                    "p50": _percentile(waits, 0.5),
+                    "p95": _percentile(waits, 0.95),
+                    "max": waits[-1] if waits else 0.0,
+                },
+            }
+
+    def prometheus(self) -> str:
+        stats = self.stats()
+        lines = [
+            "# HELP anygraph_executor_running Code executions running, by priority.",
+            "# TYPE anygraph_executor_running gauge",
+            *[f'anygraph_executor_running{{priority="{p}"}} {n}' for p, n in stats["running"].items()],
+            "# HELP anygraph_executor_queued Code executions waiting for a slot, by priority.",
+            "# TYPE anygraph_executor_queued gauge",
+            *[f'anygraph_executor_queued{{priority="{p}"}} {n}' for p, n in stats["queued"].items()],
+            "# HELP anygraph_executor_concurrency Execution slots.",
+            "# TYPE anygraph_executor_concurrency gauge",
+            f"anygraph_executor_concurrency {stats['concurrency']}",
+            "# HELP anygraph_executor_admitted_total Executions given a slot.",
+            "# TYPE anygraph_executor_admitted_total counter",
+            f"anygraph_executor_admitted_total {stats['admitted']}",
+            "# HELP anygraph_executor_rejected_total Executions turned away, by reason.",
+            "# TYPE anygraph_executor_rejected_total counter",
+            *[f'anygraph_executor_rejected_total{{reason="{r}"}} {n}' for r, n in stats["rejected"].items()],
+            "# HELP anygraph_executor_queue_wait_seconds Time executions spent queued (recent window quantiles).",
+            "# TYPE anygraph_executor_queue_wait_seconds summary",
+            f'anygraph_executor_queue_wait_seconds{{quantile="0.5"}} {stats["wait_seconds"]["p50"]}',
+            f'anygraph_executor_queue_wait_seconds{{quantile="0.95"}} {stats["wait_seconds"]["p95"]}',
+            f"anygraph_executor_queue_wait_seconds_sum {self._wait_total}",
+            f"anygraph_executor_queue_wait_seconds_count {stats['admitted']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def _retry_after(seconds: float) -> int:
+    return max(math.ceil(seconds), 1)
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from . import dataset_service
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# Jobs queued or running at once; submissions beyond this are rejected.
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "50"))
+# Seconds a finished job stays queryable.
+INGEST_JOB_RETENTION = float(os.getenv("INGEST_JOB_RETENTION", "3600"))
+
+
+class IngestionQueueFull(Exception):
+    pass
+
+
+class IngestionJob:
+    def __init__(self, dataset_url: str, email: str, chat_session_id: str,
+                 name: str, file_type: Optional[str]):
+        self.job_id = str(uuid.uuid4())
+        self.dataset_url = dataset_url
+        self.email = email
+        self.chat_session_id = chat_session_id
+        self.name = name
+        self.file_type = file_type
+        self.status = "queued"
+        self.phase = "queued"
+        self.progress: Dict[str, Any] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.updated_at = self.created_at
+        self.finished_at: Optional[float] = None
+        # Bumped on every change so event streams can tell when to send.
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def update(self, phase: str, details: Dict[str, Any]):
+        with self._lock:
+            self.phase = phase
+            self.progress.update(details)
+            self._touch()
+
+    def start(self):
+        with self._lock:
+            self.status = "running"
+            self._touch()
+
+    def finish(self, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        with self._lock:
+            self.status = "failed" if error else "succeeded"
+            self.phase = "done"
+            self.result = result
+            self.error = error
+            self.finished_at = time.monotonic()
+            self._touch()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "dataset_url": self.dataset_url,
+                "status": self.status,
+                "phase": self.phase,
+                "progress": dict(self.progress),
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at,
+            }
+
+    def _touch(self):
+        self.updated_at = datetime.utcnow()
+        self.version += 1
+
+
+class IngestionQueue:
+    """
+    Runs analyze_dataset on a bounded thread pool. A URL already queued or
+    running is not ingested twice: the second submission gets the first job.
+    """
+
+    def __init__(self, workers: int, max_pending: int, retention: float):
+        self.max_pending = max_pending
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._active_by_url: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, dataset_url: str, email: str, chat_session_id: str,
+               name: str, file_type: Optional[str] = None) -> tuple[IngestionJob, bool]:
+        """Returns (job, coalesced); coalesced is True when an active job for the URL was reused."""
+        with self._lock:
+            self._prune_locked()
+            active = self._active_by_url.get(dataset_url)
+            if active is not None:
+                return active, True
+            if len(self._active_by_url) >= self.max_pending:
+                raise IngestionQueueFull("Too many datasets are being ingested, try again shortly")
+
+            job = IngestionJob(dataset_url, email, chat_session_id, name, file_type)
+            self._jobs[job.job_id] = job
+            self._active_by_url[dataset_url] = job
+        future = self._executor.submit(self._run, job)
+        future.add_done_callback(lambda f: self._on_done(job, f))
+        return job, False
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {"jobs": counts, "active": len(self._active_by_url), "max_pending": self.max_pending}
+
+    def shutdown(self):
+        """
+        Stops accepting work. Jobs that have not started are cancelled and
+        marked failed so anyone following them sees a final status.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: IngestionJob):
+        job.start()
+        try:
+            result = dataset_service.analyze_dataset(
+                job.dataset_url, job.email, job.chat_session_id, job.name, job.file_type,
+                progress=job.update
+            )
+            job.finish(result=result)
+        except Exception as e:
+            job.finish(error=str(e))
+        finally:
+            with self._lock:
+                if self._active_by_url.get(job.dataset_url) is job:
+                    del self._active_by_url[job.dataset_url]
+
+    def _on_done(self, job: IngestionJob, future: Future):
+        # _run never started, so nothing else will finish the job.
+        if not future.cancelled():
+            return
+        job.finish(error="Ingestion was cancelled because the server is shutting down")
+        with self._lock:
+            if self._active_by_url.get(job.dataset_url) is job:
+                del self._active_by_url[job.dataset_url]
+
+    def _prune_locked(self):
+        cutoff = time.monotonic() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+_queue: Optional[IngestionQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_ingestion_queue() -> IngestionQueue:
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = IngestionQueue(INGEST_WORKERS, INGEST_MAX_PENDING, INGEST_JOB_RETENTION)
+    return _queue
+
+
+def shutdown_ingestion_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            _queue.shutdown()
+            _queue = None
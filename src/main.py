@@ -1,24 +1,55 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, status, Depends, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal, Union
 from datetime import datetime
+from contextlib import asynccontextmanager
+import asyncio
 import json
-import re
 
 from . import user_service
 from . import chat_service
 from . import dataset_service
 from . import ai_service
 from . import stats_service
-from .code_executor import get_executor
-from .database import test_connection
+from . import artifact_service
+from . import dataset_query
+from . import dataset_aggregate
+from . import dataset_series
+from .ingestion_service import get_ingestion_queue, shutdown_ingestion_queue, IngestionQueueFull
+from .code_executor import execution_stats, get_executor, shutdown_executor
+from .execution_scheduler import AdmissionRejected
+from .cache import get_cache_stats
+from .dataset_cache import get_dataset_cache_stats
+from .database import (
+    test_connection, get_pool, get_pool_stats, close_pool, load_statements,
+    UnitOfWork, bind_unit_of_work, reset_unit_of_work,
+    get_query_stats, get_slow_queries, reset_query_stats, get_prometheus_metrics
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    load_statements()
+    try:
+        get_pool().open()
+    except Exception as e:
+        print(f"Failed to warm database pool: {str(e)}")
+    # Starts the sandbox fork servers in the background.
+    get_executor()
+    yield
+    shutdown_ingestion_queue()
+    shutdown_executor()
+    close_pool()
+
 
 app = FastAPI(
     title="AnyGraph API",
     description="Backend API for AnyGraph - Easy Data Analysis Platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -30,6 +61,23 @@ app.add_middleware(
 )
 
 
+async def request_unit_of_work():
+    # Service calls made while handling the request share this unit of work.
+    # Endpoints commit explicitly; whatever is left is committed on success
+    # and rolled back if the endpoint raised.
+    uow = UnitOfWork()
+    token = bind_unit_of_work(uow)
+    try:
+        yield uow
+    except Exception:
+        await run_in_threadpool(uow.close, False)
+        raise
+    else:
+        await run_in_threadpool(uow.close)
+    finally:
+        reset_unit_of_work(token)
+
+
 class UserLogin(BaseModel):
     email: EmailStr
     full_name: Optional[str] = None
@@ -62,10 +110,22 @@ class DatasetAnalyze(BaseModel):
     file_type: Optional[str] = None
 
 
+class DatasetAggregate(BaseModel):
+    dataset_url: str
+    aggregations: List[Dict[str, Any]]
+    group_by: Optional[List[str]] = None
+    time_bucket: Optional[Dict[str, str]] = None
+    filters: Optional[List[Dict[str, Any]]] = None
+    order_by: Optional[Union[str, List[str]]] = None
+    limit: Optional[int] = None
+
+
 class QueryExecute(BaseModel):
     query: str
     dataset_url: str
     chat_session_id: str
+    # Executor queue class; batch runs only take slots interactive ones leave free.
+    priority: Literal["interactive", "batch"] = "interactive"
 
 
 class ChatMessage(BaseModel):
@@ -90,10 +150,59 @@ def health_check():
         "status": "healthy" if (db_status and executor_status) else "unhealthy",
         "database": "connected" if db_status else "disconnected",
         "executor": "available" if executor_status else "unavailable",
+        "database_pool": get_pool_stats(),
         "timestamp": datetime.utcnow().isoformat()
     }
 
 
+@app.get("/admin/db/pool")
+def get_db_pool_stats():
+    return get_pool_stats()
+
+
+@app.get("/admin/db/stats")
+def get_db_query_stats():
+    return get_query_stats()
+
+
+@app.delete("/admin/db/stats")
+def clear_db_query_stats():
+    reset_query_stats()
+    return {"message": "Query stats reset"}
+
+
+@app.get("/admin/db/slow-queries")
+def get_db_slow_queries():
+    return {"slow_queries": get_slow_queries()}
+
+
+@app.get("/metrics")
+def get_metrics():
+    content = get_prometheus_metrics()
+    scheduler = get_executor().scheduler
+    if scheduler is not None:
+        content += scheduler.prometheus()
+    return Response(content=content, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/admin/executor")
+def get_executor_stats():
+    return get_executor().stats()
+
+
+@app.get("/admin/executor/expensive")
+def get_expensive_executions(order_by: str = "execution_time", days: int = 7, limit: int = 20):
+    try:
+        return {"executions": chat_service.get_expensive_executions(order_by, days, limit)}
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.get("/admin/cache")
+def get_metadata_cache_stats():
+    return {"caches": get_cache_stats(), "datasets": get_dataset_cache_stats()}
+
+
 @app.post("/users/login", status_code=status.HTTP_200_OK)
 def login_user(user: UserLogin):
     try:
@@ -129,7 +238,7 @@ def get_user(email: str):
 
 
 @app.get("/users/{email}/data")
-def get_user_data(email: str):
+def get_user_data(email: str, uow: UnitOfWork = Depends(request_unit_of_work)):
     try:
         user_data = user_service.get_user_with_chat_sessions(email)
         if not user_data:
@@ -148,7 +257,7 @@ def get_user_data(email: str):
 
 
 @app.get("/users/{email}/stats")
-def get_user_stats(email: str):
+def get_user_stats(email: str, uow: UnitOfWork = Depends(request_unit_of_work)):
     try:
         if not user_service.user_exists(email):
             raise HTTPException(
@@ -192,7 +301,7 @@ def update_user(email: str, user_update: UserUpdate):
 
 
 @app.post("/chat-sessions", status_code=status.HTTP_201_CREATED)
-def create_chat_session(session: ChatSessionCreate):
+def create_chat_session(session: ChatSessionCreate, uow: UnitOfWork = Depends(request_unit_of_work)):
     try:
         if not user_service.user_exists(session.email):
             raise HTTPException(
@@ -201,6 +310,7 @@ def create_chat_session(session: ChatSessionCreate):
             )
 
         session_data = chat_service.create_chat_session(session.email, session.title)
+        uow.commit()
         return {
             "message": "Chat session created successfully",
             "session": session_data
@@ -237,24 +347,35 @@ def get_chat_session(session_id: str):
 
 
 @app.get("/chat-sessions/{session_id}/full")
-def get_chat_session_full(session_id: str, email: Optional[str] = None):
+def get_chat_session_full(session_id: str, email: Optional[str] = None,
+                          limit: int = chat_service.MESSAGES_PAGE_DEFAULT,
+                          before: Optional[str] = None, after: Optional[str] = None):
     try:
-        session_data = chat_service.get_chat_session_with_messages(session_id)
-        if not session_data:
+        result = chat_service.get_chat_session_document(
+            session_id, email=email, limit=limit, before=before, after=after
+        )
+        if result is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Chat session not found"
             )
 
-        if email and not chat_service.verify_session_owner(session_id, email):
+        authorized, document = result
+        if not authorized:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You don't have access to this session"
             )
 
-        return session_data
+        # Already JSON, serialized by Postgres.
+        return Response(content=document, media_type="application/json")
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -323,7 +444,7 @@ def delete_chat_session(session_id: str):
 
 
 @app.post("/messages", status_code=status.HTTP_201_CREATED)
-def add_message(message: MessageCreate):
+def add_message(message: MessageCreate, uow: UnitOfWork = Depends(request_unit_of_work)):
     try:
         session = chat_service.get_chat_session(message.chat_session_id)
         if not session:
@@ -337,6 +458,7 @@ def add_message(message: MessageCreate):
             message.sender,
             message.message_txt
         )
+        uow.commit()
         return {
             "message": "Message added successfully",
             "data": message_data
@@ -351,14 +473,22 @@ def add_message(message: MessageCreate):
 
 
 @app.get("/chat-sessions/{session_id}/messages")
-def get_messages(session_id: str):
+def get_messages(session_id: str, limit: int = chat_service.MESSAGES_PAGE_DEFAULT,
+                 before: Optional[str] = None, after: Optional[str] = None):
     try:
-        messages = chat_service.get_messages(session_id)
+        page = chat_service.get_messages_page(session_id, limit=limit, before=before, after=after)
         return {
             "session_id": session_id,
-            "messages": messages,
-            "count": len(messages)
+            "messages": page["messages"],
+            "count": len(page["messages"]),
+            "next_cursor": page["next_cursor"],
+            "prev_cursor": page["prev_cursor"]
         }
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -366,7 +496,32 @@ def get_messages(session_id: str):
         )
 
 
-@app.post("/datasets/analyze", status_code=status.HTTP_201_CREATED)
+@app.get("/artifacts/{artifact_hash}")
+def get_artifact(artifact_hash: str, if_none_match: Optional[str] = Header(None)):
+    # Artifacts are addressed by the SHA-256 of their bytes, so they never change.
+    cache_headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": f'"{artifact_hash}"'
+    }
+    if if_none_match and if_none_match.strip('W/"') == artifact_hash:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+    try:
+        artifact = artifact_service.get_artifact(artifact_hash)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get artifact: {str(e)}"
+        )
+    if not artifact:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Artifact not found"
+        )
+    return Response(content=artifact["data"], media_type=artifact["content_type"], headers=cache_headers)
+
+
+@app.post("/datasets/analyze", status_code=status.HTTP_202_ACCEPTED)
 def analyze_dataset(dataset: DatasetAnalyze):
     try:
         if not user_service.user_exists(dataset.email):
@@ -382,7 +537,7 @@ def analyze_dataset(dataset: DatasetAnalyze):
                 detail="Chat session not found"
             )
 
-        result = dataset_service.analyze_dataset(
+        job, coalesced = get_ingestion_queue().submit(
             dataset.dataset_url,
             dataset.email,
             dataset.chat_session_id,
@@ -391,11 +546,19 @@ def analyze_dataset(dataset: DatasetAnalyze):
         )
 
         return {
-            "message": "Dataset analyzed successfully",
-            **result
+            "message": "Dataset analysis queued",
+            "job_id": job.job_id,
+            "status": job.status,
+            "coalesced": coalesced
         }
     except HTTPException:
         raise
+    except IngestionQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -403,6 +566,53 @@ def analyze_dataset(dataset: DatasetAnalyze):
         )
 
 
+@app.get("/datasets/jobs/{job_id}")
+def get_ingestion_job(job_id: str):
+    job = get_ingestion_queue().get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return job.to_dict()
+
+
+@app.get("/datasets/jobs/{job_id}/events")
+async def stream_ingestion_job(job_id: str):
+    job = get_ingestion_queue().get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+
+    async def generate_events():
+        version = -1
+        idle = 0.0
+        while True:
+            if job.version != version:
+                version = job.version
+                idle = 0.0
+                state = job.to_dict()
+                yield f"data: {json.dumps(state, default=str)}\n\n"
+                if state["status"] not in ("queued", "running"):
+                    return
+            elif idle >= 15:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(0.25)
+            idle += 0.25
+
+    return StreamingResponse(
+        generate_events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
+
 @app.get("/datasets")
 def get_dataset(dataset_url: str):
     try:
@@ -461,6 +671,28 @@ def get_dataset_columns(dataset_url: str):
         )
 
 
+@app.get("/datasets/profile")
+def get_dataset_profile(dataset_url: str):
+    try:
+        columns = dataset_service.get_dataset_profile(dataset_url)
+        if not columns:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Dataset not found"
+            )
+        return {
+            "dataset_url": dataset_url,
+            "columns": columns
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get dataset profile: {str(e)}"
+        )
+
+
 @app.delete("/datasets")
 def delete_dataset(dataset_url: str):
     try:
@@ -484,12 +716,29 @@ def delete_dataset(dataset_url: str):
 
 
 @app.get("/datasets/observations")
-def get_dataset_observations(dataset_url: str, limit: int = 100, offset: int = 0):
+def get_dataset_observations(dataset_url: str, limit: int = 100, offset: int = 0,
+                             columns: Optional[str] = None, filters: Optional[str] = None,
+                             sort: Optional[str] = None, search: Optional[str] = None):
+    """
+    columns: comma-separated projection. filters: JSON list of
+    {"column", "op", "value"} (eq, ne, lt, le, gt, ge, in, not_in, between,
+    contains, starts_with, ends_with, is_null, not_null). sort: comma-separated
+    columns, "-" prefix for descending. search: case-insensitive text match.
+    """
     try:
         observations_data = dataset_service.get_dataset_observations(
-            dataset_url, limit=limit, offset=offset
+            dataset_url, limit=limit, offset=offset,
+            columns=[name.strip() for name in columns.split(",") if name.strip()] if columns else None,
+            filters=dataset_query.parse_filters(filters),
+            sort=dataset_query.parse_sort(sort),
+            search=search
         )
         return observations_data
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -497,8 +746,73 @@ def get_dataset_observations(dataset_url: str, limit: int = 100, offset: int = 0
         )
 
 
+@app.get("/datasets/series")
+def get_dataset_series(dataset_url: str, y: str, x: Optional[str] = None, points: int = 1000,
+                       method: str = "lttb", x_min: Optional[str] = None, x_max: Optional[str] = None):
+    """
+    y: comma-separated columns to plot against x (default: row number).
+    Each series is downsampled to at most `points` with method lttb or
+    minmax; x_min/x_max zoom into a range.
+    """
+    try:
+        return dataset_series.get_series(
+            dataset_url,
+            [name.strip() for name in y.split(",") if name.strip()],
+            x=x, points=points, method=method, x_min=x_min, x_max=x_max
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get dataset series: {str(e)}"
+        )
+
+
+@app.post("/datasets/aggregate")
+def aggregate_dataset(aggregate_request: DatasetAggregate):
+    """
+    Group-by aggregation over the cached dataset, without generating code.
+    aggregations: [{"column", "func", "as"}] with func one of count,
+    count_distinct, sum, mean, min, max, median, stddev, variance.
+    time_bucket: {"column", "unit"} with unit hour, day, week, month,
+    quarter or year. filters use the same predicates as
+    /datasets/observations. order_by: output columns, comma-separated or
+    a list, "-" prefix for descending. limit: top-N groups.
+    """
+    try:
+        spec = aggregate_request.model_dump(exclude={"dataset_url"}, exclude_none=True)
+        return dataset_aggregate.run_aggregate(aggregate_request.dataset_url, spec)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to aggregate dataset: {str(e)}"
+        )
+
+
+def _answer_aggregate(dataset_url: str, spec: Dict[str, Any]) -> str:
+    try:
+        return dataset_aggregate.format_markdown(dataset_aggregate.run_aggregate(dataset_url, spec))
+    except ValueError as e:
+        return f"Error: {str(e)}"
+
+
+def _execution_user(chat_session_id: str) -> str:
+    """Key the executor shares slots by: the session owner, so users with many sessions get no extra share."""
+    session = chat_service.get_chat_session(chat_session_id)
+    return session["email"] if session else chat_session_id
+
+
 @app.post("/query/execute")
-def execute_query(query_request: QueryExecute):
+def execute_query(query_request: QueryExecute, uow: UnitOfWork = Depends(request_unit_of_work)):
     try:
         columns = dataset_service.get_dataset_columns(query_request.dataset_url)
         if not columns:
@@ -508,12 +822,18 @@ def execute_query(query_request: QueryExecute):
             )
 
         conversation_history = chat_service.get_messages(query_request.chat_session_id)
+        # Resolved while the request still holds its connection; after the
+        # commit a cache miss would check one out again for the whole run.
+        user = _execution_user(query_request.chat_session_id)
 
         chat_service.add_message(
             query_request.chat_session_id,
             "user",
             query_request.query
         )
+        # Commit the user's message and release the connection before the
+        # model and the executor run.
+        uow.commit()
 
         try:
             result = ai_service.process_query(
@@ -522,37 +842,47 @@ def execute_query(query_request: QueryExecute):
                 query_request.dataset_url,
                 conversation_history
             )
+            if result.get("aggregate") is not None:
+                # Answered in-process from the cached dataset, no code to run.
+                result["response"] = _answer_aggregate(query_request.dataset_url, result["aggregate"])
 
             if result["needs_code"]:
                 code = result["code"]
                 executor = get_executor()
-                execution_result = executor.execute_code(code)
+                execution_result = executor.execute_code(
+                    code,
+                    dataset_url=query_request.dataset_url,
+                    columns=[column["name"] for column in columns],
+                    user=user,
+                    priority=query_request.priority
+                )
 
                 if execution_result["success"]:
                     response_text = execution_result['output']
-                    
-                    # Extract base64 images from markdown
-                    image_pattern = r'!\[Chart\]\(data:image/png;base64,([A-Za-z0-9+/=]+)\)'
-                    images = re.findall(image_pattern, response_text)
-                    
-                    # Remove image markdown from text (optional - keep if you want both)
-                    # response_text_clean = re.sub(image_pattern, '', response_text).strip()
                 else:
                     response_text = f"Error: {execution_result['error']}"
-                    images = []
 
-                chat_service.add_message(
+                message = chat_service.add_message(
                     query_request.chat_session_id,
                     "assistant",
-                    response_text
+                    response_text,
+                    code,
+                    execution_stats=execution_stats(execution_result)
                 )
+                uow.commit()
+
+                # Charts are stored as artifacts; return the stored text, which
+                # references them by URL instead of inlining base64.
+                response_text = message["message_txt"]
+                if execution_result["success"]:
+                    execution_result["output"] = response_text
 
                 return {
                     "query": query_request.query,
                     "code": code,
                     "execution": execution_result,
                     "response": response_text,
-                    "images": images  # Array of base64 image strings
+                    "images": artifact_service.find_artifact_urls(response_text)  # Artifact URLs of charts
                 }
             else:
                 response_text = result["response"]
@@ -561,15 +891,23 @@ def execute_query(query_request: QueryExecute):
                     "assistant",
                     response_text
                 )
+                uow.commit()
 
                 return {
                     "query": query_request.query,
                     "code": None,
+                    "aggregate": result.get("aggregate"),
                     "execution": None,
                     "response": response_text,
                     "images": []  # No images for text responses
                 }
 
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)}
+            )
         except Exception as e:
             error_msg = f"Failed to process query: {str(e)}"
             chat_service.add_message(
@@ -577,6 +915,7 @@ def execute_query(query_request: QueryExecute):
                 "system",
                 error_msg
             )
+            uow.commit()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=error_msg
@@ -592,7 +931,7 @@ def execute_query(query_request: QueryExecute):
 
 
 @app.post("/query/execute/stream")
-def execute_query_stream(query_request: QueryExecute):
+def execute_query_stream(query_request: QueryExecute, uow: UnitOfWork = Depends(request_unit_of_work)):
     columns = dataset_service.get_dataset_columns(query_request.dataset_url)
     if not columns:
         raise HTTPException(
@@ -601,6 +940,7 @@ def execute_query_stream(query_request: QueryExecute):
         )
 
     conversation_history = chat_service.get_messages(query_request.chat_session_id)
+    user = _execution_user(query_request.chat_session_id)
 
     context_messages = []
     for msg in conversation_history:
@@ -613,6 +953,7 @@ def execute_query_stream(query_request: QueryExecute):
         "user",
         query_request.query
     )
+    uow.commit()
 
     try:
         result = ai_service.process_query(
@@ -621,6 +962,8 @@ def execute_query_stream(query_request: QueryExecute):
             query_request.dataset_url,
             conversation_history
         )
+        if result.get("aggregate") is not None:
+            result["response"] = _answer_aggregate(query_request.dataset_url, result["aggregate"])
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -640,18 +983,29 @@ def execute_query_stream(query_request: QueryExecute):
                 yield f"data: {json.dumps({'type': 'executing'})}\n\n"
 
                 executor = get_executor()
-                execution_result = executor.execute_code(clean_code)
+                execution_result = executor.execute_code(
+                    clean_code,
+                    dataset_url=query_request.dataset_url,
+                    columns=[column["name"] for column in columns],
+                    user=user,
+                    priority=query_request.priority
+                )
 
                 if execution_result["success"]:
                     response_text = execution_result['output']
                 else:
                     response_text = f"Error: {execution_result['error']}"
 
-                chat_service.add_message(session_id, "assistant", response_text, clean_code)
+                message = chat_service.add_message(session_id, "assistant", response_text, clean_code,
+                                                   execution_stats=execution_stats(execution_result))
+                uow.commit()
+                response_text = message["message_txt"]
 
                 yield f"data: {json.dumps({'type': 'result', 'content': response_text})}\n\n"
                 yield f"data: {json.dumps({'type': 'done', 'full_response': response_text, 'generated_code': clean_code})}\n\n"
 
+            except AdmissionRejected as e:
+                yield f"data: {json.dumps({'type': 'error', 'content': str(e), 'retry_after': e.retry_after})}\n\n"
             except Exception as e:
                 error_msg = f"Error: {str(e)}"
                 yield f"data: {json.dumps({'type': 'error', 'content': error_msg})}\n\n"
@@ -674,6 +1028,7 @@ def execute_query_stream(query_request: QueryExecute):
                 yield f"data: {json.dumps({'type': 'chunk', 'content': complete_response})}\n\n"
                 
                 chat_service.add_message(session_id, "assistant", complete_response)
+                uow.commit()
                 yield f"data: {json.dumps({'type': 'done', 'full_response': complete_response})}\n\n"
             except Exception as e:
                 yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
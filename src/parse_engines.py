@@ -0,0 +1,186 @@
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+# Rows parsed at a time by the pandas engine; bounds peak memory during ingestion.
+DATASET_INGEST_CHUNK_ROWS = int(os.getenv("DATASET_INGEST_CHUNK_ROWS", "65536"))
+# Bytes per block for the Arrow CSV reader; blocks are decoded in parallel.
+DATASET_ARROW_BLOCK_BYTES = int(os.getenv("DATASET_ARROW_BLOCK_BYTES", str(8 * 1024 * 1024)))
+# Engine per file type: "auto" picks the fastest one installed.
+DATASET_CSV_ENGINE = os.getenv("DATASET_CSV_ENGINE", "auto")
+DATASET_EXCEL_ENGINE = os.getenv("DATASET_EXCEL_ENGINE", "auto")
+# Extra cell values read as null, comma separated, on top of each engine's defaults.
+DATASET_NULL_VALUES = [value for value in os.getenv("DATASET_NULL_VALUES", "").split(",") if value]
+# Whether the Arrow CSV engine keeps the date/timestamp types it infers or
+# returns those columns as text, as the pandas engine does.
+DATASET_INFER_DATES = os.getenv("DATASET_INFER_DATES", "true").lower() in ("1", "true", "yes")
+
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+# pandas' default NA strings, which the Arrow reader is given too so both
+# engines agree on what counts as missing.
+_DEFAULT_NULL_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+
+def to_arrow_table(df: pd.DataFrame) -> pa.Table:
+    """Arrow copy of df. Object columns Arrow cannot type (mixed values) are stored as strings."""
+    arrays = []
+    for column_name in df.columns:
+        column = df[column_name]
+        try:
+            arrays.append(pa.array(column, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays.append(pa.array(column.map(lambda value: None if pd.isna(value) else str(value))))
+    return pa.Table.from_arrays(arrays, names=[str(name) for name in df.columns])
+
+
+def pandas_column_names(names: List[str]) -> List[str]:
+    """
+    Header names as pandas' CSV reader returns them: blanks become
+    "Unnamed: <position>" and repeats get ".1", ".2", ... suffixes that do
+    not collide with any other name in the header. Named columns keep their
+    names ahead of blank ones.
+    """
+    header = [name if name else f"Unnamed: {position}" for position, name in enumerate(names)]
+    blank = [position for position, name in enumerate(names) if not name]
+    counts: Dict[str, int] = {}
+    for position in [p for p in range(len(header)) if names[p]] + blank:
+        name = header[position]
+        count = counts.get(name, 0)
+        if count > 0:
+            original = name
+            while count > 0:
+                counts[original] = count + 1
+                name = f"{original}.{count}"
+                count = count + 1 if name in header else counts.get(name, 0)
+            header[position] = name
+        counts[name] = count + 1
+    return header
+
+
+class ParseEngine:
+    """Parses a binary file object into Arrow tables, one bounded chunk at a time."""
+
+    name = ""
+    file_types = ()
+
+    def available(self) -> bool:
+        return True
+
+    def read_chunks(self, source) -> Iterator[pa.Table]:
+        raise NotImplementedError
+
+
+class ArrowCsvEngine(ParseEngine):
+    """
+    pyarrow's streaming CSV reader: blocks are tokenized and converted on
+    multiple threads. Types are inferred from the first block, so a later
+    value that does not fit raises pa.ArrowInvalid and the caller falls back.
+    """
+
+    name = "arrow"
+    file_types = ("csv",)
+
+    def read_chunks(self, source) -> Iterator[pa.Table]:
+        reader = pa_csv.open_csv(
+            source,
+            read_options=pa_csv.ReadOptions(block_size=DATASET_ARROW_BLOCK_BYTES, use_threads=True),
+            convert_options=pa_csv.ConvertOptions(
+                null_values=_DEFAULT_NULL_VALUES + DATASET_NULL_VALUES,
+                strings_can_be_null=True,
+            ),
+        )
+        names = pandas_column_names(reader.schema.names)
+        empty = True
+        for batch in reader:
+            empty = False
+            table = pa.Table.from_batches([batch]).rename_columns(names)
+            if not DATASET_INFER_DATES:
+                table = _dates_as_text(table)
+            yield table
+        if empty:
+            # Header-only file: still report its columns.
+            yield reader.schema.empty_table().rename_columns(names)
+
+
+class PandasCsvEngine(ParseEngine):
+    name = "pandas"
+    file_types = ("csv",)
+
+    def read_chunks(self, source) -> Iterator[pa.Table]:
+        with pd.read_csv(source, chunksize=DATASET_INGEST_CHUNK_ROWS,
+                         na_values=DATASET_NULL_VALUES or None) as reader:
+            for df in reader:
+                yield to_arrow_table(df)
+
+
+class _ExcelEngine(ParseEngine):
+    file_types = ("excel",)
+    pandas_engine = None
+
+    def read_chunks(self, source) -> Iterator[pa.Table]:
+        # Workbooks are zip archives and cannot be parsed incrementally; spool
+        # the download to disk so only the parsed sheet is held in memory.
+        with tempfile.TemporaryFile() as spool:
+            shutil.copyfileobj(source, spool, SPOOL_CHUNK_BYTES)
+            spool.seek(0)
+            df = pd.read_excel(spool, engine=self.pandas_engine,
+                               na_values=DATASET_NULL_VALUES or None)
+        yield to_arrow_table(df)
+
+
+class CalamineExcelEngine(_ExcelEngine):
+    """Rust calamine reader, several times faster than openpyxl; used when python-calamine is installed."""
+
+    name = "calamine"
+    pandas_engine = "calamine"
+
+    def available(self) -> bool:
+        try:
+            import python_calamine  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+
+class OpenpyxlExcelEngine(_ExcelEngine):
+    name = "openpyxl"
+    pandas_engine = None
+
+
+# Preference order per file type; the last engine is the fallback.
+ENGINES: Dict[str, List[ParseEngine]] = {
+    "csv": [ArrowCsvEngine(), PandasCsvEngine()],
+    "excel": [CalamineExcelEngine(), OpenpyxlExcelEngine()],
+}
+_CONFIGURED = {"csv": DATASET_CSV_ENGINE, "excel": DATASET_EXCEL_ENGINE}
+
+
+def get_engine(file_type: str, name: Optional[str] = None) -> ParseEngine:
+    """The engine called name, or the configured/first available one for file_type."""
+    if file_type not in ENGINES:
+        raise ValueError(f"Unsupported file type: {file_type}")
+    name = name or _CONFIGURED.get(file_type, "auto")
+    for engine in ENGINES[file_type]:
+        if (name == "auto" or engine.name == name) and engine.available():
+            return engine
+    raise ValueError(f"Parse engine {name!r} is not available for {file_type} files")
+
+
+def get_fallback_engine(file_type: str) -> ParseEngine:
+    return ENGINES[file_type][-1]
+
+
+def _dates_as_text(table: pa.Table) -> pa.Table:
+    for index, field in enumerate(table.schema):
+        if pa.types.is_date(field.type) or pa.types.is_timestamp(field.type):
+            table = table.set_column(index, field.name, table.column(index).cast(pa.string()))
+    return table
@@ -0,0 +1,214 @@
+import math
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+HLL_PRECISION = 12
+QUANTILE_SKETCH_K = 200
+TOP_K = 10
+# Candidate values kept while counting; trimmed to the most frequent after each batch.
+TOP_K_CAPACITY = 1000
+HISTOGRAM_BINS = 20
+PROFILE_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+class HyperLogLog:
+    """Approximate distinct counter; standard error is about 1.04 / sqrt(2 ** precision)."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values: np.ndarray):
+        if len(values) == 0:
+            return
+        hashes = pd.util.hash_array(values)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = (hashes << np.uint64(self.precision)) | np.uint64(1 << (self.precision - 1))
+        rank = 64 - np.floor(np.log2(rest.astype(np.float64))).astype(np.int64)
+        np.maximum.at(self.registers, index, np.clip(rank, 1, 64).astype(np.uint8))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        estimate = (0.7213 / (1 + 1.079 / m)) * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class QuantileSketch:
+    """
+    KLL-style quantile sketch: a stack of compactors where level i holds items
+    of weight 2 ** i. A full level is sorted and every other item promoted, so
+    memory stays O(k log n) while rank error stays around 1/k.
+    """
+
+    def __init__(self, k: int = QUANTILE_SKETCH_K):
+        self.k = k
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(0)
+
+    def add(self, values: np.ndarray):
+        if len(values) == 0:
+            return
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(self.levels[level])
+                leftover = items[len(items) - len(items) % 2:]
+                items = items[:len(items) - len(items) % 2]
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                self.levels[level] = leftover
+            level += 1
+
+    def quantiles(self, qs) -> List[Optional[float]]:
+        values, cumulative = self._sorted_weighted()
+        if len(values) == 0:
+            return [None for _ in qs]
+        total = cumulative[-1]
+        positions = np.searchsorted(cumulative, [q * total for q in qs])
+        return [float(values[min(position, len(values) - 1)]) for position in positions]
+
+    def cdf(self, points) -> np.ndarray:
+        values, cumulative = self._sorted_weighted()
+        if len(values) == 0:
+            return np.zeros(len(points))
+        positions = np.searchsorted(values, points, side="right")
+        ranks = np.concatenate([[0], cumulative])[positions]
+        return ranks / cumulative[-1]
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(int(self.k * (2 / 3) ** depth), 2)
+
+    def _sorted_weighted(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+
+class ColumnProfiler:
+    """Accumulates one column's profile over Arrow batches; every statistic merges across batches."""
+
+    def __init__(self, data_type: pa.DataType):
+        self.data_type = data_type
+        self.numeric = pa.types.is_integer(data_type) or pa.types.is_floating(data_type)
+        self.temporal = pa.types.is_temporal(data_type)
+        self.rows = 0
+        self.null_count = 0
+        self.minimum = None
+        self.maximum = None
+        self.distinct = HyperLogLog()
+        self.top_counts: Dict[Any, int] = {}
+        # Running count, mean and sum of squared deviations (Chan et al.)
+        self.moment_count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.quantiles = QuantileSketch() if self.numeric else None
+
+    def update(self, array: pa.Array):
+        self.rows += len(array)
+        self.null_count += array.null_count
+        values = array.drop_null()
+        if len(values) == 0:
+            return
+
+        if self.numeric or self.temporal:
+            if pa.types.is_duration(self.data_type):
+                # min_max has no duration kernel; compare the integer storage.
+                bounds = pc.min_max(values.cast(pa.int64()))
+                low, high = (pa.scalar(bounds[key].as_py(), self.data_type).as_py() for key in ("min", "max"))
+            else:
+                bounds = pc.min_max(values)
+                low, high = bounds["min"].as_py(), bounds["max"].as_py()
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+
+        if self.numeric:
+            numbers = values.to_numpy(zero_copy_only=False).astype(np.float64)
+            numbers = numbers[np.isfinite(numbers)]
+            self._update_moments(numbers)
+            self.quantiles.add(numbers)
+
+        self.distinct.add(values.to_numpy(zero_copy_only=False))
+
+        counts = pc.value_counts(values)
+        for value, count in zip(counts.field("values").to_pylist(), counts.field("counts").to_pylist()):
+            self.top_counts[value] = self.top_counts.get(value, 0) + count
+        if len(self.top_counts) > TOP_K_CAPACITY:
+            kept = sorted(self.top_counts.items(), key=lambda item: item[1], reverse=True)[:TOP_K_CAPACITY]
+            self.top_counts = dict(kept)
+
+    def result(self) -> Dict[str, Any]:
+        count = self.rows - self.null_count
+        profile = {
+            "count": count,
+            "null_count": self.null_count,
+            "distinct_count": min(self.distinct.count(), count),
+            "top_values": [
+                {"value": _json_value(value), "count": value_count}
+                for value, value_count in sorted(self.top_counts.items(),
+                                                 key=lambda item: item[1], reverse=True)[:TOP_K]
+            ],
+        }
+        if self.numeric or self.temporal:
+            profile["min"] = _json_value(self.minimum)
+            profile["max"] = _json_value(self.maximum)
+        if self.numeric and self.moment_count:
+            profile["mean"] = self.mean
+            profile["std"] = math.sqrt(self.m2 / (self.moment_count - 1)) if self.moment_count > 1 else 0.0
+            profile["quantiles"] = dict(zip(
+                (str(q) for q in PROFILE_QUANTILES), self.quantiles.quantiles(PROFILE_QUANTILES)
+            ))
+            profile["histogram"] = self._histogram()
+        return profile
+
+    def _update_moments(self, numbers: np.ndarray):
+        if len(numbers) == 0:
+            return
+        batch_count = len(numbers)
+        batch_mean = float(numbers.mean())
+        batch_m2 = float(((numbers - batch_mean) ** 2).sum())
+        total = self.moment_count + batch_count
+        delta = batch_mean - self.mean
+        self.mean += delta * batch_count / total
+        self.m2 += batch_m2 + delta * delta * self.moment_count * batch_count / total
+        self.moment_count = total
+
+    def _histogram(self) -> Dict[str, List[float]]:
+        # Min and max are only known at the end, so equal-width bins are
+        # filled from the quantile sketch's CDF instead of a second pass.
+        low, high = float(self.minimum), float(self.maximum)
+        if not (math.isfinite(low) and math.isfinite(high)) or low == high:
+            return {"edges": [low, high], "counts": [self.moment_count]}
+        edges = np.linspace(low, high, HISTOGRAM_BINS + 1)
+        cdf = self.quantiles.cdf(edges)
+        cdf[0] = 0.0
+        cdf[-1] = 1.0
+        counts = np.round(np.diff(cdf) * self.moment_count).astype(int)
+        return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return str(value)
+    if isinstance(value, Decimal):
+        value = float(value)
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return value
@@ -0,0 +1,289 @@
+"""
+Fork server for CodeExecutor. Started as a plain script (not imported by the
+app): it imports the heavy analysis modules once, then forks one clean child
+per execution request. Requests and replies are JSON lines on stdin and on
+the stdout the process was started with.
+
+    request:  {"code_file": ..., "cwd": ..., "stdout": ..., "stderr": ...,
+               "dataset": path to the cached Arrow copy or null,
+               "columns": columns to load, or null for all of them,
+               "limits": {"memory_bytes", "cpu_seconds", "open_files",
+                          "output_bytes"}, each optional}
+    replies:  {"pid": child_pid}                          once forked
+              {"pid": child_pid, "exit_code": n, "rss": bytes,
+               "dataset_bytes": bytes, "load_seconds": s,
+               "run_seconds": s, "cpu_user_seconds": s,
+               "cpu_system_seconds": s, "peak_rss_bytes": bytes}
+                                                          once it exits
+
+The dataset is loaded into a DataFrame by the server, so children inherit it
+through fork (copy-on-write) and see it as `df`. Only the requested columns
+are converted from the memory-mapped file. The server keeps the most recently
+used frames, up to EXECUTOR_DATASET_CACHE_MB.
+
+Limits are applied in the child just before the user's code runs, so the
+memory limit is on top of what the child starts with (preloaded modules and
+the dataset).
+
+`sandbox_server.py --once <request json>` runs a single request in the
+current process (the executor's path when no server is available); it
+writes load_seconds and run_seconds to the request's "stats" path.
+"""
+import json
+import os
+import sys
+import time
+import traceback
+from collections import OrderedDict
+
+EXECUTOR_DATASET_CACHE_BYTES = int(float(os.getenv("EXECUTOR_DATASET_CACHE_MB", "512")) * 1024 * 1024)
+
+# (path, columns or None) -> (DataFrame, approximate bytes); paths are
+# content-addressed, so an entry never goes stale.
+_datasets = OrderedDict()
+
+
+def _preload(modules):
+    for name in modules:
+        try:
+            __import__(name)
+        except ImportError:
+            continue
+    if "matplotlib" in sys.modules:
+        import matplotlib
+        matplotlib.use("Agg")
+        try:
+            # Builds (or loads) the font cache so children never do.
+            from matplotlib import font_manager
+            font_manager.fontManager.ttflist
+        except Exception:
+            pass
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _vm_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _apply_limits(limits):
+    """Cap memory, CPU time, open files and output size for the rest of this process."""
+    if not limits:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    import signal
+
+    # A run killed by a limit should not leave a core file behind.
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+    def set_limit(kind, soft, hard=None):
+        hard = soft if hard is None else hard
+        _, current_hard = resource.getrlimit(kind)
+        if current_hard != resource.RLIM_INFINITY:
+            soft, hard = min(soft, current_hard), min(hard, current_hard)
+        resource.setrlimit(kind, (soft, hard))
+
+    if limits.get("memory_bytes"):
+        try:
+            set_limit(resource.RLIMIT_AS, _vm_bytes() + limits["memory_bytes"])
+        except (OSError, ValueError, IndexError):
+            pass
+    if limits.get("cpu_seconds"):
+        # SIGXCPU at the soft limit, SIGKILL a little later if it is handled.
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime) + 1
+        set_limit(resource.RLIMIT_CPU, used + limits["cpu_seconds"], used + limits["cpu_seconds"] + 5)
+    if limits.get("open_files"):
+        set_limit(resource.RLIMIT_NOFILE, limits["open_files"])
+    if limits.get("output_bytes"):
+        set_limit(resource.RLIMIT_FSIZE, limits["output_bytes"])
+        # Python ignores SIGXFSZ; restore it so oversized output ends the run.
+        signal.signal(signal.SIGXFSZ, signal.SIG_DFL)
+
+
+def _peak_rss_bytes(usage) -> int:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def _load_dataset(path: str, columns=None):
+    key = (path, tuple(columns) if columns is not None else None)
+    cached = _datasets.get(key)
+    if cached is not None:
+        _datasets.move_to_end(key)
+        return cached[0]
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    with pa.memory_map(path) as source:
+        table = ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select([name for name in columns if name in table.schema.names])
+        # No Arrow worker threads in a process that forks.
+        df = table.to_pandas(use_threads=False)
+    _datasets[key] = (df, table.nbytes)
+    while len(_datasets) > 1 and _dataset_bytes() > EXECUTOR_DATASET_CACHE_BYTES:
+        _datasets.popitem(last=False)
+    return df
+
+
+def _dataset_bytes() -> int:
+    return sum(size for _, size in _datasets.values())
+
+
+def _prepare_dataset(request):
+    """(df, None) for the request's dataset, or (None, error message)."""
+    columns = request.get("columns")
+    if not request.get("dataset") or columns == []:
+        # No dataset, or code that never reads df.
+        return None, None
+    try:
+        return _load_dataset(request["dataset"], columns), None
+    except Exception as e:
+        return None, f"Failed to load dataset: {str(e)}"
+
+
+def _run_child(request, dataset, control_in: int, control_out: int):
+    """In the forked child: detach from the server and run the user's file as __main__."""
+    try:
+        os.setpgid(0, 0)
+        os.close(control_in)
+        os.close(control_out)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        for fd, path in ((1, request["stdout"]), (2, request["stderr"])):
+            target = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            os.dup2(target, fd)
+            os.close(target)
+        os.chdir(request["cwd"])
+        os.environ["TMPDIR"] = request["cwd"]
+        import tempfile
+        tempfile.tempdir = None
+        sys.argv = [request["code_file"]]
+        sys.path[0] = request["cwd"]
+        # The fork inherited every cached frame; keep only this request's, so
+        # user code cannot reach other datasets through __main__._datasets.
+        _datasets.clear()
+        _apply_limits(request.get("limits"))
+    except BaseException:
+        os._exit(70)
+    os._exit(_execute(request["code_file"], *dataset))
+
+
+def _execute(code_file: str, df, dataset_error) -> int:
+    """Run code_file as __main__ with the dataset bound to `df`; returns the exit code."""
+    if dataset_error:
+        print(dataset_error, file=sys.stderr)
+        sys.stderr.flush()
+        return 1
+    namespace = {"__name__": "__main__", "__file__": code_file, "__builtins__": __builtins__}
+    if df is not None:
+        namespace["df"] = df
+
+    exit_code = 0
+    try:
+        with open(code_file, encoding="utf-8") as f:
+            code = compile(f.read(), code_file, "exec")
+        exec(code, namespace)
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException as e:
+        # Report from the user's file down, as a plain `python file` run would.
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+    return exit_code
+
+
+def main():
+    # Keep the control channel off fds 0/1 so nothing the preloaded modules
+    # (or a child) print can corrupt it.
+    control_in = os.dup(0)
+    control_out = os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    _preload([name for name in os.getenv("EXECUTOR_PRELOAD", "").split(",") if name])
+
+    requests = os.fdopen(control_in, "r", encoding="utf-8")
+    replies = os.fdopen(control_out, "w", encoding="utf-8", buffering=1)
+    replies.write(json.dumps({"ready": True, "pid": os.getpid(), "rss": _rss_bytes()}) + "\n")
+
+    for line in requests:
+        request = json.loads(line)
+        load_started = time.monotonic()
+        dataset = _prepare_dataset(request)
+        load_seconds = time.monotonic() - load_started
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            _run_child(request, dataset, control_in, control_out)
+        # Set the group from this side too so the caller can signal it as
+        # soon as it knows the pid.
+        try:
+            os.setpgid(pid, pid)
+        except OSError:
+            pass
+        replies.write(json.dumps({"pid": pid}) + "\n")
+        run_started = time.monotonic()
+        _, status, usage = os.wait4(pid, 0)
+        replies.write(json.dumps({
+            "pid": pid,
+            "exit_code": os.waitstatus_to_exitcode(status),
+            "rss": _rss_bytes(),
+            "dataset_bytes": _dataset_bytes(),
+            "load_seconds": load_seconds,
+            "run_seconds": time.monotonic() - run_started,
+            "cpu_user_seconds": usage.ru_utime,
+            "cpu_system_seconds": usage.ru_stime,
+            "peak_rss_bytes": _peak_rss_bytes(usage),
+        }) + "\n")
+
+
+def run_once(request):
+    sys.argv = [request["code_file"]]
+    sys.path[0] = os.getcwd()
+    load_started = time.monotonic()
+    dataset = _prepare_dataset(request)
+    run_started = time.monotonic()
+    _apply_limits(request.get("limits"))
+    exit_code = _execute(request["code_file"], *dataset)
+    if request.get("stats"):
+        try:
+            with open(request["stats"], "w") as f:
+                json.dump({"load_seconds": run_started - load_started,
+                           "run_seconds": time.monotonic() - run_started}, f)
+        except OSError:
+            pass
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--once"]:
+        run_once(json.loads(sys.argv[2]))
+    else:
+        main()
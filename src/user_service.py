@@ -1,18 +1,24 @@
 from typing import Optional, Dict, List, Any
 from datetime import datetime
-from .database import get_db_cursor, load_sql
+from .database import after_commit, get_db_cursor, execute_statement
+from . import cache
 
 
 def add_or_login_user(email: str, full_name: Optional[str] = None) -> Dict[str, Any]:
     with get_db_cursor() as cursor:
-        cursor.execute(load_sql('users', 'insert_user'), (email, full_name))
+        execute_statement(cursor, 'users', 'insert_user', (email, full_name))
         user = cursor.fetchone()
-        return dict(user) if user else None
+    after_commit(lambda: cache.users.invalidate(email))
+    return dict(user) if user else None
 
 
 def get_user(email: str) -> Optional[Dict[str, Any]]:
+    return cache.users.get_or_load(email, lambda: _fetch_user(email))
+
+
+def _fetch_user(email: str) -> Optional[Dict[str, Any]]:
     with get_db_cursor(commit=False) as cursor:
-        cursor.execute(load_sql('users', 'get_user'), (email,))
+        execute_statement(cursor, 'users', 'get_user', (email,))
         user = cursor.fetchone()
         return dict(user) if user else None
 
@@ -23,7 +29,7 @@ def get_user_with_chat_sessions(email: str) -> Dict[str, Any]:
         return None
 
     with get_db_cursor(commit=False) as cursor:
-        cursor.execute(load_sql('chat_sessions', 'get_user_chat_sessions'), (email,))
+        execute_statement(cursor, 'chat_sessions', 'get_user_chat_sessions', (email,))
         sessions = cursor.fetchall()
         chat_sessions = [dict(session) for session in sessions] if sessions else []
 
@@ -36,9 +42,10 @@ def get_user_with_chat_sessions(email: str) -> Dict[str, Any]:
 def update_user(email: str, full_name: Optional[str] = None,
                 last_log_in: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
     with get_db_cursor() as cursor:
-        cursor.execute(load_sql('users', 'update_user'), (full_name, last_log_in, email))
+        execute_statement(cursor, 'users', 'update_user', (full_name, last_log_in, email))
         user = cursor.fetchone()
-        return dict(user) if user else None
+    after_commit(lambda: cache.users.invalidate(email))
+    return dict(user) if user else None
 
 
 def user_exists(email: str) -> bool:
@@ -0,0 +1,63 @@
+import base64
+import hashlib
+
+from src import artifact_service
+from src.artifact_service import extract_inline_images, find_artifact_urls
+
+PNG = b"\x89PNG\r\n\x1a\nfake image bytes"
+OTHER = b"GIF89a other image"
+
+
+def data_uri(data: bytes, content_type: str = "image/png") -> str:
+    return f"data:{content_type};base64,{base64.b64encode(data).decode()}"
+
+
+def sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_inline_images_become_artifact_urls():
+    text = f"Here is the chart:\n\n![Sales by region]({data_uri(PNG)})\n\nDone."
+
+    rewritten, artifacts = extract_inline_images(text)
+
+    assert rewritten == f"Here is the chart:\n\n![Sales by region](/artifacts/{sha(PNG)})\n\nDone."
+    assert artifacts == [(sha(PNG), "image/png", PNG)]
+
+
+def test_identical_images_are_stored_once():
+    text = f"![a]({data_uri(PNG)}) ![b]({data_uri(PNG)}) ![c]({data_uri(OTHER, 'image/gif')})"
+
+    rewritten, artifacts = extract_inline_images(text)
+
+    assert sorted(artifact[0] for artifact in artifacts) == sorted([sha(PNG), sha(OTHER)])
+    assert rewritten.count(f"/artifacts/{sha(PNG)}") == 2
+    assert "image/gif" in {artifact[1] for artifact in artifacts}
+
+
+def test_base64_wrapped_across_lines_is_decoded():
+    encoded = base64.b64encode(PNG).decode()
+    wrapped = "\n".join(encoded[i:i + 8] for i in range(0, len(encoded), 8))
+
+    rewritten, artifacts = extract_inline_images(f"![x](data:image/png;base64,{wrapped})")
+
+    assert artifacts == [(sha(PNG), "image/png", PNG)]
+    assert rewritten == f"![x](/artifacts/{sha(PNG)})"
+
+
+def test_invalid_payload_is_left_in_place():
+    text = "![x](data:image/png;base64,abc)"
+    assert extract_inline_images(text) == (text, [])
+
+
+def test_text_without_images_is_unchanged():
+    assert extract_inline_images("plain **markdown**") == ("plain **markdown**", [])
+
+
+def test_base_url_prefixes_artifact_urls(monkeypatch):
+    monkeypatch.setattr(artifact_service, "ARTIFACT_BASE_URL", "https://api.example.com")
+
+    rewritten, _ = extract_inline_images(f"![x]({data_uri(PNG)})")
+
+    assert rewritten == f"![x](https://api.example.com/artifacts/{sha(PNG)})"
+    assert find_artifact_urls(rewritten) == [f"https://api.example.com/artifacts/{sha(PNG)}"]
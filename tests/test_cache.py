@@ -0,0 +1,141 @@
+import pytest
+
+from src import cache as cache_module
+from src import database, user_service
+from src.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache("test", ttl=10)
+    cache.set("a", 1)
+
+    clock.now += 9.9
+    assert cache.get("a") == 1
+    clock.now += 0.2
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache("test", maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_get_or_load_caches_only_non_empty_results(clock):
+    cache = TTLCache("test")
+    calls = []
+
+    def loader(value):
+        def load():
+            calls.append(value)
+            return value
+        return load
+
+    for empty in (None, [], {}):
+        assert cache.get_or_load("key", loader(empty)) == empty
+    assert cache.get_or_load("key", loader({"name": "x"})) == {"name": "x"}
+    assert cache.get_or_load("key", loader({"name": "y"})) == {"name": "x"}
+    assert len(calls) == 4
+
+
+def test_invalidate_and_clear(clock):
+    cache = TTLCache("test")
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+    cache.clear()
+    assert cache.get("b") is None
+    assert cache.stats()["invalidations"] == 2
+
+
+class FakeCursor:
+    rowcount = 1
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql, params=None):
+        self.connection.row = {"email": params[-1], "full_name": params[0]}
+
+    def fetchone(self):
+        return self.connection.row
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    autocommit = True
+    closed = False
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class FakePool:
+    def getconn(self):
+        return FakeConnection()
+
+    def putconn(self, conn, discard=False):
+        pass
+
+
+@pytest.fixture
+def unit_of_work(monkeypatch):
+    monkeypatch.setattr(database, "get_pool", lambda: FakePool())
+    uow = database.UnitOfWork()
+    token = database.bind_unit_of_work(uow)
+    cache_module.users.clear()
+    yield uow
+    database.reset_unit_of_work(token)
+    cache_module.users.clear()
+
+
+def test_write_invalidates_only_after_commit(unit_of_work):
+    cache_module.users.set("a@example.com", {"email": "a@example.com", "full_name": "Old"})
+
+    user_service.update_user("a@example.com", "New")
+    assert cache_module.users.get("a@example.com")["full_name"] == "Old"
+
+    unit_of_work.commit()
+    assert cache_module.users.get("a@example.com") is None
+
+
+def test_rolled_back_write_keeps_the_cached_row(unit_of_work):
+    cache_module.users.set("a@example.com", {"email": "a@example.com", "full_name": "Old"})
+
+    user_service.update_user("a@example.com", "New")
+    unit_of_work.rollback()
+
+    assert cache_module.users.get("a@example.com")["full_name"] == "Old"
@@ -0,0 +1,57 @@
+import pytest
+
+from src.code_analysis import referenced_columns
+
+COLUMNS = ["region", "sales", "profit", "date"]
+
+
+@pytest.mark.parametrize("code, expected", [
+    ("print(df['sales'].sum())", ["sales"]),
+    ("df.groupby('region')['profit'].mean()", ["region", "profit"]),
+    ("top = df[df['sales'] > 10]\nprint(top[['region', 'date']])", ["region", "sales", "date"]),
+    ("print(df.sales.max())", ["sales"]),
+    ("print(df.loc[:, ['profit']])", ["profit"]),
+    ("print(df.sort_values('date').head()['sales'])", ["sales", "date"]),
+    ("df['margin'] = df['profit'] / df['sales']", ["sales", "profit"]),
+    ("df.groupby('region').agg(total=('sales', 'sum'))", ["region", "sales"]),
+])
+def test_projects_to_referenced_columns(code, expected):
+    assert referenced_columns(code, COLUMNS) == expected
+
+
+@pytest.mark.parametrize("code", [
+    "print(df)",
+    "print(df.describe())",
+    "summarize(df)",
+    "df.to_csv('out.csv')",
+    "print(df.iloc[:, 2])",
+    "print(df.shape)",
+    "print(globals()['df'])",
+    "df.groupby('region').sum()",
+    "print(df[",
+])
+def test_whole_frame_use_loads_everything(code):
+    assert referenced_columns(code, COLUMNS) is None
+
+
+def test_code_without_df_needs_no_dataset():
+    assert referenced_columns("import math\nprint(math.pi)", COLUMNS) == []
+
+
+def test_parameter_shadowing_df_is_not_the_dataset():
+    assert referenced_columns("def f(df):\n    return df\nprint(f(1))", COLUMNS) == []
+
+
+@pytest.mark.parametrize("code", [
+    "print(len(df))",
+    "print(df.shape[0])",
+    "print(df.empty)",
+    "print(df.index.max())",
+])
+def test_row_only_use_keeps_a_column(code):
+    assert referenced_columns(code, COLUMNS) == ["region"]
+
+
+def test_aliases_are_followed():
+    code = "data = df.copy()\nsubset = data.dropna(subset=['sales'])\nprint(subset['sales'].mean())"
+    assert referenced_columns(code, COLUMNS) == ["sales"]
@@ -0,0 +1,64 @@
+import os
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pytest
+
+from src import code_executor, dataset_cache
+from src.code_executor import CodeExecutor, SandboxPool
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="fork servers need os.fork")
+
+# Prints the fork server's pid: every child of one server shares it.
+SERVER_PID = "import os\nprint(os.getppid())"
+
+
+@pytest.fixture(autouse=True)
+def light_preload(monkeypatch):
+    monkeypatch.setattr(code_executor, "EXECUTOR_PRELOAD", "json")
+
+
+def make_pool(max_runs=200):
+    pool = SandboxPool(min_size=1, max_size=1, max_runs=max_runs, max_rss=1 << 40, idle_timeout=300)
+    pool.start()
+    return pool
+
+
+def test_pooled_run_round_trips_through_a_fork_server(monkeypatch, tmp_path):
+    path = str(tmp_path / "data.arrow")
+    table = pa.table({"region": ["North", "South"], "sales": [10, 20]})
+    with ipc.new_file(path, table.schema) as writer:
+        writer.write_table(table)
+    monkeypatch.setattr(dataset_cache.datasets, "local_path", lambda dataset_url: path)
+    pool = make_pool()
+    executor = CodeExecutor(pool)
+
+    result = executor.execute_code("print(int(df['sales'].sum()))", timeout=30,
+                                   dataset_url="http://example.invalid/data.csv")
+    pool.shutdown()
+
+    assert result["success"], result["error"]
+    assert result["output"] == "30\n"
+    assert pool.stats()["executions"] == 1
+    assert executor.stats()["cold_runs"] == 0
+
+
+def test_fork_server_is_replaced_after_max_runs():
+    pool = make_pool(max_runs=2)
+    executor = CodeExecutor(pool)
+
+    servers = [executor.execute_code(SERVER_PID, timeout=30)["output"] for _ in range(3)]
+    stats = pool.stats()
+    pool.shutdown()
+
+    assert servers[0] == servers[1] != servers[2]
+    assert (stats["started"], stats["retired"], stats["size"]) == (2, 1, 1)
+
+
+def test_runs_without_a_pool_are_counted_as_cold():
+    executor = CodeExecutor()
+
+    result = executor.execute_code("print('cold')", timeout=30)
+
+    assert result["output"] == "cold\n"
+    assert executor.stats()["cold_runs"] == 1
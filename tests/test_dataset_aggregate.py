@@ -0,0 +1,117 @@
+from datetime import datetime
+
+import pyarrow as pa
+import pytest
+
+from src import cache, dataset_aggregate
+from src.dataset_query import DatasetIndex
+
+TABLE = pa.table({
+    "region": ["North", "South", "North", "East", "South", "North"],
+    "sales": [10.0, 20.0, 30.0, 5.0, None, 15.0],
+    "ordered": pa.array([datetime(2024, 1, 5), datetime(2024, 1, 20), datetime(2024, 2, 1),
+                         datetime(2024, 2, 14), datetime(2024, 3, 3), datetime(2024, 3, 30)],
+                        pa.timestamp("s")),
+})
+
+
+class _TableFile:
+    def read_all(self) -> pa.Table:
+        return TABLE
+
+
+@pytest.fixture(autouse=True)
+def dataset(monkeypatch):
+    cache.aggregates.clear()
+    index = DatasetIndex(_TableFile(), "test-version")
+    monkeypatch.setattr(dataset_aggregate, "get_dataset_index", lambda dataset_url: index)
+    monkeypatch.setattr(dataset_aggregate, "release_dataset_index", lambda index: None)
+    yield
+    cache.aggregates.clear()
+
+
+def run(spec):
+    return dataset_aggregate.run_aggregate("http://example.invalid/sales.csv", spec)
+
+
+def test_count_all_without_group_by():
+    result = run({})
+
+    assert result["columns"] == ["count"]
+    assert result["rows"] == [{"count": 6}]
+    assert result["truncated"] is False
+
+
+def test_group_by_with_named_aggregations():
+    result = run({
+        "group_by": ["region"],
+        "aggregations": [{"column": "sales", "func": "sum", "as": "total"}, {"func": "count"}],
+    })
+
+    assert result["columns"] == ["region", "total", "count"]
+    assert result["rows"] == [
+        {"region": "East", "total": 5.0, "count": 1},
+        {"region": "North", "total": 55.0, "count": 3},
+        {"region": "South", "total": 20.0, "count": 2},
+    ]
+
+
+def test_time_bucket_groups_by_month():
+    result = run({
+        "time_bucket": {"column": "ordered", "unit": "month"},
+        "aggregations": [{"column": "sales", "func": "max"}],
+    })
+
+    assert result["rows"] == [
+        {"ordered_month": "2024-01-01T00:00:00", "sales_max": 20.0},
+        {"ordered_month": "2024-02-01T00:00:00", "sales_max": 30.0},
+        {"ordered_month": "2024-03-01T00:00:00", "sales_max": 15.0},
+    ]
+
+
+@pytest.mark.parametrize("order_by", ["-total", ["-total"]])
+def test_order_by_and_limit_truncate(order_by):
+    result = run({
+        "group_by": ["region"],
+        "aggregations": [{"column": "sales", "func": "sum", "as": "total"}],
+        "order_by": order_by,
+        "limit": 2,
+    })
+
+    assert [row["region"] for row in result["rows"]] == ["North", "South"]
+    assert result["group_count"] == 3
+    assert result["truncated"] is True
+
+
+def test_filters_apply_before_grouping():
+    result = run({"group_by": ["region"], "filters": [{"column": "sales", "op": "ge", "value": 15}]})
+    assert result["rows"] == [{"region": "North", "count": 2}, {"region": "South", "count": 1}]
+
+
+def test_results_are_cached_per_spec():
+    spec = {"group_by": ["region"]}
+    assert run(spec) is run(dict(spec))
+
+
+@pytest.mark.parametrize("spec, message", [
+    ([], "must be an object"),
+    ({"group_by": "region"}, "group_by must be a list"),
+    ({"group_by": ["region", 3]}, "group_by must be a list"),
+    ({"aggregations": {"func": "count"}}, "aggregations must be a list"),
+    ({"aggregations": ["sum"]}, "Each aggregation must be an object"),
+    ({"aggregations": [{"func": "median"}]}, "median needs a column"),
+    ({"aggregations": [{"func": "total", "column": "sales"}]}, "Unsupported aggregation"),
+    ({"aggregations": [{"func": "sum", "column": ["sales"]}]}, "column must be a string"),
+    ({"time_bucket": "month"}, "time_bucket needs"),
+    ({"time_bucket": {"column": "ordered", "unit": "decade"}}, "time_bucket needs"),
+    ({"filters": {"column": "sales"}}, "filters must be a list"),
+    ({"filters": [{"column": "sales", "op": "like"}]}, "Unsupported filter op"),
+    ({"order_by": {"total": "desc"}}, "order_by must be"),
+    ({"order_by": "profit"}, "Unknown order_by column"),
+    ({"limit": 0}, "positive integer"),
+    ({"limit": True}, "positive integer"),
+    ({"group_by": ["profit"]}, "Unknown column"),
+])
+def test_malformed_specs_are_value_errors(spec, message):
+    with pytest.raises(ValueError, match=message):
+        run(spec)
@@ -0,0 +1,145 @@
+import os
+import threading
+
+import pytest
+
+from src.dataset_cache import DatasetCache, DatasetMemoryCache
+
+CSV = b"region,sales\nNorth,10\nSouth,20\n"
+
+
+@pytest.fixture
+def datasets(tmp_path):
+    return DatasetCache(str(tmp_path / "cache"), 1 << 20, revalidate_after=60)
+
+
+def serve(server, name: str, data: bytes) -> str:
+    (server.root / name).write_bytes(data)
+    return f"{server.base_url}/{name}"
+
+
+def test_summary_describes_the_parsed_file(http_server, datasets):
+    summary = datasets.get_summary(serve(http_server, "sales.csv", CSV))
+
+    assert summary["num_rows"] == 2
+    assert [(c["name"], c["example_value"]) for c in summary["columns"]] == [("region", "North"), ("sales", "10")]
+
+
+def test_urls_with_identical_content_share_one_blob(http_server, datasets):
+    first = datasets.get_summary(serve(http_server, "a.csv", CSV))
+    second = datasets.get_summary(serve(http_server, "b.csv", CSV))
+
+    assert first["content_hash"] == second["content_hash"]
+    assert datasets.local_path(f"{http_server.base_url}/a.csv") == datasets.local_path(f"{http_server.base_url}/b.csv")
+    assert datasets.stats()["deduplicated"] == 1
+    assert len([name for name in os.listdir(datasets.blob_directory) if name.endswith(".arrow")]) == 1
+
+
+def test_fresh_copy_is_served_from_disk(http_server, datasets):
+    url = serve(http_server, "sales.csv", CSV)
+    datasets.get_summary(url)
+    datasets.get_summary(url)
+
+    stats = datasets.stats()
+    assert (stats["downloads"], stats["disk_hits"]) == (1, 1)
+
+
+def test_stale_copy_is_revalidated_with_a_conditional_get(http_server, tmp_path):
+    datasets = DatasetCache(str(tmp_path / "cache"), 1 << 20, revalidate_after=0)
+    url = serve(http_server, "sales.csv", CSV)
+    path = http_server.root / "sales.csv"
+    os.utime(path, (1_700_000_000, 1_700_000_000))
+    first = datasets.get_summary(url)
+
+    second = datasets.get_summary(url)
+    assert datasets.stats()["not_modified"] == 1
+    assert second["content_hash"] == first["content_hash"]
+
+    path.write_bytes(CSV + b"East,30\n")
+    os.utime(path, (1_800_000_000, 1_800_000_000))
+    third = datasets.get_summary(url)
+    assert third["content_hash"] != first["content_hash"]
+    assert third["num_rows"] == 3
+    assert datasets.stats()["downloads"] == 2
+
+
+def test_dataframe_is_kept_in_memory(http_server, datasets):
+    url = serve(http_server, "sales.csv", CSV)
+
+    assert datasets.get_dataframe(url) is datasets.get_dataframe(url)
+    assert datasets.memory.stats()["hits"] == 1
+
+
+def test_invalidate_forgets_the_url_but_keeps_the_blob(http_server, datasets):
+    url = serve(http_server, "sales.csv", CSV)
+    path = datasets.local_path(url)
+
+    datasets.invalidate(url)
+    assert os.path.exists(path)
+    datasets.get_summary(url)
+    assert datasets.stats()["downloads"] == 2
+    assert datasets.stats()["deduplicated"] == 1
+
+    datasets.release_blob(datasets.get_summary(url)["content_hash"])
+    assert not os.path.exists(path)
+
+
+def test_locks_are_dropped_when_unused(http_server, datasets):
+    urls = [serve(http_server, f"{n}.csv", CSV + str(n).encode()) for n in range(4)]
+    threads = [threading.Thread(target=datasets.get_dataframe, args=(url,)) for url in urls * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert datasets._locks == {}
+
+
+def test_memory_cache_is_bounded_by_bytes():
+    cache = DatasetMemoryCache(max_bytes=100)
+    cache.set("a", "A", 40)
+    cache.set("b", "B", 40)
+    cache.get("a")
+    cache.set("c", "C", 40)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("A", "C")
+    stats = cache.stats()
+    assert (stats["bytes"], stats["evictions"]) == (80, 1)
+
+
+def test_memory_cache_skips_values_larger_than_the_bound():
+    cache = DatasetMemoryCache(max_bytes=100)
+    cache.set("a", "A", 40)
+    cache.set("a", "too big", 101)
+
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_memory_cache_reports_every_value_it_lets_go_of():
+    dropped = []
+    cache = DatasetMemoryCache(max_bytes=100, on_evict=dropped.append)
+    cache.set("a", "A", 40)
+    cache.set("a", "A", 50)
+    cache.set("b", "B", 40)
+    cache.set("c", "C", 40)
+    cache.set("b", "B2", 40)
+    cache.set("d", "D", 101)
+    cache.invalidate("c")
+
+    assert dropped == ["A", "B", "D", "C"]
+
+
+def test_memory_cache_resize_only_touches_the_cached_value():
+    dropped = []
+    cache = DatasetMemoryCache(max_bytes=100, on_evict=dropped.append)
+    cache.set("a", "A", 40)
+    cache.resize("a", "other", 90)
+    cache.resize("b", "B", 10)
+    assert (cache.get("b"), cache.stats()["bytes"]) == (None, 40)
+
+    cache.resize("a", "A", 101)
+
+    assert cache.get("a") is None
+    assert dropped == ["A"]
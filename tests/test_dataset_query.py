@@ -0,0 +1,184 @@
+import json
+from datetime import date
+
+import pyarrow as pa
+import pytest
+
+from src import dataset_query
+from src.dataset_cache import DatasetMemoryCache
+from src.dataset_query import DatasetIndex, _compare, filter_mask, parse_filters, parse_sort
+
+
+class _TableFile:
+    def __init__(self, table: pa.Table):
+        self.table = table
+
+    def read_all(self) -> pa.Table:
+        return self.table
+
+
+TABLE = pa.table({
+    "region": pa.array(["North", "south", None, "North", "East"]),
+    "sales": pa.array([10, 25, 5, None, 40]),
+    "day": pa.array([date(2024, 1, d) for d in (1, 2, 3, 4, 5)]),
+})
+
+
+def matches(filters, search=None):
+    mask = filter_mask(DatasetIndex(_TableFile(TABLE), "v1"), filters, search)
+    return TABLE.filter(mask).column("sales").to_pylist()
+
+
+def test_parse_filters_accepts_a_json_list():
+    filters = [{"column": "sales", "op": "gt", "value": 10}, {"column": "region", "op": "is_null"}]
+    assert parse_filters(json.dumps(filters)) == filters
+
+
+@pytest.mark.parametrize("raw", [None, ""])
+def test_parse_filters_without_filters(raw):
+    assert parse_filters(raw) == []
+
+
+@pytest.mark.parametrize("raw, message", [
+    ("{not json", "JSON list"),
+    ('{"column": "sales"}', "JSON list"),
+    ('[{"column": "sales"}]', "column and an op"),
+    ('["sales"]', "column and an op"),
+    ('[{"column": "sales", "op": "like", "value": 1}]', "Unsupported filter op: like"),
+])
+def test_parse_filters_rejects_malformed_input(raw, message):
+    with pytest.raises(ValueError, match=message):
+        parse_filters(raw)
+
+
+def test_parse_sort():
+    assert parse_sort("region, -sales,") == [("region", "ascending"), ("sales", "descending")]
+    assert parse_sort(None) == []
+
+
+@pytest.mark.parametrize("op, value, expected", [
+    ("eq", 25, [False, True, False, None, False]),
+    ("ne", 25, [True, False, True, None, True]),
+    ("lt", 10, [False, False, True, None, False]),
+    ("le", 10, [True, False, True, None, False]),
+    ("gt", 10, [False, True, False, None, True]),
+    ("ge", 25, [False, True, False, None, True]),
+    ("in", [5, 40], [False, False, True, False, True]),
+    ("not_in", [5, 40], [True, True, False, False, False]),
+    ("between", [10, 25], [True, True, False, None, False]),
+])
+def test_compare_numeric(op, value, expected):
+    assert _compare(TABLE.column("sales"), op, value).to_pylist() == expected
+
+
+def test_compare_text_is_case_insensitive():
+    regions = pa.array(["North", "south", "Northeast"])
+    assert _compare(regions, "contains", "OUT").to_pylist() == [False, True, False]
+    assert _compare(regions, "starts_with", "north").to_pylist() == [True, False, True]
+    assert _compare(regions, "ends_with", "EAST").to_pylist() == [False, False, True]
+
+
+def test_compare_casts_dates_from_strings():
+    assert _compare(TABLE.column("day"), "ge", "2024-01-04").to_pylist() == [False, False, False, True, True]
+
+
+@pytest.mark.parametrize("op, value, message", [
+    ("in", 5, "needs a list"),
+    ("between", [1], r"\[low, high\]"),
+    ("contains", "1", "only applies to text columns"),
+    ("gt", "lots", "Invalid filter value"),
+])
+def test_compare_rejects_bad_values(op, value, message):
+    with pytest.raises(ValueError, match=message):
+        _compare(TABLE.column("sales"), op, value)
+
+
+def test_filter_mask_combines_filters_and_drops_nulls():
+    assert matches([{"column": "sales", "op": "ge", "value": 10},
+                    {"column": "region", "op": "ne", "value": "East"}]) == [10, 25]
+
+
+def test_not_in_leaves_out_missing_values():
+    assert matches([{"column": "region", "op": "not_in", "value": ["East"]}]) == [10, 25, None]
+    assert matches([{"column": "sales", "op": "not_in", "value": [40]}]) == [10, 25, 5]
+
+
+def test_filter_mask_on_text_goes_through_the_dictionary():
+    assert matches([{"column": "region", "op": "eq", "value": "North"}]) == [10, None]
+    assert matches([{"column": "region", "op": "is_null"}]) == [5]
+
+
+def test_filter_mask_search_matches_any_text_column():
+    assert matches([], search="SOUTH") == [25]
+
+
+def test_filter_mask_without_filters_is_none():
+    assert filter_mask(DatasetIndex(_TableFile(TABLE), "v1"), None) is None
+
+
+def test_filter_mask_rejects_unknown_columns():
+    with pytest.raises(ValueError, match="Unknown column"):
+        matches([{"column": "profit", "op": "gt", "value": 0}])
+
+
+class _ClosingFile(_TableFile):
+    def __init__(self, table: pa.Table):
+        super().__init__(table)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def indexes(monkeypatch):
+    """A small index cache over an in-memory dataset; yields the files it opened."""
+    opened = []
+
+    class _Datasets:
+        def get_summary(self, dataset_url):
+            return {"content_hash": dataset_url}
+
+        def open_file(self, dataset_url):
+            opened.append(_ClosingFile(TABLE))
+            return opened[-1]
+
+    monkeypatch.setattr(dataset_query.dataset_cache, "datasets", _Datasets())
+    monkeypatch.setattr(dataset_query, "_indexes",
+                        DatasetMemoryCache(max_bytes=10, on_evict=DatasetIndex.evict))
+    return opened
+
+
+def test_evicted_index_closes_its_file(indexes):
+    index = dataset_query.get_dataset_index("a")
+    dataset_query.release_dataset_index(index)
+    assert dataset_query.get_dataset_index("a") is index
+    dataset_query.release_dataset_index(index)
+    assert not indexes[0].closed
+
+    dataset_query._indexes.invalidate("a")
+
+    assert indexes[0].closed
+
+
+def test_index_in_use_is_closed_by_its_last_user(indexes):
+    index = dataset_query.get_dataset_index("a")
+    index.nbytes = 11
+    dataset_query.release_dataset_index(dataset_query.get_dataset_index("a"))
+    assert not indexes[0].closed
+
+    dataset_query.release_dataset_index(index)
+
+    assert indexes[0].closed
+    assert dataset_query.get_dataset_index("a") is not index
+    assert len(indexes) == 2
+
+
+def test_invalidated_index_is_closed_once_released(indexes):
+    first = dataset_query.get_dataset_index("a")
+    dataset_query._indexes.invalidate("a")
+    second = dataset_query.get_dataset_index("a")
+    dataset_query.release_dataset_index(first)
+
+    assert indexes[0].closed and not indexes[1].closed
+    assert dataset_query._indexes.get("a") is second
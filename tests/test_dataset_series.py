@@ -0,0 +1,101 @@
+from datetime import date
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from src.dataset_series import _bound, _lttb, _minmax, _range, _to_float
+
+
+def wave(size: int = 1000):
+    xs = np.arange(size, dtype=np.float64)
+    ys = np.sin(xs / 25.0)
+    ys[617] = 9.0
+    ys[300] = -9.0
+    return xs, ys
+
+
+def test_lttb_keeps_endpoints_and_size():
+    xs, ys = wave()
+
+    selected = _lttb(xs, ys, 50)
+
+    assert len(selected) == 50
+    assert selected[0] == 0 and selected[-1] == len(xs) - 1
+    assert np.all(np.diff(selected) > 0)
+
+
+def test_lttb_keeps_spikes():
+    xs, ys = wave()
+    selected = set(_lttb(xs, ys, 50).tolist())
+    assert {300, 617} <= selected
+
+
+def test_lttb_picks_one_point_per_bucket():
+    xs, ys = wave()
+    points = 40
+    edges = np.linspace(1, len(xs) - 1, points - 1).astype(np.int64)
+
+    selected = _lttb(xs, ys, points)
+
+    for bucket, position in enumerate(selected[1:-1]):
+        assert edges[bucket] <= position < edges[bucket + 1]
+
+
+@pytest.mark.parametrize("points", [2, 1000, 5000])
+def test_lttb_returns_everything_when_nothing_to_drop(points):
+    xs, ys = wave()
+    assert np.array_equal(_lttb(xs, ys, points), np.arange(len(xs)))
+
+
+def test_minmax_keeps_extremes_within_budget():
+    xs, ys = wave()
+
+    selected = _minmax(xs, ys, 60)
+
+    assert len(selected) <= 60
+    assert selected[0] == 0 and selected[-1] == len(xs) - 1
+    assert np.all(np.diff(selected) > 0)
+    assert {int(ys.argmin()), int(ys.argmax())} <= set(selected.tolist())
+
+
+def test_minmax_takes_each_buckets_min_and_max():
+    ys = np.array([3.0, 1.0, 2.0, 8.0, 5.0, 7.0, 6.0, 4.0, 0.0, 9.0, 2.0, 2.0])
+    xs = np.arange(len(ys), dtype=np.float64)
+
+    # 8 points: 3 buckets of 4 plus the endpoints.
+    selected = _minmax(xs, ys, 8)
+
+    assert selected.tolist() == [0, 1, 3, 5, 7, 8, 9, 11]
+
+
+def test_minmax_returns_everything_when_nothing_to_drop():
+    xs, ys = wave()
+    assert np.array_equal(_minmax(xs, ys, len(xs)), np.arange(len(xs)))
+
+
+def test_range_is_inclusive_and_never_inverted():
+    xs = np.array([1.0, 2.0, 3.0, 4.0])
+    assert _range(xs, 2.0, 3.0) == (1, 3)
+    assert _range(xs, None, None) == (0, 4)
+    assert _range(xs, 4.0, 1.0) == (3, 3)
+
+
+def test_to_float_converts_dates_to_epoch_milliseconds():
+    column = pa.chunked_array([pa.array([date(1970, 1, 2), None])])
+    values = _to_float(column, "day")
+    assert values[0] == 86400000.0
+    assert np.isnan(values[1])
+
+
+def test_to_float_rejects_text_that_is_not_a_date():
+    with pytest.raises(ValueError, match="neither numeric nor a date"):
+        _to_float(pa.chunked_array([pa.array(["north"])]), "region")
+
+
+def test_bound_parses_numbers_and_dates():
+    assert _bound("12.5", False) == 12.5
+    assert _bound("1970-01-02", True) == 86400000.0
+    assert _bound("", True) is None
+    with pytest.raises(ValueError, match="Invalid x bound"):
+        _bound("1970-01-02", False)
@@ -0,0 +1,52 @@
+import pytest
+
+from src import dataset_service
+from src.dataset_cache import DatasetCache
+
+
+@pytest.fixture
+def registered(monkeypatch, tmp_path):
+    """Runs analyze_dataset against a private dataset cache, capturing the rows it would register."""
+    calls = []
+
+    def register_dataset(dataset_url, name, file_type, chat_session_id, column_rows, blob_row):
+        calls.append(column_rows)
+        return {"dataset_url": dataset_url}, [
+            {"name": row[1], "datatype": row[2], "example_value": row[3]} for row in column_rows
+        ]
+
+    monkeypatch.setattr(dataset_service.dataset_cache, "datasets", DatasetCache(str(tmp_path / "cache"), 1 << 20, 60))
+    monkeypatch.setattr(dataset_service, "get_dataset_blob", lambda content_hash: None)
+    monkeypatch.setattr(dataset_service, "register_dataset", register_dataset)
+    monkeypatch.setattr(dataset_service, "release_unreferenced_blobs", lambda: [])
+    return calls
+
+
+def test_repeated_header_names_register_as_distinct_columns(http_server, registered):
+    (http_server.root / "repeated.csv").write_bytes(b"a,a,b,\n1,2,3,4\n5,6,7,8\n")
+
+    result = dataset_service.analyze_dataset(
+        f"{http_server.base_url}/repeated.csv", "owner@example.com", "session", "repeated"
+    )
+
+    names = [row[1] for row in registered[0]]
+    assert names == ["a", "a.1", "b", "Unnamed: 3"]
+    assert [row[3] for row in registered[0]] == ["1", "2", "3", "4"]
+    assert result["column_count"] == 4
+
+
+def test_summary_with_repeated_names_is_deduplicated(monkeypatch, registered):
+    summary = {
+        "content_hash": "0" * 64,
+        "num_rows": 1,
+        "columns": [
+            {"name": "a", "dtype": "int64", "example_value": "1"},
+            {"name": "a", "dtype": "object", "example_value": "x"},
+        ],
+    }
+    monkeypatch.setattr(dataset_service.dataset_cache.datasets, "get_summary", lambda *args: summary)
+    monkeypatch.setattr(dataset_service, "profile_dataset", lambda dataset_url: {})
+
+    dataset_service.analyze_dataset("http://example.invalid/old.csv", "owner@example.com", "session", "old")
+
+    assert [(row[1], row[2]) for row in registered[0]] == [("a", "int"), ("a.1", "str")]
@@ -0,0 +1,112 @@
+from collections import deque
+
+import pytest
+
+from src.execution_scheduler import AdmissionRejected, ExecutionScheduler, _Waiter
+
+
+def enqueue(scheduler, user, cost=1.0, priority="interactive"):
+    waiter = _Waiter(user, priority, cost)
+    scheduler._queues[priority].setdefault(user, deque()).append(waiter)
+    return waiter
+
+
+def drain(scheduler, priority="interactive"):
+    order = []
+    while scheduler._queues[priority]:
+        order.append(scheduler._next_locked(priority).user)
+    return order
+
+
+def test_round_robin_alternates_users_regardless_of_queue_length():
+    scheduler = ExecutionScheduler(concurrency=1, quantum=1.0)
+    for _ in range(4):
+        enqueue(scheduler, "heavy")
+    enqueue(scheduler, "light")
+
+    assert drain(scheduler) == ["heavy", "light", "heavy", "heavy", "heavy"]
+
+
+def test_deficit_shares_execution_time_not_execution_count():
+    scheduler = ExecutionScheduler(concurrency=1, quantum=1.0)
+    for _ in range(2):
+        enqueue(scheduler, "slow", cost=2.0)
+    for _ in range(4):
+        enqueue(scheduler, "fast", cost=1.0)
+
+    assert drain(scheduler) == ["fast", "slow", "fast", "fast", "slow", "fast"]
+
+
+def test_cheap_executions_run_several_per_turn():
+    scheduler = ExecutionScheduler(concurrency=1, quantum=1.0)
+    for _ in range(3):
+        enqueue(scheduler, "quick", cost=0.25)
+    enqueue(scheduler, "other")
+
+    assert drain(scheduler) == ["quick", "quick", "quick", "other"]
+
+
+def test_rounds_without_credit_are_skipped():
+    scheduler = ExecutionScheduler(concurrency=1, quantum=0.01)
+    enqueue(scheduler, "a", cost=5.0)
+    enqueue(scheduler, "b", cost=6.0)
+
+    assert drain(scheduler) == ["a", "b"]
+
+
+def test_interactive_starts_before_batch():
+    scheduler = ExecutionScheduler(concurrency=1)
+    with scheduler._lock:
+        holder = enqueue(scheduler, "holder")
+        scheduler._dispatch_locked()
+    assert holder.started is not None
+    batch = enqueue(scheduler, "b", priority="batch")
+    interactive = enqueue(scheduler, "i")
+
+    scheduler._release(holder)
+
+    assert interactive.started is not None
+    assert batch.started is None
+
+
+def test_batch_cannot_take_reserved_slots():
+    scheduler = ExecutionScheduler(concurrency=2, interactive_reserved=1)
+    first = enqueue(scheduler, "a", priority="batch")
+    second = enqueue(scheduler, "b", priority="batch")
+    with scheduler._lock:
+        scheduler._dispatch_locked()
+
+    assert first.started is not None
+    assert second.started is None
+    with scheduler.slot("c", "interactive", deadline=1) as queued:
+        assert queued < 0.5
+
+
+def test_full_queue_is_rejected():
+    scheduler = ExecutionScheduler(concurrency=1, max_queued=0)
+    with pytest.raises(AdmissionRejected) as rejected:
+        with scheduler.slot("a"):
+            pass
+
+    assert rejected.value.retry_after >= 1
+    assert scheduler.stats()["rejected"]["queue_full"] == 1
+
+
+def test_wait_longer_than_deadline_is_rejected_up_front():
+    scheduler = ExecutionScheduler(concurrency=1)
+    with scheduler.slot("a"):
+        with pytest.raises(AdmissionRejected) as rejected:
+            with scheduler.slot("b", deadline=0.1):
+                pass
+
+    assert rejected.value.retry_after >= 1
+    stats = scheduler.stats()
+    assert stats["rejected"]["deadline"] == 1
+    assert stats["queued"]["interactive"] == 0
+
+
+def test_unknown_priority_is_an_error():
+    scheduler = ExecutionScheduler(concurrency=1)
+    with pytest.raises(ValueError):
+        with scheduler.slot("a", "urgent"):
+            pass
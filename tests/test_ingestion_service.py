@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+
+from src import dataset_service, ingestion_service
+from src.ingestion_service import IngestionQueue, IngestionQueueFull
+
+
+@pytest.fixture
+def analyze(monkeypatch):
+    """Replaces analyze_dataset with one that blocks until released."""
+    release = threading.Event()
+    started = threading.Semaphore(0)
+    calls = []
+
+    def fake_analyze(dataset_url, email, chat_session_id, name, file_type, progress=None):
+        calls.append(dataset_url)
+        started.release()
+        assert release.wait(5)
+        return {"dataset_url": dataset_url}
+
+    monkeypatch.setattr(dataset_service, "analyze_dataset", fake_analyze)
+    fake_analyze.release = release
+    fake_analyze.started = started
+    fake_analyze.calls = calls
+    yield fake_analyze
+    release.set()
+
+
+def wait_for(job, status):
+    for _ in range(500):
+        if job.status == status:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError(f"job stayed {job.status}, expected {status}")
+
+
+def submit(queue, url):
+    return queue.submit(url, "user@example.com", "session", "data.csv")
+
+
+def test_second_submission_for_active_url_gets_the_same_job(analyze):
+    queue = IngestionQueue(workers=1, max_pending=10, retention=60)
+    first, coalesced = submit(queue, "http://example.invalid/a.csv")
+    assert not coalesced
+    assert analyze.started.acquire(timeout=5)
+
+    second, coalesced = submit(queue, "http://example.invalid/a.csv")
+
+    assert coalesced
+    assert second is first
+    analyze.release.set()
+    wait_for(first, "succeeded")
+    assert analyze.calls == ["http://example.invalid/a.csv"]
+    queue.shutdown()
+
+
+def test_finished_url_is_ingested_again(analyze):
+    queue = IngestionQueue(workers=1, max_pending=10, retention=60)
+    analyze.release.set()
+    first, _ = submit(queue, "http://example.invalid/a.csv")
+    wait_for(first, "succeeded")
+
+    second, coalesced = submit(queue, "http://example.invalid/a.csv")
+
+    assert not coalesced
+    assert second is not first
+    wait_for(second, "succeeded")
+    queue.shutdown()
+
+
+def test_max_pending_counts_distinct_urls(analyze):
+    queue = IngestionQueue(workers=1, max_pending=1, retention=60)
+    submit(queue, "http://example.invalid/a.csv")
+
+    assert submit(queue, "http://example.invalid/a.csv")[1]
+    with pytest.raises(IngestionQueueFull):
+        submit(queue, "http://example.invalid/b.csv")
+    queue.shutdown()
+
+
+def test_finished_jobs_are_pruned_after_retention(analyze, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ingestion_service.time, "monotonic", lambda: now[0])
+    queue = IngestionQueue(workers=1, max_pending=10, retention=60)
+    analyze.release.set()
+    job, _ = submit(queue, "http://example.invalid/a.csv")
+    wait_for(job, "succeeded")
+
+    now[0] += 59
+    submit(queue, "http://example.invalid/b.csv")
+    assert queue.get(job.job_id) is job
+
+    now[0] += 2
+    submit(queue, "http://example.invalid/c.csv")
+    assert queue.get(job.job_id) is None
+    queue.shutdown()
+
+
+def test_shutdown_fails_jobs_that_never_started(analyze):
+    queue = IngestionQueue(workers=1, max_pending=10, retention=60)
+    running, _ = submit(queue, "http://example.invalid/a.csv")
+    assert analyze.started.acquire(timeout=5)
+    queued, _ = submit(queue, "http://example.invalid/b.csv")
+    version = queued.version
+
+    queue.shutdown()
+
+    assert queued.status == "failed"
+    assert "shutting down" in queued.error
+    assert queued.version > version
+    assert queue.stats()["active"] == 1
+
+    analyze.release.set()
+    wait_for(running, "succeeded")
+    assert analyze.calls == ["http://example.invalid/a.csv"]
+    assert queue.stats()["active"] == 0
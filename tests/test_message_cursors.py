@@ -0,0 +1,81 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from src.chat_service import _page_cursors, decode_message_cursor, encode_message_cursor
+
+
+def message(minute: int) -> dict:
+    return {
+        "created_at": datetime(2024, 5, 1, 12, minute, 30, 123456, tzinfo=timezone.utc),
+        "message_id": str(uuid.UUID(int=minute)),
+    }
+
+
+def test_cursor_round_trips():
+    original = message(7)
+
+    created_at, message_id = decode_message_cursor(encode_message_cursor(original))
+
+    assert created_at == original["created_at"]
+    assert message_id == original["message_id"]
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_message_cursor(message(59))
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    encode_message_cursor(message(1))[:-4],
+    "MjAyNC0wNS0wMQ==",  # no message id
+    "bm90LWEtZGF0ZXw3",  # "not-a-date|7"
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid message cursor"):
+        decode_message_cursor(cursor)
+
+
+def test_latest_page_points_back_only():
+    first, last = message(1), message(2)
+
+    cursors = _page_cursors(True, first, last, before=None, after=None)
+
+    assert cursors == {"prev_cursor": encode_message_cursor(first), "next_cursor": None}
+
+
+def test_whole_history_in_one_page_has_no_cursors():
+    assert _page_cursors(False, message(1), message(2), None, None) == {
+        "prev_cursor": None, "next_cursor": None
+    }
+
+
+def test_older_page_points_both_ways():
+    first, last = message(1), message(2)
+
+    cursors = _page_cursors(True, first, last, before="cursor", after=None)
+
+    assert cursors == {"prev_cursor": encode_message_cursor(first), "next_cursor": encode_message_cursor(last)}
+
+
+def test_oldest_page_has_no_prev_cursor():
+    cursors = _page_cursors(False, message(1), message(2), before="cursor", after=None)
+    assert cursors["prev_cursor"] is None
+    assert cursors["next_cursor"] == encode_message_cursor(message(2))
+
+
+def test_newer_page_points_forward_while_more_remain():
+    first, last = message(3), message(4)
+
+    assert _page_cursors(True, first, last, before=None, after="cursor") == {
+        "prev_cursor": encode_message_cursor(first), "next_cursor": encode_message_cursor(last)
+    }
+    assert _page_cursors(False, first, last, before=None, after="cursor")["next_cursor"] is None
+
+
+def test_empty_page_after_cursor_has_no_cursors():
+    assert _page_cursors(False, None, None, before=None, after="cursor") == {
+        "prev_cursor": None, "next_cursor": None
+    }
@@ -0,0 +1,32 @@
+import io
+
+import pyarrow as pa
+import pytest
+
+from src.parse_engines import ArrowCsvEngine, PandasCsvEngine, pandas_column_names
+
+
+def parse(engine, data: bytes) -> pa.Table:
+    return pa.concat_tables(list(engine.read_chunks(io.BytesIO(data))))
+
+
+@pytest.mark.parametrize("data", [
+    b"a,a,b\n1,2,3\n4,5,6\n",
+    b",x,\n1,2,3\n",
+    b"a,a,a.1\n1,2,3\n",
+    b"a.1,a,a\n1,2,3\n",
+    b",Unnamed: 0,a,a\n1,2,3,4\n",
+    b"region,sales,region\nNorth,10,N\nSouth,,S\n",
+    b"a,a,\n",
+])
+def test_engines_agree_on_the_schema(data):
+    arrow, pandas = parse(ArrowCsvEngine(), data), parse(PandasCsvEngine(), data)
+
+    assert arrow.schema.names == pandas.schema.names
+    assert arrow.to_pylist() == pandas.to_pylist()
+
+
+def test_repeated_and_blank_names_are_mangled_like_pandas():
+    assert pandas_column_names(["a", "a", "", "b", "a"]) == ["a", "a.1", "Unnamed: 2", "b", "a.2"]
+    assert pandas_column_names(["a", "a", "a.1"]) == ["a", "a.2", "a.1"]
+    assert pandas_column_names(["", "Unnamed: 0"]) == ["Unnamed: 0.1", "Unnamed: 0"]
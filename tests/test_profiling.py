@@ -0,0 +1,52 @@
+import io
+import json
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from src.profiling import ColumnProfiler, _json_value
+
+
+def profile(array: pa.Array) -> dict:
+    profiler = ColumnProfiler(array.type)
+    profiler.update(array)
+    return profiler.result()
+
+
+def test_time_column_inferred_from_csv_is_serializable():
+    table = pacsv.read_csv(io.BytesIO(b"opened\n09:30:00\n17:45:10\n\n09:30:00\n"))
+    assert pa.types.is_time(table.schema.field("opened").type)
+
+    result = profile(table.column("opened").combine_chunks())
+
+    assert result["min"] == "09:30:00"
+    assert result["max"] == "17:45:10"
+    assert result["top_values"][0] == {"value": "09:30:00", "count": 2}
+    json.dumps(result)
+
+
+def test_timestamp_column_reports_iso_bounds():
+    result = profile(pa.array([datetime(2024, 1, 2, 3, 4, 5), datetime(2023, 6, 1)], pa.timestamp("s")))
+
+    assert result["min"] == "2023-06-01T00:00:00"
+    assert result["max"] == "2024-01-02T03:04:05"
+    assert "mean" not in result
+    json.dumps(result)
+
+
+def test_duration_and_decimal_columns_are_serializable():
+    durations = profile(pa.array([timedelta(hours=2), timedelta(seconds=90)], pa.duration("s")))
+    assert (durations["min"], durations["max"]) == ("0:01:30", "2:00:00")
+    json.dumps(durations)
+    json.dumps(profile(pa.array([Decimal("1.25"), Decimal("3.50")], pa.decimal128(5, 2))))
+
+
+def test_json_value_conversions():
+    assert _json_value(time(8, 15)) == "08:15:00"
+    assert _json_value(timedelta(minutes=1, seconds=30)) == "0:01:30"
+    assert _json_value(Decimal("2.5")) == 2.5
+    assert _json_value(Decimal("NaN")) is None
+    assert _json_value(float("inf")) is None
+    assert _json_value(b"\x01\xff") == "01ff"
@@ -0,0 +1,124 @@
+import psycopg2
+import pytest
+
+from src import database
+from src.database import HOT_STATEMENTS, Statement, StatementError
+
+
+def test_placeholders_become_numbered_parameters():
+    statement = Statement("messages", "get_page", "SELECT * FROM message\nWHERE session = %s AND id > %s;\n")
+    statement.make_preparable()
+
+    assert statement.param_count == 2
+    assert statement.prepared_name == "messages__get_page"
+    assert statement.prepare_sql == "PREPARE messages__get_page AS SELECT * FROM message\nWHERE session = $1 AND id > $2"
+    assert statement.execute_sql == "EXECUTE messages__get_page (%s, %s)"
+
+
+def test_escaped_percent_is_a_literal():
+    statement = Statement("users", "search", "SELECT * FROM users WHERE email LIKE '%%@' || %s")
+    statement.make_preparable()
+
+    assert statement.param_count == 1
+    assert statement.prepare_sql == "PREPARE users__search AS SELECT * FROM users WHERE email LIKE '%@' || $1"
+
+
+def test_statement_without_parameters():
+    statement = Statement("stats", "count", "SELECT count(*) FROM users")
+    statement.make_preparable()
+    assert statement.execute_sql == "EXECUTE stats__count"
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM users WHERE email = %(email)s",
+    "SELECT * FROM users WHERE id = %d",
+])
+def test_named_and_typed_placeholders_are_rejected(sql):
+    with pytest.raises(StatementError, match="only %s is allowed"):
+        Statement("users", "bad", sql)
+
+
+def test_batched_statements_cannot_be_prepared():
+    statement = Statement("columns", "insert_columns", "INSERT INTO t (a, b) VALUES %s RETURNING a")
+    with pytest.raises(StatementError, match="batched"):
+        statement.make_preparable()
+
+
+def test_read_only_detection():
+    assert Statement("a", "b", "-- INSERT in a comment\nSELECT 1").read_only
+    assert not Statement("a", "b", "WITH x AS (DELETE FROM t RETURNING *) SELECT * FROM x").read_only
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        if sql.startswith("PREPARE") and sql.split()[1] in self.connection.broken:
+            raise psycopg2.ProgrammingError('column "execution_stats" does not exist')
+        self.connection.executed.append(sql)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeConnection:
+    def __init__(self, broken):
+        self.broken = broken
+        self.autocommit = False
+        self.prepared_statements = set()
+        self.unpreparable_statements = set()
+        self.executed = []
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+
+@pytest.fixture
+def prepared_enabled(monkeypatch):
+    monkeypatch.setattr(database, "DB_PREPARED_STATEMENTS", True)
+    monkeypatch.setattr(database, "_use_prepared", True)
+
+
+def test_a_failing_prepare_does_not_fail_the_connection(prepared_enabled):
+    broken = database.get_statement(*HOT_STATEMENTS[0])
+    conn = FakeConnection({broken.prepared_name})
+
+    database._prepare_connection(conn)
+
+    assert conn.unpreparable_statements == {broken.prepared_name}
+    assert len(conn.prepared_statements) == len(HOT_STATEMENTS) - 1
+    assert conn.autocommit is False
+
+
+def test_unpreparable_statements_run_as_plain_sql(prepared_enabled):
+    broken = database.get_statement(*HOT_STATEMENTS[0])
+    working = database.get_statement(*HOT_STATEMENTS[1])
+    conn = FakeConnection({broken.prepared_name})
+    database._prepare_connection(conn)
+    cursor = conn.cursor()
+
+    database.execute_statement(cursor, broken.category, broken.name, [None] * broken.param_count)
+    database.execute_statement(cursor, working.category, working.name, [None] * working.param_count)
+
+    assert conn.executed[-2:] == [broken.sql, working.execute_sql]
+
+
+def test_lazy_prepare_failure_falls_back_once(prepared_enabled):
+    broken = database.get_statement(*HOT_STATEMENTS[0])
+    conn = FakeConnection({broken.prepared_name})
+    conn.autocommit = True
+    cursor = conn.cursor()
+
+    for _ in range(2):
+        database.execute_statement(cursor, broken.category, broken.name, [None] * broken.param_count)
+
+    assert conn.executed == [broken.sql, broken.sql]
+    assert broken.prepared_name in conn.unpreparable_statements
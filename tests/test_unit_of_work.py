@@ -0,0 +1,165 @@
+import pytest
+
+from src import database
+from src.database import UnitOfWork, after_commit, bind_unit_of_work, reset_unit_of_work
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql, params=None):
+        self.connection.events.append(("execute", sql))
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, events, fail_commit=False):
+        self.events = events
+        self.autocommit = True
+        self.closed = False
+        self.fail_commit = fail_commit
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        if self.fail_commit:
+            raise RuntimeError("connection lost")
+        self.events.append("commit")
+
+    def rollback(self):
+        self.events.append("rollback")
+
+
+class FakePool:
+    def __init__(self, events):
+        self.events = events
+        self.fail_commit = False
+
+    def getconn(self):
+        self.events.append("getconn")
+        return FakeConnection(self.events, self.fail_commit)
+
+    def putconn(self, conn, discard=False):
+        self.events.append(("putconn", discard))
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = FakePool([])
+    monkeypatch.setattr(database, "get_pool", lambda: pool)
+    return pool
+
+
+@pytest.fixture
+def bound():
+    uow = UnitOfWork()
+    token = bind_unit_of_work(uow)
+    yield uow
+    reset_unit_of_work(token)
+
+
+def write(sql="INSERT"):
+    with database.get_db_cursor() as cursor:
+        cursor.execute(sql)
+
+
+def test_writes_share_one_transaction_until_commit(pool, bound):
+    events = pool.events
+    write("INSERT 1")
+    write("INSERT 2")
+    bound.commit()
+
+    assert events == ["getconn", ("execute", "INSERT 1"), ("execute", "INSERT 2"), "commit", ("putconn", False)]
+
+
+def test_after_commit_runs_once_the_commit_is_done(pool, bound):
+    events = pool.events
+    write()
+    after_commit(lambda: events.append("callback"))
+    assert "callback" not in events
+
+    bound.commit()
+
+    assert events[-3:] == ["commit", ("putconn", False), "callback"]
+
+
+def test_after_commit_without_a_transaction_runs_immediately(pool, bound):
+    events = pool.events
+    after_commit(lambda: events.append("callback"))
+    assert events == ["callback"]
+
+
+def test_after_commit_outside_a_unit_of_work_follows_the_commit(pool):
+    events = pool.events
+    write()
+    after_commit(lambda: events.append("callback"))
+    assert events[-3:] == ["commit", ("putconn", False), "callback"]
+
+
+def test_rollback_drops_after_commit_callbacks(pool, bound):
+    events = pool.events
+    write()
+    after_commit(lambda: events.append("callback"))
+    bound.rollback()
+    bound.commit()
+
+    assert "callback" not in events
+    assert "rollback" in events
+
+
+def test_error_in_a_write_fails_the_unit_of_work(pool, bound):
+    events = pool.events
+    write("INSERT 1")
+    with pytest.raises(ValueError):
+        with database.get_db_cursor() as cursor:
+            cursor.execute("INSERT 2")
+            raise ValueError("constraint violated")
+    assert events[-2:] == ["rollback", ("putconn", False)]
+
+    # The first write is gone; nothing after it may commit on its own.
+    for later in (write, bound.commit, lambda: after_commit(lambda: None)):
+        with pytest.raises(RuntimeError, match="rolled back"):
+            later()
+    assert events.count("getconn") == 1
+    assert "commit" not in events
+
+
+def test_close_after_failure_does_not_commit(pool, bound):
+    events = pool.events
+    write()
+    with pytest.raises(ValueError):
+        with database.get_db_cursor():
+            raise ValueError()
+
+    bound.close()
+
+    assert "commit" not in events
+    assert not bound.active
+
+
+def test_error_in_a_read_before_any_write_is_not_a_failure(pool, bound):
+    events = pool.events
+    with pytest.raises(ValueError):
+        with database.get_db_cursor(commit=False):
+            raise ValueError()
+
+    write()
+    bound.commit()
+    assert events[-2:] == ["commit", ("putconn", False)]
+
+
+def test_failed_commit_fails_the_unit_of_work(pool, bound):
+    events = pool.events
+    pool.fail_commit = True
+    write()
+
+    with pytest.raises(RuntimeError, match="connection lost"):
+        bound.commit()
+
+    assert events[-1] == ("putconn", True)
+    with pytest.raises(RuntimeError, match="rolled back"):
+        write()